@@ -0,0 +1,92 @@
+"""
+Compare the address operations made for every execute request with the previous implementation of `AgentAddress`.
+
+Usage: python benchmarks/bench_agent_address.py
+"""
+
+import timeit
+from typing import Any, Callable, Dict
+
+from theoriq.biscuit import AgentAddress
+from theoriq.biscuit.utils import verify_address
+from theoriq.types import SourceType
+
+ADDRESS = "0x4933829bd988807466be707dc500b791f1f0a550a2c2e92e349c384220fbcaa3"
+USER_ADDRESS = "0x1F32Bc2B1Ace25D762E22888a71C7eC0799D379f"
+
+
+class PreviousAgentAddress:
+    """`AgentAddress` before addresses were interned, as a reference."""
+
+    def __init__(self, address: str) -> None:
+        self.address = verify_address(address)
+
+    def __str__(self) -> str:
+        return self.address if self.address.startswith("0x") else f"0x{self.address}"
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, PreviousAgentAddress):
+            return self.address.removeprefix("0x") == other.address.removeprefix("0x")
+        if isinstance(other, str):
+            return self.address.removeprefix("0x") == other.removeprefix("0x")
+        return False
+
+    def __hash__(self) -> int:
+        return hash(self.address)
+
+    @classmethod
+    def null(cls) -> "PreviousAgentAddress":
+        return cls("0".rjust(64, "0"))
+
+    @property
+    def is_null(self) -> bool:
+        return self == PreviousAgentAddress.null()
+
+
+def previous_source_type_from_address(address: str) -> SourceType:
+    length = len(address.removeprefix("0x"))
+    if length == 40:
+        return SourceType.User
+    if length == 64:
+        return SourceType.Agent
+    raise ValueError(f"'{address}' is not a valid address")
+
+
+def best_time(fn: Callable[[], Any], number: int = 100_000, repeat: int = 5) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def main() -> None:
+    previous = PreviousAgentAddress(ADDRESS)
+    current = AgentAddress(ADDRESS)
+    previous_publishers: Dict[Any, int] = {previous: 1}
+    current_publishers: Dict[Any, int] = {current: 1}
+    source_type_from_address = SourceType.from_address
+
+    operations: Dict[str, Dict[str, Callable[[], Any]]] = {
+        "parse": {"previous": lambda: PreviousAgentAddress(ADDRESS), "current": lambda: AgentAddress(ADDRESS)},
+        "is_null": {"previous": lambda: previous.is_null, "current": lambda: current.is_null},
+        "== str": {"previous": lambda: previous == ADDRESS, "current": lambda: current == ADDRESS},
+        "str": {"previous": lambda: str(previous), "current": lambda: str(current)},
+        "dict lookup": {
+            "previous": lambda: previous_publishers[previous],
+            "current": lambda: current_publishers[current],
+        },
+        "source type": {
+            "previous": lambda: previous_source_type_from_address(USER_ADDRESS),
+            "current": lambda: source_type_from_address(USER_ADDRESS),
+        },
+    }
+
+    print(f"{'operation':<12} {'previous':>12} {'current':>12}")
+    for name, implementations in operations.items():
+        previous_time = best_time(implementations["previous"])
+        current_time = best_time(implementations["current"])
+        print(
+            f"{name:<12} {previous_time * 1e9:>9.0f} ns {current_time * 1e9:>9.0f} ns"
+            f" ({previous_time / current_time:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
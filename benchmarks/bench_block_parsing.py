@@ -0,0 +1,47 @@
+"""
+Compare the parsing of dialog item blocks, one pydantic validation per block versus the compiled tagged union.
+
+Usage: python benchmarks/bench_block_parsing.py [number of blocks]
+"""
+
+import sys
+import timeit
+from typing import Any, Callable, Dict, List
+
+from theoriq.dialog import DialogItem, blocks_adapter
+
+
+def build_blocks(count: int) -> List[Dict[str, Any]]:
+    templates: List[Dict[str, Any]] = [
+        {"type": "text:markdown", "data": {"text": "Hello, how can I help you today?"}},
+        {"type": "code:python", "data": {"code": "print('hello')"}},
+        {"type": "data:json", "data": {"data": '{"key": "value"}'}},
+        {"type": "custom:weather", "data": {"data": {"city": "Toronto", "temperature": 21}}},
+        {"type": "unregistered:type", "data": {"anything": [1, 2, 3]}},
+    ]
+    return [templates[i % len(templates)] for i in range(count)]
+
+
+def best_time(fn: Callable[[], Any], number: int = 20, repeat: int = 20) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    blocks = build_blocks(count)
+    adapter = blocks_adapter()
+
+    per_block = [DialogItem.parse_block(block) for block in blocks]
+    compiled = adapter.validate_python(blocks)
+    assert [type(block) for block in per_block] == [type(block) for block in compiled]
+    assert per_block == compiled
+
+    per_block_time = best_time(lambda: [DialogItem.parse_block(block) for block in blocks])
+    compiled_time = best_time(lambda: adapter.validate_python(blocks))
+    print(f"{count} blocks")
+    print(f"per block validation : {per_block_time * 1000:8.2f} ms")
+    print(f"compiled tagged union: {compiled_time * 1000:8.2f} ms ({per_block_time / compiled_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
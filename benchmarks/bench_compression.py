@@ -0,0 +1,72 @@
+"""
+Compare the bytes on the wire and the CPU cost of the content codings, on an execute request with large blocks.
+
+Usage: python benchmarks/bench_compression.py [number of dialog items]
+"""
+
+import json
+import sys
+import timeit
+from typing import Any, Callable, Dict, List, Optional
+
+from theoriq.api.v1alpha2.schemas import ExecuteRequestBody
+from theoriq.utils import GZIP_CODING, ZSTD_CODING, ContentCoding
+
+USER_ADDRESS = "0x1F32Bc2B1Ace25D762E22888a71C7eC0799D379f"
+AGENT_ADDRESS = "0x" + "ab" * 32
+
+# Transfer rate used to weigh the bytes saved against the CPU spent, in bytes per second (100 Mbit/s)
+BANDWIDTH = 100_000_000 / 8
+
+
+def build_request(count: int) -> Dict[str, Any]:
+    items = []
+    for i in range(count):
+        is_user = i % 2 == 0
+        rows = [{"id": j, "name": f"row {j}", "value": j * 1.5, "tags": ["a", "b"]} for j in range(50)]
+        items.append(
+            {
+                "sourceType": "user" if is_user else "agent",
+                "source": USER_ADDRESS if is_user else AGENT_ADDRESS,
+                "timestamp": f"2024-11-04T{i // 3600 % 24:02}:{i // 60 % 60:02}:{i % 60:02}Z",
+                "blocks": [
+                    {"type": "text:markdown", "data": {"text": f"Message {i}: " + "lorem ipsum " * 20}},
+                    {"type": "code:python", "data": {"code": "\n".join(f"print({j} * {i})" for j in range(40))}},
+                    {"type": "data:json", "data": {"data": json.dumps(rows)}},
+                ],
+            }
+        )
+    return {"dialog": {"items": items}}
+
+
+def best_time(fn: Callable[[], Any], number: int = 5, repeat: int = 5) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    body = ExecuteRequestBody.model_validate(build_request(count)).model_dump_json_bytes()
+    print(f"{count} dialog items, {len(body)} bytes uncompressed")
+    print(f"{'coding':<10} {'bytes':>10} {'ratio':>7} {'compress':>11} {'decompress':>11} {'total @100Mbit/s':>17}")
+    print(f"{'identity':<10} {len(body):>10} {1.0:>7.2f} {'':>11} {'':>11} {len(body) / BANDWIDTH * 1000:>14.2f} ms")
+
+    codings: List[ContentCoding] = [GZIP_CODING] + ([ZSTD_CODING] if ZSTD_CODING.is_available else [])
+    for coding in codings:
+        levels: List[Optional[int]] = [1, None, 9] if coding is GZIP_CODING else [1, None, 10]
+        for level in levels:
+            compressed = coding.compress(body, level)
+            assert coding.decompress(compressed) == body
+            compress_time = best_time(lambda: coding.compress(body, level))
+            decompress_time = best_time(lambda: coding.decompress(compressed))
+            total = compress_time + decompress_time + len(compressed) / BANDWIDTH
+            name = f"{coding.name}-{coding.default_level if level is None else level}"
+            print(
+                f"{name:<10} {len(compressed):>10} {len(body) / len(compressed):>7.2f} "
+                f"{compress_time * 1000:>8.2f} ms {decompress_time * 1000:>8.2f} ms {total * 1000:>14.2f} ms"
+            )
+    if not ZSTD_CODING.is_available:
+        print("zstd: not available, install the `zstd` extra")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Compare the validation of an execute request resending a whole conversation, with and without a dialog item cache.
+
+Usage: python benchmarks/bench_dialog_item_cache.py [number of dialog items]
+"""
+
+import sys
+import timeit
+from typing import Any, Callable, Dict
+
+from theoriq.api.v1alpha2.schemas import ExecuteRequestBody
+from theoriq.dialog import DialogItemCache
+
+USER_ADDRESS = "0x1F32Bc2B1Ace25D762E22888a71C7eC0799D379f"
+AGENT_ADDRESS = "0x" + "ab" * 32
+
+
+def build_request(count: int) -> Dict[str, Any]:
+    items = []
+    for i in range(count):
+        is_user = i % 2 == 0
+        items.append(
+            {
+                "sourceType": "user" if is_user else "agent",
+                "source": USER_ADDRESS if is_user else AGENT_ADDRESS,
+                "timestamp": f"2024-11-04T{i // 3600 % 24:02}:{i // 60 % 60:02}:{i % 60:02}Z",
+                "blocks": [
+                    {"type": "text:markdown", "data": {"text": f"Message {i}: " + "lorem ipsum " * 20}},
+                    {"type": "code:python", "data": {"code": f"print({i})"}},
+                ],
+            }
+        )
+    return {"dialog": {"items": items}}
+
+
+def best_time(fn: Callable[[], Any], number: int = 10, repeat: int = 10) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    request = build_request(count)
+    cache = DialogItemCache(max_size=count)
+    context = cache.validation_context()
+
+    assert ExecuteRequestBody.model_validate(request, context=context) == ExecuteRequestBody.model_validate(request)
+
+    uncached_time = best_time(lambda: ExecuteRequestBody.model_validate(request))
+    cached_time = best_time(lambda: ExecuteRequestBody.model_validate(request, context=context))
+    print(f"{count} dialog items, hit ratio {cache.hit_ratio:.2f}, {cache.size_bytes} bytes cached")
+    print(f"without cache: {uncached_time * 1000:8.2f} ms")
+    print(f"with cache   : {cached_time * 1000:8.2f} ms ({uncached_time / cached_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Compare rendering a large dialog as markdown with `Dialog.format_as_markdown` and keeping the end of it,
+versus `DialogRenderer` with a character budget.
+
+Usage: python benchmarks/bench_dialog_render.py [number of dialog items] [budget in characters]
+"""
+
+import sys
+import timeit
+from typing import Any, Callable, List
+
+from theoriq.dialog import BlockBase, CodeBlock, DataBlock, Dialog, DialogItem, DialogRenderer, TextBlock
+
+USER_ADDRESS = "0x1F32Bc2B1Ace25D762E22888a71C7eC0799D379f"
+
+
+def build_dialog(count: int) -> Dialog:
+    blocks: List[BlockBase] = [
+        TextBlock.from_text("Here is the summary of the trending tokens " * 5),
+        CodeBlock.from_code("print('hello')", "python"),
+        DataBlock.from_data('{"key": "value"}', "json"),
+    ]
+    return Dialog(items=[DialogItem.new(source=USER_ADDRESS, blocks=blocks) for _ in range(count)])
+
+
+def best_time(fn: Callable[[], Any], number: int = 20, repeat: int = 10) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    budget = int(sys.argv[2]) if len(sys.argv) > 2 else 8000
+    dialog = build_dialog(count)
+    renderer = DialogRenderer(max_chars=budget)
+
+    rendered = renderer.render(dialog)
+    assert dialog.format_as_markdown().endswith(rendered)
+
+    full_time = best_time(lambda: dialog.format_as_markdown()[-budget:])
+    budget_time = best_time(lambda: renderer.render(dialog))
+    print(f"{count} dialog items, budget of {budget} characters, {len(rendered)} characters rendered")
+    print(f"format_as_markdown: {full_time * 1000:8.3f} ms")
+    print(f"DialogRenderer    : {budget_time * 1000:8.3f} ms ({full_time / budget_time:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Compare the memory used by conversations kept as pydantic dialogs versus `DialogStore`.
+
+Usage: python benchmarks/bench_dialog_store.py [number of conversations] [number of items per conversation]
+"""
+
+import sys
+import timeit
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from theoriq.dialog import Dialog, DialogStore
+
+USER_ADDRESS = "0x1F32Bc2B1Ace25D762E22888a71C7eC0799D379f"
+AGENT_ADDRESS = "0x" + "ab" * 32
+
+
+def build_payload(count: int) -> Dict[str, Any]:
+    items = []
+    for i in range(count):
+        is_user = i % 2 == 0
+        items.append(
+            {
+                "sourceType": "user" if is_user else "agent",
+                "source": USER_ADDRESS if is_user else AGENT_ADDRESS,
+                "timestamp": f"2024-11-04T{i // 3600 % 24:02}:{i // 60 % 60:02}:{i % 60:02}.{i:06}Z",
+                "blocks": [
+                    {"type": "text:markdown", "data": {"text": f"Message {i}: what are the trending tokens?"}},
+                    {"type": "code:python", "data": {"code": f"print({i})"}},
+                ],
+            }
+        )
+    return {"items": items}
+
+
+def allocated(build: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main() -> None:
+    conversations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    payloads = [build_payload(count) for _ in range(conversations)]
+    dialogs: List[Dialog] = [Dialog.model_validate(payload) for payload in payloads]
+
+    store = DialogStore.from_dialog(dialogs[0])
+    assert store.to_dialog() == dialogs[0]
+
+    dialogs_size = allocated(lambda: [Dialog.model_validate(payload) for payload in payloads])
+    stores_size = allocated(lambda: [DialogStore.from_dialog(dialog) for dialog in dialogs])
+    items = conversations * count
+    print(f"{conversations} conversations of {count} items")
+    print(f"pydantic dialogs: {dialogs_size / 1e6:8.2f} MB ({dialogs_size / items:6.0f} bytes per item)")
+    print(f"dialog stores   : {stores_size / 1e6:8.2f} MB ({stores_size / items:6.0f} bytes per item)")
+    print(f"memory ratio    : {dialogs_size / stores_size:8.1f}x")
+
+    to_dialog_time = min(timeit.repeat(store.to_dialog, number=10, repeat=5)) / 10
+    print(f"store to dialog : {to_dialog_time * 1000:8.2f} ms for {count} items")
+
+
+if __name__ == "__main__":
+    main()
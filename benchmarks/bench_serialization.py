@@ -0,0 +1,108 @@
+"""
+Compare the serialization of dialogs with the default options of `BaseTheoriqModel`,
+through `BaseModel` with the options passed explicitly versus the serializer of the model class called directly.
+
+Both sides serialize block fields by their runtime type from within pydantic-core, so this only measures skipping
+the option handling of pydantic. Run it against an earlier tree to measure the serialization of those fields.
+
+Usage: python benchmarks/bench_serialization.py [number of dialog items]
+"""
+
+import sys
+import timeit
+from typing import Any, Callable, Dict, List
+
+from pydantic import BaseModel
+
+from theoriq.dialog import BaseData, BaseTheoriqModel, Dialog
+
+USER_ADDRESS = "0x1F32Bc2B1Ace25D762E22888a71C7eC0799D379f"
+AGENT_ADDRESS = "0x" + "ab" * 32
+DUMP_DEFAULTS: Dict[str, Any] = {
+    "by_alias": True,
+    "exclude_none": True,
+    "exclude_defaults": True,
+    "exclude_unset": True,
+}
+
+BLOCKS: List[Dict[str, Any]] = [
+    {"type": "text:markdown", "data": {"text": "Send me an approval tx for 2 WETH in decimal"}},
+    {"type": "code:python", "data": {"code": "print('hello')"}},
+    {"type": "data:json", "data": {"data": '{"key": "value"}'}},
+    {"type": "custom:receipt", "data": {"data": {"gas_used": 55117, "logs": [1, 2, 3]}}},
+    {
+        "type": "web3:proposedTx",
+        "data": {
+            "abi": {"name": "approve", "inputs": [{"name": "_spender", "type": "address"}], "type": "function"},
+            "description": "Approve WETH for the Uniswap V3 Position Manager in the amount of 2 WETH",
+            "knownAddresses": {"0x4200000000000000000000000000000000000006": "WETH"},
+            "txChainId": 8453,
+            "txData": "0x095ea4b3" + "0" * 128,
+            "txGasLimit": 29279,
+            "txNonce": 42,
+            "txTo": "0x4200000000000000000000000000000000000006",
+            "txValue": "0",
+        },
+    },
+    {"type": "web3:signedTx", "data": {"txHash": "0x" + "a4" * 32, "chainId": 8453, "status": 1}},
+]
+
+
+def build_dialog(count: int) -> Dialog:
+    items = []
+    for i in range(count):
+        is_user = i % 2 == 0
+        items.append(
+            {
+                "sourceType": "user" if is_user else "agent",
+                "source": USER_ADDRESS if is_user else AGENT_ADDRESS,
+                "timestamp": f"2024-11-04T{i // 3600 % 24:02}:{i // 60 % 60:02}:{i % 60:02}Z",
+                "blocks": BLOCKS,
+            }
+        )
+    return Dialog.model_validate({"items": items})
+
+
+def best_time(fn: Callable[[], Any], number: int = 100, repeat: int = 20) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def report(name: str, reference: Callable[[], Any], fast: Callable[[], Any]) -> None:
+    reference_time = best_time(reference)
+    fast_time = best_time(fast)
+    print(
+        f"{name:<30}: {reference_time * 1e6:9.1f} us -> {fast_time * 1e6:9.1f} us ({reference_time / fast_time:.1f}x)"
+    )
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    dialog = build_dialog(count)
+    item = dialog.items[0]
+    blocks = item.blocks
+    datas = [block for block in blocks if isinstance(block.data, BaseData)]
+
+    assert dialog.model_dump_json_bytes() == BaseModel.model_dump_json(dialog, **DUMP_DEFAULTS).encode("utf-8")
+    assert dialog.model_dump() == BaseModel.model_dump(dialog, **DUMP_DEFAULTS)
+
+    print(f"{count} dialog items of {len(blocks)} blocks")
+    report(
+        "dialog to JSON bytes",
+        lambda: BaseModel.model_dump_json(dialog, **DUMP_DEFAULTS).encode("utf-8"),
+        dialog.model_dump_json_bytes,
+    )
+    report("dialog item to dict", lambda: BaseModel.model_dump(item, **DUMP_DEFAULTS), item.model_dump)
+    report(
+        "blocks to JSON, one by one",
+        lambda: [BaseModel.model_dump_json(block, **DUMP_DEFAULTS) for block in blocks],
+        lambda: [block.model_dump_json() for block in blocks],
+    )
+    report(
+        "block data to str",
+        lambda: [BaseTheoriqModel.model_dump_json(block.data, by_alias=True, exclude_none=True) for block in datas],
+        lambda: [BaseData.__str__(block.data) for block in datas],
+    )
+
+
+if __name__ == "__main__":
+    main()
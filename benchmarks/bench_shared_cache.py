@@ -0,0 +1,102 @@
+"""
+Compare the protocol calls made by the worker processes of an agent with local caches and with a cache shared through
+a SQLite backend, and the overhead of the shared backend on lookups.
+
+Each worker looks up the configurations of the same agents, loading a missing one with a simulated protocol call.
+
+Usage: python benchmarks/bench_shared_cache.py [number of workers] [number of keys] [protocol call latency in ms]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import timeit
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from theoriq.utils import JsonCacheCodec, SQLiteCacheBackend, TTLCache
+
+CONFIGURATION = {"model": "gpt-4o", "temperature": 0.2, "system_prompt": "You are a helpful agent. " * 20}
+
+
+def best_time(fn: Callable[[], Any], number: int = 2000, repeat: int = 5) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def new_cache(path: Optional[str]) -> TTLCache[Dict[str, Any]]:
+    if path is None:
+        return TTLCache(ttl=300, max_size=1000)
+    backend = SQLiteCacheBackend(path)
+    return TTLCache(ttl=300, max_size=1000, namespace="configuration", codec=JsonCacheCodec(), backend=backend)
+
+
+def run_worker(args: Tuple[Optional[str], int, float, int]) -> Tuple[int, float]:
+    """Looks up every key of the workload in a new cache and returns the number of protocol calls and the time."""
+    path, keys, latency, seed = args
+    cache = new_cache(path)
+    calls: List[str] = []
+
+    def load(key: str) -> Dict[str, Any]:
+        calls.append(key)
+        time.sleep(latency)
+        return CONFIGURATION
+
+    start = time.perf_counter()
+    for i in range(keys * 3):
+        key = f"agent_{(i * 7 + seed) % keys}"
+        cache.get_or_load(key, lambda: load(key))
+    return len(calls), time.perf_counter() - start
+
+
+def run_workers(path: Optional[str], workers: int, keys: int, latency: float) -> Tuple[int, float]:
+    with multiprocessing.Pool(workers) as pool:
+        results = pool.map(run_worker, [(path, keys, latency, seed) for seed in range(workers)])
+    return sum(calls for calls, _ in results), max(elapsed for _, elapsed in results)
+
+
+def main() -> None:
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    keys = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    latency = (float(sys.argv[3]) if len(sys.argv) > 3 else 20) / 1000
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.db")
+
+        local_calls, local_time = run_workers(None, workers, keys, latency)
+        shared_calls, shared_time = run_workers(path, workers, keys, latency)
+        print(f"{workers} workers, {keys} keys looked up 3 times each, {latency * 1000:.0f} ms per protocol call")
+        print(f"local caches : {local_calls:5} protocol calls, slowest worker {local_time:6.2f} s")
+        print(f"shared cache : {shared_calls:5} protocol calls, slowest worker {shared_time:6.2f} s")
+        print(f"calls saved  : {local_calls - shared_calls:5} ({1 - shared_calls / local_calls:.0%})")
+
+        # A worker started once the others are warm, e.g. after a restart
+        local_calls, local_time = run_worker((None, keys, latency, workers))
+        shared_calls, shared_time = run_worker((path, keys, latency, workers))
+        print(f"new worker, local : {local_calls:5} protocol calls in {local_time:6.2f} s")
+        print(f"new worker, shared: {shared_calls:5} protocol calls in {shared_time:6.2f} s")
+
+        local = new_cache(None)
+        local.set("key", CONFIGURATION)
+        shared = new_cache(path)
+        shared.set("key", CONFIGURATION)
+        backend = SQLiteCacheBackend(path)
+
+        def shared_miss() -> None:
+            shared.cache.clear()  # the local copy only: the item is read from the file again
+            shared.get("key")
+
+        local_hit = best_time(lambda: local.get("key"))
+        shared_hit = best_time(lambda: shared.get("key"))
+        backend_read = best_time(lambda: backend.get("configuration", "key"))
+        backend_write = best_time(lambda: backend.set("configuration", "other", b"{}", 300), number=200)
+        print(f"local hit            : {local_hit * 1e6:8.2f} us")
+        print(f"shared hit, local    : {shared_hit * 1e6:8.2f} us")
+        print(f"shared hit, from file: {best_time(shared_miss) * 1e6:8.2f} us")
+        print(f"backend read         : {backend_read * 1e6:8.2f} us")
+        print(f"backend write        : {backend_write * 1e6:8.2f} us")
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Compare the incremental SSE parser with the previous parsing of notification streams, which appended each chunk
+to a string and split it again.
+
+Usage: python benchmarks/bench_sse.py
+"""
+
+import json
+import timeit
+from typing import Any, Callable, Iterable, Iterator, List
+
+from theoriq.api.v1alpha2.protocol import SSEParser
+
+CHUNK_SIZE = 4096
+
+
+def previous_parse(chunks: Iterable[str]) -> Iterator[str]:
+    """Parsing of `ProtocolClient.subscribe_to_agent_notifications` before the SSE parser, as a reference."""
+    buffer = ""
+    for chunk in chunks:
+        if not chunk or chunk.strip() == ":":
+            continue
+        buffer += chunk
+        while "\n\n" in buffer:
+            message, buffer = buffer.split("\n\n", 1)
+            if message.startswith("data: "):
+                payload = message[6:]
+                if payload.strip() != ":":
+                    yield payload
+
+
+def split(stream: bytes) -> List[bytes]:
+    return [stream[i : i + CHUNK_SIZE] for i in range(0, len(stream), CHUNK_SIZE)]
+
+
+def best_time(fn: Callable[[], Any], number: int = 1, repeat: int = 3) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def run(name: str, stream: bytes, expected: int, repeat: int = 3) -> None:
+    chunks = split(stream)
+    text_chunks = [chunk.decode("utf-8") for chunk in chunks]
+    assert len(list(SSEParser().iter_events(chunks))) == expected
+    assert len(list(previous_parse(text_chunks))) == expected
+
+    previous_time = best_time(lambda: sum(1 for _ in previous_parse(text_chunks)), repeat=repeat)
+    current_time = best_time(lambda: sum(1 for _ in SSEParser().iter_events(chunks)), repeat=repeat)
+    megabytes = len(stream) / 1_000_000
+    print(
+        f"{name:<28} {megabytes:6.1f} MB  previous {previous_time * 1000:9.1f} ms"
+        f"  parser {current_time * 1000:8.1f} ms ({megabytes / current_time:6.1f} MB/s)"
+    )
+
+
+def main() -> None:
+    for size in (1_000_000, 4_000_000):
+        payload = json.dumps({"data": "x" * size})
+        run(f"1 event of {size // 1_000_000} MB", f"data: {payload}\n\n".encode("utf-8"), 1)
+
+    for count in (10_000, 100_000):
+        events = "".join(
+            f'event: notification\nid: {i}\ndata: {{"index": {i}, "text": "notification {i}"}}\n\n'
+            for i in range(count)
+        )
+        # the previous parser only handles events starting with their `data` field
+        data_only = "".join(f'data: {{"index": {i}, "text": "notification {i}"}}\n\n' for i in range(count))
+        run(f"{count} small events", data_only.encode("utf-8"), count, repeat=15)
+        chunks = split(events.encode("utf-8"))
+        parser_time = best_time(lambda: sum(1 for _ in SSEParser().iter_events(chunks)), repeat=15)
+        print(f"{count} events with id and type   parser {parser_time * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
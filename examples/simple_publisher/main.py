@@ -1,5 +1,4 @@
 import logging
-import time
 
 import dotenv
 
@@ -10,8 +9,8 @@ logger = logging.getLogger(__name__)
 
 def hello_job(context: PublisherContext) -> None:
     i = 0
-    while True:
-        time.sleep(2)
+    # Waits for 2 seconds between messages, until the job is stopped
+    while not context.wait(2):
         try:
             context.publish(f"Hello World {i}!")
             i += 1
@@ -0,0 +1,106 @@
+import threading
+import time
+from typing import List
+
+import pytest
+
+from theoriq.extra.flask import AdmissionController, AdmissionRejectedError
+from theoriq.utils import InMemoryMetricsRegistry
+from theoriq.utils.metrics import (
+    EXECUTE_ADMISSION_QUEUE_SECONDS,
+    EXECUTE_REQUESTS_ADMITTED,
+    EXECUTE_REQUESTS_REJECTED,
+)
+
+
+def test_admit_and_release() -> None:
+    controller = AdmissionController(max_in_flight=2)
+    with controller.admit("0x1"):
+        with controller.admit("0x2"):
+            assert controller.in_flight == 2
+    assert controller.in_flight == 0
+    assert controller.stats.admitted == 2
+
+
+def test_rate_limit_per_sender() -> None:
+    controller = AdmissionController(rate_per_sender=1, burst_per_sender=2)
+    controller.admit("0x1").release()
+    controller.admit("0x1").release()
+    with pytest.raises(AdmissionRejectedError) as e:
+        controller.admit("0x1")
+    assert e.value.status_code == 429
+
+    controller.admit("0x2").release()
+    assert controller.stats.rejected == 1
+
+
+def test_queue_timeout() -> None:
+    controller = AdmissionController(max_in_flight=1, max_queue_time=0.05)
+    with controller.admit("0x1"):
+        with pytest.raises(AdmissionRejectedError) as e:
+            controller.admit("0x2")
+        assert e.value.status_code == 503
+        assert controller.queue_size == 0
+
+
+def test_queue_full_is_rejected_early() -> None:
+    controller = AdmissionController(max_in_flight=1, max_queue_size=0)
+    with controller.admit("0x1"):
+        with pytest.raises(AdmissionRejectedError):
+            controller.admit("0x2")
+
+
+def test_per_sender_limit_does_not_block_other_senders() -> None:
+    controller = AdmissionController(max_in_flight=4, max_in_flight_per_sender=1, max_queue_time=0.05)
+    with controller.admit("0x1"):
+        with pytest.raises(AdmissionRejectedError):
+            controller.admit("0x1")
+        with controller.admit("0x2"):
+            assert controller.in_flight == 2
+
+
+def test_waiting_requests_are_served_round_robin() -> None:
+    controller = AdmissionController(max_in_flight=1, max_queue_time=5)
+    order: List[str] = []
+
+    def run(sender: str) -> None:
+        with controller.admit(sender):
+            order.append(sender)
+
+    ticket = controller.admit("0x0")
+    threads = []
+    for sender in ["0x1", "0x1", "0x1", "0x2"]:
+        thread = threading.Thread(target=run, args=(sender,))
+        thread.start()
+        threads.append(thread)
+        while controller.queue_size < len(threads):
+            time.sleep(0.001)
+
+    ticket.release()
+    for thread in threads:
+        thread.join()
+
+    assert order == ["0x1", "0x2", "0x1", "0x1"]
+    assert controller.stats.queued == 4
+    assert controller.stats.queue_wait_max > 0
+
+
+def test_admission_metrics() -> None:
+    metrics = InMemoryMetricsRegistry()
+    controller = AdmissionController(max_in_flight=1, max_queue_size=1, max_queue_time=5, metrics=metrics)
+    ticket = controller.admit("0x1")
+
+    waiter = threading.Thread(target=lambda: controller.admit("0x2").release())
+    waiter.start()
+    while controller.queue_size == 0:
+        time.sleep(0.001)
+    with pytest.raises(AdmissionRejectedError):
+        controller.admit("0x3")
+    time.sleep(0.01)
+    ticket.release()
+    waiter.join(5)
+
+    assert metrics.counter(EXECUTE_REQUESTS_ADMITTED) == 2
+    assert metrics.counter(EXECUTE_REQUESTS_REJECTED, {"status": "503"}) == 1
+    histogram = metrics.histogram(EXECUTE_ADMISSION_QUEUE_SECONDS)
+    assert histogram is not None and histogram.count == 1 and histogram.sum > 0
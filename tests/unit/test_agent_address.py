@@ -1,3 +1,6 @@
+import copy
+import pickle
+
 from biscuit_auth import PublicKey
 
 from theoriq.biscuit import AgentAddress
@@ -22,3 +25,32 @@ def test_agent_random():
 def test_agent_null():
     add = AgentAddress.null()
     assert add.is_null
+
+
+def test_agent_address_is_interned_and_compared_by_bytes():
+    value = "4933829bd988807466be707dc500b791f1f0a550a2c2e92e349c384220fbcaa3"
+    address = AgentAddress(value)
+    assert AgentAddress(value) is address
+    assert AgentAddress(f"0x{value}") == address
+    assert AgentAddress(value.upper()) == address
+    assert hash(AgentAddress(value.upper())) == hash(address)
+    assert address == f"0x{value}" and address != "not an address"
+    assert str(address) == f"0x{value}" and address.address == value
+    assert AgentAddress(value.upper()) != value.upper() and address != value
+    assert address.to_bytes() == bytes.fromhex(value)
+    assert copy.deepcopy(address) is address
+    assert pickle.loads(pickle.dumps(address)) == address
+
+
+def test_agent_address_null_is_a_singleton():
+    assert AgentAddress.null() is AgentAddress.null()
+    assert AgentAddress("0x" + "0" * 64).is_null
+    assert not AgentAddress.one().is_null
+
+
+def test_agent_address_and_its_string_are_interchangeable_keys():
+    address = AgentAddress.random()
+    assert address == str(address) and hash(address) == hash(str(address))
+    assert {str(address): 1}.get(address) == 1
+    assert {address: 1}.get(str(address)) == 1
+    assert str(address) in {address} and address in {str(address)}
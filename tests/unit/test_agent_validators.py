@@ -0,0 +1,89 @@
+from typing import Any, Dict, Final
+
+import pytest
+from tests.unit.fixtures import *  # noqa: F403
+
+from theoriq import Agent, AgentDeploymentConfiguration
+from theoriq.api.v1alpha2.agent import (
+    AgentSchemaError,
+    ExecuteRequestSchemaError,
+    ExecuteResponseSchemaError,
+    compiled_validator,
+)
+from theoriq.api.v1alpha2.schemas import AgentSchemas, ExecuteRequestBody, ExecuteSchema
+from theoriq.biscuit import AgentAddress
+from theoriq.dialog import CommandBlock, DataBlock, Dialog, DialogItem, TextBlock, UnknownCommandData
+
+CONFIGURATION_SCHEMA: Final[Dict[str, Any]] = {
+    "type": "object",
+    "properties": {"name": {"type": "string"}},
+    "required": ["name"],
+}
+
+SCHEMAS: Final[AgentSchemas] = AgentSchemas(
+    configuration=CONFIGURATION_SCHEMA,
+    execute={
+        "greet": ExecuteSchema(request={"type": "string", "maxLength": 10}, response={"type": "string"}),
+        "sum": ExecuteSchema(
+            request={"type": "object", "properties": {"values": {"type": "array"}}, "required": ["values"]},
+            response={"type": "number"},
+        ),
+    },
+)
+
+
+def _request_body(*blocks) -> ExecuteRequestBody:
+    return ExecuteRequestBody(dialog=Dialog(items=[DialogItem.new(source=str(AgentAddress.one()), blocks=blocks)]))
+
+
+def test_compiled_validator_is_cached_by_schema_content() -> None:
+    first = compiled_validator({"type": "object", "required": ["a"]})
+    second = compiled_validator({"required": ["a"], "type": "object"})
+    assert first is second
+
+
+def test_agents_share_compiled_validators(agent_config: AgentDeploymentConfiguration) -> None:
+    first = Agent(agent_config, SCHEMAS)
+    second = Agent(agent_config, SCHEMAS)
+    assert first.validators.configuration is second.validators.configuration
+
+
+def test_validate_configuration(agent_config: AgentDeploymentConfiguration) -> None:
+    agent = Agent(agent_config, SCHEMAS)
+    agent.validate_configuration({"name": "agent"})
+    with pytest.raises(AgentSchemaError):
+        agent.validate_configuration({"other": "agent"})
+
+
+def test_validate_execute_request_with_command(agent_config: AgentDeploymentConfiguration) -> None:
+    agent = Agent(agent_config, SCHEMAS)
+    command = UnknownCommandData(name="sum", arguments={"values": [1, 2]})
+    assert agent.validate_execute_request(_request_body(CommandBlock.from_command(command))) == "sum"
+
+    command = UnknownCommandData(name="sum", arguments={"other": [1, 2]})
+    with pytest.raises(ExecuteRequestSchemaError):
+        agent.validate_execute_request(_request_body(CommandBlock.from_command(command)))
+
+
+def test_validate_execute_request_without_operation(agent_config: AgentDeploymentConfiguration) -> None:
+    agent = Agent(agent_config, SCHEMAS)
+    assert agent.validate_execute_request(_request_body(TextBlock.from_text("Hello"))) is None
+
+
+def test_validate_execute_single_operation(agent_config: AgentDeploymentConfiguration) -> None:
+    schemas = AgentSchemas(
+        execute={"echo": ExecuteSchema(request={"type": "object"}, response={"type": "string", "maxLength": 5})}
+    )
+    agent = Agent(agent_config, schemas)
+    assert agent.validate_execute_request(_request_body(DataBlock.from_data('{"a": 1}', sub_type="json"))) == "echo"
+    with pytest.raises(ExecuteRequestSchemaError):
+        agent.validate_execute_request(_request_body(TextBlock.from_text("Hello")))
+    with pytest.raises(ExecuteRequestSchemaError):
+        agent.validate_execute_request(_request_body())
+
+    source = str(AgentAddress.one())
+    agent.validate_execute_response("echo", DialogItem.new_text(source=source, text="Hello"))
+    with pytest.raises(ExecuteResponseSchemaError):
+        agent.validate_execute_response("echo", DialogItem.new_text(source=source, text="Hello World"))
+    with pytest.raises(ExecuteResponseSchemaError):
+        agent.validate_execute_response("echo", DialogItem.new(source=source, blocks=[]))
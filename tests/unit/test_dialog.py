@@ -1,8 +1,14 @@
 import json
-from typing import Final, Literal, Sequence, Tuple
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict, Final, List, Literal, Sequence, Tuple
+
+from pydantic import BaseModel
 
 from theoriq.biscuit import AgentAddress
 from theoriq.dialog import (
+    BaseData,
     BlockBase,
     BlockOfType,
     BlockOfTypes,
@@ -12,14 +18,18 @@ from theoriq.dialog import (
     DataBlock,
     Dialog,
     DialogItem,
+    DialogRenderer,
+    ErrorBlock,
     SuggestionsBlock,
     TextBlock,
+    TextData,
     ToolCallBlock,
     ToolCallResultBlock,
     UnknownBlock,
     UnknownCommandData,
     Web3ProposedTxBlock,
     Web3SignedTxBlock,
+    blocks_adapter,
     format_source_and_blocks,
 )
 from theoriq.dialog.command_items import CommandData, SearchCommandData
@@ -469,3 +479,187 @@ def test_command_item_with_multiple_names() -> None:
         pass
 
     assert MyCommand.get_names() == ("myCommand", "stillMyCommand")
+
+
+def test_blocks_adapter_matches_per_block_parsing() -> None:
+    blocks = [
+        {"type": "text:markdown", "data": {"text": "hello"}},
+        {"type": "code:python", "data": {"code": "print('hello')"}},
+        {"type": "data:json", "data": {"data": "{}"}},
+        {"type": "custom:weather", "data": {"data": {"city": "Toronto"}}},
+        {"type": "unregistered", "data": {"anything": 1}},
+    ]
+    parsed = blocks_adapter().validate_python(blocks)
+    assert parsed == [DialogItem.parse_block(block) for block in blocks]
+    assert [type(block) for block in parsed] == [TextBlock, CodeBlock, DataBlock, CustomBlock, UnknownBlock]
+    assert parsed[0].data.type == "markdown"
+    assert parsed[1].data.language == "python"
+    assert [block.model_dump() for block in parsed] == [
+        {"type": "text:markdown", "data": {"text": "hello", "type": "markdown"}},
+        {"type": "code:python", "data": {"code": "print('hello')", "language": "python"}},
+        {"type": "data:json", "data": {"data": "{}", "type": "json"}},
+        {"type": "custom:weather", "data": {"data": {"city": "Toronto"}}},
+        {"type": "unregistered", "data": {"anything": 1}},
+    ]
+
+
+def test_blocks_adapter_is_rebuilt_when_a_block_type_is_registered() -> None:
+    class ReviewData(BaseData):
+        rating: int
+
+    class ReviewBlock(BlockBase[ReviewData, Literal["review"]]):
+        pass
+
+    blocks = [{"type": "review", "data": {"rating": 5}}]
+    assert type(blocks_adapter().validate_python(blocks)[0]) is UnknownBlock
+
+    BlockBase.register(ReviewBlock)
+    block = blocks_adapter().validate_python(blocks)[0]
+    assert isinstance(block, ReviewBlock)
+    assert block.data.rating == 5
+
+
+def test_blocks_adapter_while_block_types_are_registered() -> None:
+    blocks = [{"type": "text:markdown", "data": {"text": "hello"}}, {"type": "custom:weather", "data": {"data": {}}}]
+    errors: List[BaseException] = []
+    stop = threading.Event()
+
+    def validate() -> None:
+        while not stop.is_set():
+            try:
+                assert [type(block) for block in blocks_adapter().validate_python(blocks)] == [TextBlock, CustomBlock]
+            except BaseException as e:
+                errors.append(e)
+                return
+
+    threads = [threading.Thread(target=validate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for _ in range(20):
+        BlockBase.register(TextBlock)
+        time.sleep(0.005)
+    stop.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert errors == []
+
+
+def test_last_item_queries_use_the_dialog_index() -> None:
+    dialog = Dialog.model_validate(dialog_payload)
+    by_max = max(dialog.items, key=lambda item: item.timestamp)
+    assert dialog.last_item is by_max
+    assert dialog.last_item_from(SourceType.Agent) is not None
+    assert dialog.last_item_predicate(lambda item: item.source == "0x" + "0" * 40) is None
+
+    new_item = DialogItem.new_text(source=RANDOM_AGENT_ADDRESS, text="newest")
+    dialog.items.append(new_item)
+    assert dialog.last_item is new_item
+    assert dialog.last_item_from(SourceType.Agent) is new_item
+
+    dialog.items[-1] = DialogItem.new_text(source=USER_ADDRESS, text="replaced")
+    assert dialog.last_item_from(SourceType.User) is dialog.items[-1]
+
+    # Replacing an item in the middle, or editing a timestamp in place, is detected
+    middle = len(dialog.items) // 2
+    dialog.items[middle] = DialogItem.new_text(source=RANDOM_AGENT_ADDRESS, text="middle")
+    assert dialog.last_item is dialog.items[middle]
+    dialog.items[0].timestamp = dialog.items[middle].timestamp + timedelta(seconds=1)
+    assert dialog.last_item is dialog.items[0]
+    dialog.items[0].source_type = SourceType.Agent
+    assert dialog.last_item_from(SourceType.Agent) is dialog.items[0]
+
+    assert Dialog(items=[]).last_item is None
+    assert Dialog(items=[]).last_item_predicate(lambda _: True) is None
+
+
+def test_block_index_matches_is_of_type() -> None:
+    item = DialogItem.new(
+        source=USER_ADDRESS,
+        blocks=[
+            TextBlock.from_text("first"),
+            CustomBlock.model_validate({"type": "custom:foo", "data": {"a": 1}}),
+            TextBlock.from_text("second", sub_type="markdown"),
+            CodeBlock.from_code("x = 1", "python"),
+        ],
+    )
+    for block_type in ["text", "text:markdown", "custom", "custom:foo", "custom:bar", "code", "co", "unknown"]:
+        expected = [block for block in item.blocks if block.is_of_type(block_type)]
+        assert item.find_all_blocks_of_type(block_type) == expected
+        assert item.has_blocks_of_type(block_type) == (len(expected) > 0)
+        assert item.find_last_block_of_type(block_type) == (expected[-1] if expected else None)
+
+    item.blocks.append(TextBlock.from_text("third"))
+    assert item.extract_last_text() == "third"
+
+    item.blocks[0] = CodeBlock.from_code("y = 2", "python")
+    item.invalidate_index()
+    assert len(item.find_all_blocks_of_type("code")) == 2
+
+
+def test_fast_serialization_matches_dump_defaults() -> None:
+    defaults: Dict[str, Any] = {"by_alias": True, "exclude_none": True, "exclude_defaults": True, "exclude_unset": True}
+
+    class ExtendedTextData(TextData):
+        extra: str
+
+    built = DialogItem.new(
+        source=USER_ADDRESS,
+        blocks=[
+            TextBlock(data=ExtendedTextData(text="hello", extra="kept"), block_type="text"),
+            CodeBlock.from_code("x = 1", "python"),
+            DataBlock.from_data('{"a": 1}', "json"),
+            ErrorBlock.from_error("Error", "message"),
+            CommandBlock.from_command(UnknownCommandData(name="sum", arguments={"values": [1, 2]})),
+        ],
+    )
+    dialogs = [Dialog(items=[built])]
+    dialogs += [
+        Dialog.model_validate(payload)
+        for payload in [dialog_payload, dialog_commands_payload, dialog_web3_payload, dialog_tools_payload]
+    ]
+    assert json.loads(built.model_dump_json())["blocks"][0]["data"]["extra"] == "kept"
+    for dialog in dialogs:
+        for model in [dialog, *dialog.items, *(block for item in dialog.items for block in item.blocks)]:
+            expected_json = BaseModel.model_dump_json(model, **defaults)
+            assert model.model_dump_json() == expected_json
+            assert model.model_dump_json_bytes() == expected_json.encode("utf-8")
+            assert model.model_dump() == BaseModel.model_dump(model, **defaults)
+
+    assert TextBlock.model_json_schema(mode="serialization") == TextBlock.model_json_schema(mode="validation")
+
+
+def test_dialog_renderer_matches_format_as_markdown() -> None:
+    for payload in [dialog_payload, dialog_commands_payload, dialog_web3_payload, dialog_tools_payload]:
+        dialog = Dialog.model_validate(payload)
+        assert DialogRenderer().render(dialog) == dialog.format_as_markdown()
+        assert DialogRenderer(indent=2).render(dialog) == dialog.format_as_markdown(indent=2)
+
+
+def test_dialog_renderer_keeps_newest_items_within_budget() -> None:
+    dialog = Dialog(items=[DialogItem.new_text(source=USER_ADDRESS, text=f"message {i} " * 10) for i in range(50)])
+    newest = Dialog(items=dialog.items[-3:]).format_as_markdown()
+
+    rendered = DialogRenderer(max_chars=len(newest)).render(dialog)
+    assert rendered == newest
+    assert (
+        DialogRenderer(max_chars=len(newest) - 1).render(dialog) == Dialog(items=dialog.items[-2:]).format_as_markdown()
+    )
+
+    by_tokens = DialogRenderer(max_tokens=100, count_tokens=lambda text: len(text.split())).render(dialog)
+    assert 0 < len(by_tokens.split()) <= 100
+    assert by_tokens.endswith("message 49 ")
+
+    # The newest item is kept even when it exceeds the budget on its own
+    assert DialogRenderer(max_chars=1).render(dialog) == Dialog(items=dialog.items[-1:]).format_as_markdown()
+
+
+def test_dialog_renderer_caches_rendered_blocks() -> None:
+    item = DialogItem.new_text(source=USER_ADDRESS, text="hello")
+    renderer = DialogRenderer()
+    assert "hello" in renderer.render_item(item)
+
+    block = item.blocks[0]
+    assert isinstance(block, TextBlock)
+    block.data = TextData(text="world")
+    assert "world" in renderer.render_item(item)
@@ -0,0 +1,134 @@
+import copy
+
+import pydantic
+import pytest
+
+from theoriq.api.v1alpha2.schemas import ExecuteRequestBody, LazyExecuteRequestBody
+from theoriq.dialog import DialogItemCache, TextBlock
+from theoriq.types import SourceType
+
+USER_ADDRESS = "0x1F32Bc2B1Ace25D762E22888a71C7eC0799D379f"
+
+
+def _raw_item(text: str, timestamp: str = "2024-11-04T20:00:39Z") -> dict:
+    return {
+        "sourceType": str(SourceType.User),
+        "source": USER_ADDRESS,
+        "timestamp": timestamp,
+        "blocks": [{"data": {"text": text}, "type": "text"}],
+    }
+
+
+def _request(*texts: str) -> dict:
+    return {"dialog": {"items": [_raw_item(text, f"2024-11-04T20:00:{i:02}Z") for i, text in enumerate(texts)]}}
+
+
+def test_only_new_items_are_validated() -> None:
+    cache = DialogItemCache(max_size=10)
+
+    first = ExecuteRequestBody.model_validate(_request("hello"), context=cache.validation_context())
+    second = ExecuteRequestBody.model_validate(_request("hello", "world"), context=cache.validation_context())
+
+    assert (cache.hits, cache.misses, cache.size) == (1, 2, 2)
+    assert cache.hit_ratio == pytest.approx(1 / 3)
+    assert cache.size_bytes > 0
+    assert second.dialog.items[0] == first.dialog.items[0]
+    assert second == ExecuteRequestBody.model_validate(_request("hello", "world"))
+
+
+def test_cached_items_are_read_only() -> None:
+    cache = DialogItemCache(max_size=10)
+
+    first = ExecuteRequestBody.model_validate(_request("hello"), context=cache.validation_context())
+    second = ExecuteRequestBody.model_validate(_request("hello"), context=cache.validation_context())
+    assert cache.hits == 1
+    # Hits share the cached item instead of copying it
+    item = second.dialog.items[0]
+    assert item is first.dialog.items[0]
+
+    block = item.blocks[0]
+    assert isinstance(block, TextBlock)
+    with pytest.raises(TypeError):
+        block.data.text = "modified"
+    with pytest.raises(TypeError):
+        item.blocks.append(TextBlock.from_text("appended"))
+    with pytest.raises(TypeError):
+        item.source_type = SourceType.Agent
+
+    copied = item.model_copy(deep=True)
+    copied.blocks[0].data.text = "modified"
+    copied.blocks.append(TextBlock.from_text("appended"))
+    assert [b.data.text for b in copied.blocks] == ["modified", "appended"]
+    assert [b.data.text for b in item.blocks] == ["hello"]
+
+
+def _request_with_nested_data() -> dict:
+    raw_item = {
+        "sourceType": str(SourceType.User),
+        "source": USER_ADDRESS,
+        "timestamp": "2024-11-04T20:00:39Z",
+        "blocks": [
+            {"type": "custom:weather", "data": {"data": {"k1": "v1", "nested": {"list": [1, 2]}}}},
+            {"type": "unregistered", "data": {"k1": "v1", "list": [{"a": 1}]}},
+        ],
+    }
+    return {"dialog": {"items": [raw_item]}}
+
+
+def test_nested_block_data_is_read_only() -> None:
+    cache = DialogItemCache(max_size=10)
+
+    first = ExecuteRequestBody.model_validate(_request_with_nested_data(), context=cache.validation_context())
+    custom_block, unknown_block = first.dialog.items[0].blocks
+    with pytest.raises(TypeError):
+        custom_block.data.data["k2"] = "MUT"
+    with pytest.raises(TypeError):
+        custom_block.data.data["data"]["nested"]["list"].append(3)
+    with pytest.raises(TypeError):
+        unknown_block.data["list"][0]["a"] = "MUT"
+
+    expected = ExecuteRequestBody.model_validate(_request_with_nested_data())
+    body = ExecuteRequestBody.model_validate(_request_with_nested_data(), context=cache.validation_context())
+    assert cache.hits == 1
+    assert body == expected
+    assert body.model_dump_json() == expected.model_dump_json()
+
+    copied = copy.deepcopy(body.dialog.items[0].blocks[1].data)
+    copied["list"].append("MUT")
+    assert type(copied) is dict and type(copied["list"][0]) is dict
+    assert body == expected
+
+
+def test_cache_is_bounded() -> None:
+    cache = DialogItemCache(max_size=2)
+    for text in ["a", "b", "c"]:
+        cache.get_or_validate(_raw_item(text))
+    assert (cache.size, cache.evictions) == (2, 1)
+
+    cache.get_or_validate(_raw_item("a"))
+    assert cache.hits == 0
+
+    size = cache.size_bytes
+    cache = DialogItemCache(max_size=10, max_bytes=size)
+    for text in ["a", "b", "c"]:
+        cache.get_or_validate(_raw_item(text))
+    assert cache.size_bytes <= size
+
+
+def test_invalid_items_are_not_cached() -> None:
+    cache = DialogItemCache(max_size=10)
+    request = _request("hello")
+    request["dialog"]["items"].append({**_raw_item("world"), "source": "invalid"})
+
+    with pytest.raises(pydantic.ValidationError) as e:
+        ExecuteRequestBody.model_validate(request, context=cache.validation_context())
+    assert e.value.errors()[0]["loc"][:3] == ("dialog", "items", 1)
+    assert cache.size == 0
+
+
+def test_lazy_request_body_uses_the_cache() -> None:
+    cache = DialogItemCache(max_size=10)
+    for _ in range(2):
+        body = LazyExecuteRequestBody.from_raw(_request("hello", "world"), cache)
+        assert body.last_item is not None
+    assert (cache.hits, cache.misses) == (1, 1)
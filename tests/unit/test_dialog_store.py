@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta, timezone
+
+from theoriq.dialog import CodeBlock, Dialog, DialogItem, DialogStore, TextBlock
+from theoriq.types import SourceType
+
+from .test_dialog import dialog_commands_payload, dialog_payload, dialog_tools_payload, dialog_web3_payload
+
+USER_ADDRESS = "0x1F32Bc2B1Ace25D762E22888a71C7eC0799D379f"
+
+
+def test_dialog_store_round_trip() -> None:
+    for payload in [dialog_payload, dialog_commands_payload, dialog_web3_payload, dialog_tools_payload]:
+        dialog = Dialog.model_validate(payload)
+        store = DialogStore.from_dialog(dialog)
+
+        restored = store.to_dialog()
+        assert len(store) == len(dialog.items)
+        assert restored == dialog
+        assert restored.model_dump_json() == dialog.model_dump_json()
+        assert [store.timestamp(i).isoformat() for i in range(len(store))] == [
+            item.timestamp.isoformat() for item in dialog.items
+        ]
+
+
+def test_dialog_store_keeps_time_zones() -> None:
+    timestamps = [
+        datetime(2024, 11, 4, 20, 0, 39, 123456, tzinfo=timezone.utc),
+        datetime(2024, 11, 4, 16, 0, 39, tzinfo=timezone(timedelta(hours=-4))),
+        datetime(1960, 1, 1, 0, 0, 0),
+    ]
+    store = DialogStore()
+    for timestamp in timestamps:
+        item = DialogItem.new_text(source=USER_ADDRESS, text="hello")
+        item.timestamp = timestamp
+        store.append(item)
+
+    for index, timestamp in enumerate(timestamps):
+        assert store.timestamp(index) == timestamp
+        assert store.timestamp(index).isoformat() == timestamp.isoformat()
+
+
+def test_dialog_store_is_append_only() -> None:
+    store = DialogStore([DialogItem.new_text(source=USER_ADDRESS, text="hello")])
+    agent_address = "0x" + "ab" * 32
+    store.append(DialogItem.new(agent_address, [TextBlock.from_text("hi"), CodeBlock.from_code("x = 1", "python")]))
+
+    assert len(store) == 2
+    assert store.source_type(1) == SourceType.Agent
+    other = DialogStore([DialogItem.new_text(source="".join(["0x", "ab" * 32]), text="hello")])
+    assert other.source(0) is store.source(1)
+    assert [type(block) for block in store[-1].blocks] == [TextBlock, CodeBlock]
+    assert store[0].extract_last_text() == "hello"
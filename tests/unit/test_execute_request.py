@@ -1,4 +1,11 @@
-from theoriq.api.v1alpha2.schemas import ExecuteRequestBody
+from datetime import datetime
+from typing import List
+
+import pytest
+from pydantic import ValidationError
+
+from theoriq.api.v1alpha2.schemas import ExecuteRequestBody, LazyExecuteRequestBody
+from theoriq.dialog import DialogItem
 from theoriq.types import SourceType
 
 request_payload = {
@@ -63,3 +70,68 @@ def test_last_item_from() -> None:
     li = e.last_item_from(SourceType.Agent)
     assert li is not None
     assert li.source == "0xa271094f9b32aa6fb20c8de5e6cdb06e41603415fc749c7a43e46d5875f93c9f"
+
+
+def test_lazy_request_body_only_validates_accessed_items() -> None:
+    e = LazyExecuteRequestBody.from_raw(request_payload)
+    assert isinstance(e, ExecuteRequestBody)
+    assert e.dialog.lazy_items.materialized_count == 0
+
+    expected = ExecuteRequestBody.model_validate(request_payload)
+    assert e.last_item == expected.last_item
+    assert e.dialog.lazy_items.materialized_count == 1
+
+    assert e.last_item_from(SourceType.Agent) == expected.last_item_from(SourceType.Agent)
+    assert e.dialog.lazy_items.materialized_count == 2
+
+
+def test_lazy_request_body_full_validation() -> None:
+    e = LazyExecuteRequestBody.from_raw(request_payload)
+    expected = ExecuteRequestBody.model_validate(request_payload)
+    assert e.validate_all() == expected
+    assert e.model_dump() == expected.model_dump()
+    assert e.dialog.format_as_markdown() == expected.dialog.format_as_markdown()
+
+
+def test_lazy_request_body_rejects_invalid_items_on_access() -> None:
+    payload = {"dialog": {"items": [{"sourceType": "user", "timestamp": "2024-11-10T11:06:01Z", "blocks": []}]}}
+    e = LazyExecuteRequestBody.from_raw(payload)
+    with pytest.raises(ValidationError):
+        _ = e.last_item
+
+    with pytest.raises(ValidationError):
+        LazyExecuteRequestBody.from_raw({"dialog": {"items": "not a list"}})
+
+    with pytest.raises(ValidationError):
+        LazyExecuteRequestBody.from_raw({"dialog": {"items": ["not an object"]}})
+    with pytest.raises(ValidationError):
+        LazyExecuteRequestBody.from_raw({"configuration": {"fromRef": {"hash": "h"}}, "dialog": {"items": []}})
+
+
+def test_lazy_request_body_rejects_malformed_timestamps() -> None:
+    source = "0x1F32Bc2B1Ace25D762E22888a71C7eC0799D379f"
+    item = {"sourceType": "user", "source": source, "timestamp": "yesterday", "blocks": []}
+    e = LazyExecuteRequestBody.from_raw({"dialog": {"items": [item]}})
+    with pytest.raises(ValidationError):
+        _ = e.last_item
+
+
+def test_lazy_request_body_parses_timestamps_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    e = LazyExecuteRequestBody.from_raw(request_payload)
+    expected = ExecuteRequestBody.model_validate(request_payload)
+    parsed: List[str] = []
+    parse = DialogItem._datetime_from_str
+
+    def counting_parse(value: str) -> datetime:
+        parsed.append(value)
+        return parse(value)
+
+    monkeypatch.setattr(DialogItem, "_datetime_from_str", counting_parse)
+
+    assert e.last_item == expected.last_item
+    assert e.last_item_from(SourceType.Agent) == expected.last_item_from(SourceType.Agent)
+    count = len(parsed)
+    for _ in range(3):
+        assert e.last_item == expected.last_item
+        assert e.last_item_from(SourceType.Agent) == expected.last_item_from(SourceType.Agent)
+    assert len(parsed) == count
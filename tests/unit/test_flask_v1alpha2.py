@@ -1,5 +1,8 @@
 import json
+import os
+import shutil
 import uuid
+from typing import Any, Iterator, List, Union
 
 import pytest
 from biscuit_auth import PrivateKey
@@ -7,16 +10,33 @@ from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
 from flask import Flask
 from flask.testing import FlaskClient
 from tests.unit.fixtures import *  # noqa: F403
+from werkzeug.test import EnvironBuilder
 
-from theoriq.api.v1alpha2.agent import AgentDeploymentConfiguration
+from theoriq.api.common import ExecuteRuntimeError
+from theoriq.api.v1alpha2.agent import Agent, AgentDeploymentConfiguration
+from theoriq.api.v1alpha2.configure import AgentConfigurator
 from theoriq.api.v1alpha2.execute import ExecuteContext, ExecuteResponse
-from theoriq.api.v1alpha2.schemas import ChallengeResponseBody, ExecuteRequestBody
+from theoriq.api.v1alpha2.schemas import (
+    AgentSchemas,
+    ChallengeResponseBody,
+    ExecuteRequestBody,
+    ExecuteSchema,
+    LazyExecuteRequestBody,
+)
 from theoriq.biscuit import AgentAddress
-from theoriq.dialog import DialogItem
-from theoriq.extra.flask.v1alpha2.flask import theoriq_blueprint
+from theoriq.dialog import BlockBase, DialogItem, DialogItemCache, TextBlock
+from theoriq.extra.flask import AdmissionController, ExecuteReplayCache, ResponseCompression
+from theoriq.extra.flask.common import theoriq_system_blueprint
+from theoriq.extra.flask.v1alpha2.flask import (
+    theoriq_blueprint,
+    theoriq_configuration_blueprint,
+    theoriq_schemas_blueprint,
+)
+from theoriq.extra.globals import agent_var
 from theoriq.types import SourceType
+from theoriq.utils import GZIP_CODING, MSGPACK_ENCODING, accept_header
 
-from .. import OsEnviron
+from .. import DATA_DIR, OsEnviron
 from .utils import new_biscuit_for_request, new_request_facts
 
 
@@ -53,6 +73,103 @@ def test_send_sign_challenge(client: FlaskClient, agent_public_key: Ed25519Publi
     assert challenge_response.nonce == nonce
 
 
+def test_system_endpoints_support_etag(client: FlaskClient):
+    for path in ["/system/livez", "/system/public-key", "/system/agent", "/schemas", "/configuration/schema"]:
+        response = client.get(f"/api/v1alpha2{path}")
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+
+        cached_response = client.get(f"/api/v1alpha2{path}", headers={"If-None-Match": etag})
+        assert cached_response.status_code == 304
+        assert cached_response.get_data() == b""
+
+
+def test_public_key_endpoint(client: FlaskClient, agent_config: AgentDeploymentConfiguration):
+    response = client.get("/api/v1alpha2/system/public-key")
+    assert response.json == {
+        "publicKey": f"0x{agent_config.public_key.to_hex()}",
+        "keyType": "ed25519",
+        "keccak256Hash": str(agent_config.address),
+    }
+
+
+def test_system_blueprint_without_agent_config(agent_config: AgentDeploymentConfiguration):
+    def set_agent() -> None:
+        agent_var.set(Agent(agent_config))
+
+    app = Flask(__name__)
+    app.before_request(set_agent)
+    app.register_blueprint(theoriq_system_blueprint())
+    client = app.test_client()
+
+    response = client.get("/system/public-key")
+    assert response.status_code == 200
+    assert response.json is not None and response.json["keccak256Hash"] == str(agent_config.address)
+
+
+def test_schemas_blueprints_without_schemas(agent_config: AgentDeploymentConfiguration):
+    schemas = AgentSchemas(
+        configuration={"type": "object"},
+        execute={"echo": ExecuteSchema(request={"type": "string"}, response={"type": "string"})},
+    )
+
+    def set_agent() -> None:
+        agent_var.set(Agent(agent_config, schemas))
+
+    app = Flask(__name__)
+    app.before_request(set_agent)
+    app.register_blueprint(theoriq_configuration_blueprint(AgentConfigurator.default()))
+    app.register_blueprint(theoriq_schemas_blueprint())
+    client = app.test_client()
+
+    assert client.get("/configuration/schema").json == {"type": "object"}
+    assert client.get("/schemas").json == json.loads(json.dumps(schemas.model_dump()))
+
+
+def test_compressed_responses_have_a_weak_etag(agent_config: AgentDeploymentConfiguration):
+    app = Flask(__name__)
+    compression = ResponseCompression(min_size=1)
+    app.register_blueprint(theoriq_blueprint(agent_config, echo_last_prompt, response_compression=compression))
+    client = app.test_client()
+
+    identity = client.get("/api/v1alpha2/system/public-key")
+    assert "Content-Encoding" not in identity.headers
+    assert not identity.headers["ETag"].startswith("W/")
+
+    compressed = client.get("/api/v1alpha2/system/public-key", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["ETag"] == f"W/{identity.headers['ETag']}"
+
+    for etag in (compressed.headers["ETag"], identity.headers["ETag"]):
+        cached = client.get(
+            "/api/v1alpha2/system/public-key", headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+        )
+        assert cached.status_code == 304
+        assert cached.headers["ETag"] == compressed.headers["ETag"]
+
+
+def test_agent_data_is_reloaded_when_yaml_changes(tmp_path, agent_config: AgentDeploymentConfiguration):
+    yaml_path = tmp_path / "agent.yaml"
+    shutil.copy(os.path.join(DATA_DIR, "basic", "basic_agent_a.yaml"), yaml_path)
+
+    with OsEnviron("AGENT_YAML_PATH", str(yaml_path)):
+        app = Flask(__name__)
+        app.register_blueprint(theoriq_blueprint(agent_config, echo_last_prompt))
+        client = app.test_client()
+
+    response = client.get("/api/v1alpha2/system/agent")
+    assert json.loads(response.get_data())["metadata"]["metadata"]["name"] == "Basic Agent A"
+    etag = response.headers["ETag"]
+
+    shutil.copy(os.path.join(DATA_DIR, "basic", "basic_agent_b.yaml"), yaml_path)
+    os.utime(yaml_path, ns=(0, os.stat(yaml_path).st_mtime_ns + 1_000_000_000))
+
+    response = client.get("/api/v1alpha2/system/agent", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert json.loads(response.get_data())["metadata"]["metadata"]["name"] == "Basic Agent B"
+    assert response.headers["ETag"] != etag
+
+
 def test_send_execute_request(
     theoriq_private_key: PrivateKey, agent_kp, agent_config: AgentDeploymentConfiguration, client: FlaskClient
 ):
@@ -132,6 +249,285 @@ def test_send_chat_completion_request(
         assert textblock.data.text == "My name is John Doe"
 
 
+def test_send_execute_request_not_matching_schema_returns_400(
+    theoriq_private_key: PrivateKey, agent_config: AgentDeploymentConfiguration
+):
+    schemas = AgentSchemas(
+        execute={"echo": ExecuteSchema(request={"type": "string", "maxLength": 5}, response={"type": "string"})}
+    )
+    app = Flask(__name__)
+    app.register_blueprint(theoriq_blueprint(agent_config, echo_last_prompt, schemas, validate_execute_payloads=True))
+    client = app.test_client()
+
+    with OsEnviron("THEORIQ_URI", "http://mock_flask_test"):
+        from_address = AgentAddress.random()
+        for text, expected_status in [("Hello", 200), ("My name is John Doe", 400)]:
+            req_body_bytes = _build_request_body_bytes(text, from_address)
+            request_facts = new_request_facts(req_body_bytes, from_address, agent_config.address)
+            req_biscuit = new_biscuit_for_request(request_facts, theoriq_private_key)
+            response = client.post("/api/v1alpha2/execute", data=req_body_bytes, headers=req_biscuit.to_headers())
+            assert response.status_code == expected_status
+
+
+def test_send_execute_request_with_response_not_matching_schema_returns_error_block(
+    theoriq_private_key: PrivateKey, agent_config: AgentDeploymentConfiguration
+):
+    schemas = AgentSchemas(
+        execute={"echo": ExecuteSchema(request={"type": "string"}, response={"type": "string", "maxLength": 3})}
+    )
+    app = Flask(__name__)
+    app.register_blueprint(theoriq_blueprint(agent_config, echo_last_prompt, schemas, validate_execute_payloads=True))
+    client = app.test_client()
+
+    with OsEnviron("THEORIQ_URI", "http://mock_flask_test"):
+        from_address = AgentAddress.random()
+        req_body_bytes = _build_request_body_bytes("Hello", from_address)
+        request_facts = new_request_facts(req_body_bytes, from_address, agent_config.address)
+        req_biscuit = new_biscuit_for_request(request_facts, theoriq_private_key)
+        response = client.post("/api/v1alpha2/execute", data=req_body_bytes, headers=req_biscuit.to_headers())
+        assert response.status_code == 200
+
+        assert response.json is not None
+        block = response.json["blocks"][0]
+        assert block["type"] == "error" and block["data"]["err"] == "InvalidResponse"
+
+
+def test_duplicate_execute_request_is_replayed(
+    theoriq_private_key: PrivateKey, agent_config: AgentDeploymentConfiguration
+):
+    calls = []
+
+    def execute(context: ExecuteContext, request: ExecuteRequestBody) -> ExecuteResponse:
+        calls.append(request)
+        return echo_last_prompt(context, request)
+
+    replay_cache = ExecuteReplayCache(ttl=10, max_size=10)
+    app = Flask(__name__)
+    app.register_blueprint(theoriq_blueprint(agent_config, execute, replay_cache=replay_cache))
+    client = app.test_client()
+
+    with OsEnviron("THEORIQ_URI", "http://mock_flask_test"):
+        from_address = AgentAddress.random()
+        req_body_bytes = _build_request_body_bytes("My name is John Doe", from_address)
+        request_facts = new_request_facts(req_body_bytes, from_address, agent_config.address)
+        req_biscuit = new_biscuit_for_request(request_facts, theoriq_private_key)
+
+        first = client.post("/api/v1alpha2/execute", data=req_body_bytes, headers=req_biscuit.to_headers())
+        second = client.post("/api/v1alpha2/execute", data=req_body_bytes, headers=req_biscuit.to_headers())
+        assert first.status_code == second.status_code == 200
+        assert second.get_data() == first.get_data()
+        assert second.headers["authorization"] == first.headers["authorization"]
+        assert len(calls) == 1
+
+
+def test_execute_request_over_sender_rate_returns_429(
+    theoriq_private_key: PrivateKey, agent_config: AgentDeploymentConfiguration
+):
+    admission_controller = AdmissionController(rate_per_sender=0.001, burst_per_sender=1)
+    app = Flask(__name__)
+    app.register_blueprint(theoriq_blueprint(agent_config, echo_last_prompt, admission_controller=admission_controller))
+    client = app.test_client()
+
+    with OsEnviron("THEORIQ_URI", "http://mock_flask_test"):
+        from_address = AgentAddress.random()
+        for expected_status in [200, 429]:
+            req_body_bytes = _build_request_body_bytes("My name is John Doe", from_address)
+            request_facts = new_request_facts(req_body_bytes, from_address, agent_config.address)
+            req_biscuit = new_biscuit_for_request(request_facts, theoriq_private_key)
+            response = client.post("/api/v1alpha2/execute", data=req_body_bytes, headers=req_biscuit.to_headers())
+            assert response.status_code == expected_status
+            assert response.headers["authorization"].startswith("bearer ")
+
+    assert admission_controller.in_flight == 0
+
+
+def test_send_execute_stream_request(theoriq_private_key: PrivateKey, agent_config: AgentDeploymentConfiguration):
+    def execute_stream(_context: ExecuteContext, request: ExecuteRequestBody) -> Iterator[Union[BlockBase, str]]:
+        yield "My name "
+        yield "is John Doe"
+        yield TextBlock.from_text(request.last_text)
+        raise ExecuteRuntimeError("Stopped")
+
+    app = Flask(__name__)
+    app.register_blueprint(theoriq_blueprint(agent_config, echo_last_prompt, execute_stream_fn=execute_stream))
+    client = app.test_client()
+
+    with OsEnviron("THEORIQ_URI", "http://mock_flask_test"):
+        from_address = AgentAddress.random()
+        req_body_bytes = _build_request_body_bytes("My name is John Doe", from_address)
+        request_facts = new_request_facts(req_body_bytes, from_address, agent_config.address)
+        req_biscuit = new_biscuit_for_request(request_facts, theoriq_private_key)
+        response = client.post("/api/v1alpha2/execute-stream", data=req_body_bytes, headers=req_biscuit.to_headers())
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+
+    events = [event.split("\n") for event in response.get_data(as_text=True).split("\n\n") if event]
+    assert [event[0] for event in events] == [
+        "event: text",
+        "event: text",
+        "event: block",
+        "event: block",
+        "event: biscuit",
+    ]
+    assert json.loads(events[1][1].removeprefix("data: ")) == {"text": "is John Doe"}
+    assert json.loads(events[2][1].removeprefix("data: "))["data"]["text"] == "My name is John Doe"
+    assert json.loads(events[3][1].removeprefix("data: "))["data"]["err"] == "Stopped"
+
+
+def test_execute_stream_releases_admission_slot_when_closed_without_iteration(
+    theoriq_private_key: PrivateKey, agent_config: AgentDeploymentConfiguration
+):
+    def execute_stream(_context: ExecuteContext, request: ExecuteRequestBody) -> Iterator[Union[BlockBase, str]]:
+        yield TextBlock.from_text(request.last_text)
+
+    controller = AdmissionController(max_in_flight=1)
+    app = Flask(__name__)
+    app.register_blueprint(
+        theoriq_blueprint(
+            agent_config, echo_last_prompt, execute_stream_fn=execute_stream, admission_controller=controller
+        )
+    )
+
+    with OsEnviron("THEORIQ_URI", "http://mock_flask_test"):
+        from_address = AgentAddress.random()
+        req_body_bytes = _build_request_body_bytes("Hello", from_address)
+        request_facts = new_request_facts(req_body_bytes, from_address, agent_config.address)
+        req_biscuit = new_biscuit_for_request(request_facts, theoriq_private_key)
+        environ = EnvironBuilder(
+            "/api/v1alpha2/execute-stream",
+            method="POST",
+            data=req_body_bytes,
+            headers=list(req_biscuit.to_headers().items()),
+        ).get_environ()
+        statuses: List[str] = []
+
+        def start_response(status: str, headers: Any, exc_info: Any = None) -> Any:
+            statuses.append(status)
+
+        app_iter = app.wsgi_app(environ, start_response)
+        assert statuses == ["200 OK"]
+        assert controller.in_flight == 1
+        app_iter.close()  # type: ignore[attr-defined]
+
+    assert controller.in_flight == 0
+
+
+def test_send_execute_request_with_lazy_request_body(
+    theoriq_private_key: PrivateKey, agent_config: AgentDeploymentConfiguration
+):
+    bodies = []
+
+    def execute(context: ExecuteContext, request: ExecuteRequestBody) -> ExecuteResponse:
+        bodies.append(request)
+        return echo_last_prompt(context, request)
+
+    app = Flask(__name__)
+    app.register_blueprint(theoriq_blueprint(agent_config, execute, lazy_request_body=True))
+    client = app.test_client()
+
+    with OsEnviron("THEORIQ_URI", "http://mock_flask_test"):
+        from_address = AgentAddress.random()
+        req_body_bytes = _build_request_body_bytes("My name is John Doe", from_address)
+        request_facts = new_request_facts(req_body_bytes, from_address, agent_config.address)
+        req_biscuit = new_biscuit_for_request(request_facts, theoriq_private_key)
+        response = client.post("/api/v1alpha2/execute", data=req_body_bytes, headers=req_biscuit.to_headers())
+        assert response.status_code == 200
+        assert DialogItem.model_validate(response.get_json()).blocks[0].data.text == "My name is John Doe"
+
+    assert isinstance(bodies[0], LazyExecuteRequestBody)
+
+
+def test_send_execute_requests_with_dialog_item_cache(
+    theoriq_private_key: PrivateKey, agent_config: AgentDeploymentConfiguration
+):
+    dialog_item_cache = DialogItemCache(max_size=10)
+    app = Flask(__name__)
+    app.register_blueprint(theoriq_blueprint(agent_config, echo_last_prompt, dialog_item_cache=dialog_item_cache))
+    client = app.test_client()
+
+    with OsEnviron("THEORIQ_URI", "http://mock_flask_test"):
+        from_address = AgentAddress.random()
+        req_body_bytes = _build_request_body_bytes("My name is John Doe", from_address)
+        for _ in range(2):
+            request_facts = new_request_facts(req_body_bytes, from_address, agent_config.address)
+            req_biscuit = new_biscuit_for_request(request_facts, theoriq_private_key)
+            response = client.post("/api/v1alpha2/execute", data=req_body_bytes, headers=req_biscuit.to_headers())
+            assert response.status_code == 200
+            assert DialogItem.model_validate(response.get_json()).blocks[0].data.text == "My name is John Doe"
+
+    assert (dialog_item_cache.hits, dialog_item_cache.misses) == (1, 1)
+
+
+def test_send_execute_request_with_msgpack_body(
+    theoriq_private_key: PrivateKey, agent_config: AgentDeploymentConfiguration, client: FlaskClient
+):
+    msgpack = pytest.importorskip("msgpack")
+
+    with OsEnviron("THEORIQ_URI", "http://mock_flask_test"):
+        from_address = AgentAddress.random()
+        req_body_bytes = msgpack.packb(json.loads(_build_request_body_bytes("My name is John Doe", from_address)))
+        request_facts = new_request_facts(req_body_bytes, from_address, agent_config.address)
+        req_biscuit = new_biscuit_for_request(request_facts, theoriq_private_key)
+        headers = {**req_biscuit.to_headers(), "Content-Type": MSGPACK_ENCODING.content_type}
+        headers["Accept"] = accept_header(MSGPACK_ENCODING)
+        response = client.post("/api/v1alpha2/execute", data=req_body_bytes, headers=headers)
+        assert response.status_code == 200
+        assert response.content_type == MSGPACK_ENCODING.content_type
+
+        dialog_item = DialogItem.model_validate(msgpack.unpackb(response.get_data()))
+        assert dialog_item.blocks[0].data.text == "My name is John Doe"
+
+
+def test_send_execute_request_with_unsupported_content_type_returns_415(
+    theoriq_private_key: PrivateKey, agent_config: AgentDeploymentConfiguration, client: FlaskClient
+):
+    with OsEnviron("THEORIQ_URI", "http://mock_flask_test"):
+        from_address = AgentAddress.random()
+        req_body_bytes = _build_request_body_bytes("My name is John Doe", from_address)
+        request_facts = new_request_facts(req_body_bytes, from_address, agent_config.address)
+        req_biscuit = new_biscuit_for_request(request_facts, theoriq_private_key)
+        headers = {**req_biscuit.to_headers(), "Content-Type": "application/cbor"}
+        response = client.post("/api/v1alpha2/execute", data=req_body_bytes, headers=headers)
+        assert response.status_code == 415
+
+
+def test_send_execute_request_with_compressed_body(
+    theoriq_private_key: PrivateKey, agent_config: AgentDeploymentConfiguration
+):
+    app = Flask(__name__)
+    compression = ResponseCompression(min_size=100)
+    app.register_blueprint(theoriq_blueprint(agent_config, echo_last_prompt, response_compression=compression))
+    client = app.test_client()
+
+    with OsEnviron("THEORIQ_URI", "http://mock_flask_test"):
+        from_address = AgentAddress.random()
+        text = "My name is John Doe. " * 50
+        req_body_bytes = _build_request_body_bytes(text, from_address)
+        # The payload hash of the biscuit is computed over the uncompressed body
+        request_facts = new_request_facts(req_body_bytes, from_address, agent_config.address)
+        req_biscuit = new_biscuit_for_request(request_facts, theoriq_private_key)
+        headers = {**req_biscuit.to_headers(), "Content-Encoding": "gzip", "Accept-Encoding": "gzip"}
+        response = client.post("/api/v1alpha2/execute", data=GZIP_CODING.compress(req_body_bytes), headers=headers)
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+
+        dialog_item = DialogItem.model_validate(json.loads(GZIP_CODING.decompress(response.get_data())))
+        assert dialog_item.blocks[0].data.text == text
+
+
+def test_send_execute_request_with_unsupported_content_encoding_returns_415(
+    theoriq_private_key: PrivateKey, agent_config: AgentDeploymentConfiguration, client: FlaskClient
+):
+    with OsEnviron("THEORIQ_URI", "http://mock_flask_test"):
+        from_address = AgentAddress.random()
+        req_body_bytes = _build_request_body_bytes("My name is John Doe", from_address)
+        request_facts = new_request_facts(req_body_bytes, from_address, agent_config.address)
+        req_biscuit = new_biscuit_for_request(request_facts, theoriq_private_key)
+        headers = {**req_biscuit.to_headers(), "Content-Encoding": "br"}
+        response = client.post("/api/v1alpha2/execute", data=req_body_bytes, headers=headers)
+        assert response.status_code == 415
+
+
 def echo_last_prompt(_context: ExecuteContext, request: ExecuteRequestBody) -> ExecuteResponse:
     last_prompt = request.last_item.blocks[0].data.text if request.last_item else "should fail"
 
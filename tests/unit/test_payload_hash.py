@@ -1,6 +1,6 @@
 import pytest
 
-from theoriq.biscuit import PayloadHash
+from theoriq.biscuit import IncrementalPayloadHash, PayloadHash
 
 
 def test_equality():
@@ -37,3 +37,12 @@ def test_invalid_hash():
 
     with pytest.raises(ValueError):
         PayloadHash.from_hash("z3c3945ef8015911102145011bb2b2d3bb31bd784aa8b19b38ad168a92777a15")
+
+
+def test_incremental_payload_hash():
+    payload = b"event: text\ndata: hello\n\n" * 10
+    incremental_hash = IncrementalPayloadHash()
+    for i in range(0, len(payload), 7):
+        incremental_hash.update(payload[i : i + 7])
+
+    assert incremental_hash.payload_hash() == PayloadHash(payload)
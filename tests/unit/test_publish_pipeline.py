@@ -0,0 +1,173 @@
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from theoriq.api.v1alpha2 import ProtocolClient
+from theoriq.api.v1alpha2.protocol.biscuit_provider import BiscuitProvider
+from theoriq.api.v1alpha2.publish_pipeline import PublishPipeline, PublishPipelineClosedError, PublishQueueFullError
+from theoriq.biscuit import AgentAddress, TheoriqBiscuit
+from theoriq.utils import InMemoryMetricsRegistry
+from theoriq.utils.metrics import NOTIFICATION_PUBLISH_FAILURES, NOTIFICATIONS_PUBLISHED, NOTIFICATIONS_PUBLISHED_BYTES
+
+
+class FakeNotifications:
+    """Records the posted notifications, holding the posts while the gate is closed."""
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.posted: List[Tuple[str, str]] = []
+        self.in_flight: Dict[str, int] = {}
+        self.max_in_flight = 0
+        self.max_in_flight_per_agent = 0
+        self.gate = threading.Event()
+        self.gate.set()
+        self.failures = 0
+
+    async def post(self, client: object, biscuit: TheoriqBiscuit, agent_id: str, notification: str) -> None:
+        self.in_flight[agent_id] = self.in_flight.get(agent_id, 0) + 1
+        self.max_in_flight = max(self.max_in_flight, sum(self.in_flight.values()))
+        self.max_in_flight_per_agent = max(self.max_in_flight_per_agent, self.in_flight[agent_id])
+        try:
+            while not self.gate.is_set():
+                await asyncio.sleep(0.001)
+            await asyncio.sleep(self.delay)
+            if self.failures > 0:
+                self.failures -= 1
+                raise ConnectionError("refused")
+            self.posted.append((agent_id, notification))
+        finally:
+            self.in_flight[agent_id] -= 1
+
+
+def _new_pipeline(notifications: FakeNotifications, **kwargs: Any) -> PublishPipeline:
+    client = MagicMock(spec=ProtocolClient)
+    client.new_async_http_client.return_value = AsyncMock()
+    client.post_notification_async.side_effect = notifications.post
+    return PublishPipeline(client, **kwargs)
+
+
+def _wait_for(condition: Callable[[], bool], timeout: float = 5.0) -> None:
+    event = threading.Event()
+    for _ in range(int(timeout / 0.001)):
+        if condition():
+            return
+        event.wait(0.001)
+    raise TimeoutError()
+
+
+def test_notifications_are_ordered_per_agent_and_concurrent_between_agents() -> None:
+    notifications = FakeNotifications(delay=0.002)
+    addresses = [AgentAddress.random() for _ in range(4)]
+    biscuit_provider = MagicMock(spec=BiscuitProvider)
+
+    with _new_pipeline(notifications, max_in_flight=4) as pipeline:
+        for index in range(10):
+            for address in addresses:
+                pipeline.publish(address, f"{index}", biscuit_provider)
+        assert pipeline.flush(timeout=5)
+
+        stats = pipeline.stats
+        assert stats.published == 40 and stats.queued == 0 and stats.in_flight == 0
+        assert stats.published_bytes == 40 and stats.throughput > 0 and stats.average_latency is not None
+
+    assert notifications.max_in_flight_per_agent == 1
+    assert 1 < notifications.max_in_flight <= 4
+    for address in addresses:
+        messages = [message for agent_id, message in notifications.posted if agent_id == address.address]
+        assert messages == [str(index) for index in range(10)]
+
+
+def test_queued_notifications_are_coalesced_by_key() -> None:
+    notifications = FakeNotifications()
+    notifications.gate.clear()
+    address = AgentAddress.random()
+    biscuit_provider = MagicMock(spec=BiscuitProvider)
+
+    with _new_pipeline(notifications) as pipeline:
+        pipeline.publish(address, "price 1", biscuit_provider, coalesce_key="price")
+        _wait_for(lambda: pipeline.stats.in_flight == 1)
+
+        # The first price is being posted: the next ones supersede each other while queued
+        pipeline.publish(address, "price 2", biscuit_provider, coalesce_key="price")
+        pipeline.publish(address, "trade", biscuit_provider)
+        pipeline.publish(address, "price 3", biscuit_provider, coalesce_key="price")
+        notifications.gate.set()
+        assert pipeline.flush(timeout=5)
+        assert pipeline.stats.coalesced == 1
+
+    assert [message for _, message in notifications.posted] == ["price 1", "price 3", "trade"]
+
+
+def test_coalesced_notification_is_timed_from_the_newest_message_and_idle_lanes_are_removed() -> None:
+    notifications = FakeNotifications()
+    notifications.gate.clear()
+    address = AgentAddress.random()
+    biscuit_provider = MagicMock(spec=BiscuitProvider)
+
+    with _new_pipeline(notifications) as pipeline:
+        pipeline.publish(address, "trade", biscuit_provider)
+        _wait_for(lambda: pipeline.stats.in_flight == 1)
+        pipeline.publish(address, "price 1", biscuit_provider, coalesce_key="price")
+        superseded_at = time.monotonic()
+        pipeline.publish(address, "price 2", biscuit_provider, coalesce_key="price")
+        assert pipeline._lanes[address].by_key["price"].published_at >= superseded_at
+
+        notifications.gate.set()
+        assert pipeline.flush(timeout=5)
+        _wait_for(lambda: not pipeline._lanes)
+
+        # A new lane is created for the next notification of the agent
+        pipeline.publish(address, "again", biscuit_provider)
+        assert pipeline.flush(timeout=5)
+
+    assert [message for _, message in notifications.posted] == ["trade", "price 2", "again"]
+
+
+def test_full_queue_times_out_and_close_drains_it() -> None:
+    notifications = FakeNotifications()
+    notifications.gate.clear()
+    address = AgentAddress.random()
+    biscuit_provider = MagicMock(spec=BiscuitProvider)
+
+    pipeline = _new_pipeline(notifications, max_queue_size=2)
+    pipeline.publish(address, "1", biscuit_provider)
+    pipeline.publish(address, "2", biscuit_provider)
+    with pytest.raises(PublishQueueFullError):
+        pipeline.publish(address, "3", biscuit_provider, timeout=0.01)
+    assert not pipeline.flush(timeout=0.01)
+
+    notifications.gate.set()
+    assert pipeline.close(timeout=5)
+    assert pipeline.closed
+    with pytest.raises(PublishPipelineClosedError):
+        pipeline.publish(address, "4", biscuit_provider)
+    assert [message for _, message in notifications.posted] == ["1", "2"]
+
+
+def test_failed_posts_are_retried_then_counted() -> None:
+    notifications = FakeNotifications()
+    notifications.failures = 4
+    address = AgentAddress.random()
+    biscuit_provider = MagicMock(spec=BiscuitProvider)
+
+    registry = InMemoryMetricsRegistry()
+
+    with _new_pipeline(notifications, max_retries=2, retry_delay=0, metrics=registry) as pipeline:
+        pipeline.publish(address, "lost", biscuit_provider)
+        pipeline.publish(address, "retried", biscuit_provider)
+        assert pipeline.flush(timeout=5)
+
+        stats = pipeline.stats
+        assert stats.failed == 1 and stats.last_error == "ConnectionError: refused"
+        assert stats.retries == 3 and stats.published == 1
+
+    labels = {"agent": str(address)}
+    assert registry.counter(NOTIFICATION_PUBLISH_FAILURES, labels) == 1
+    assert registry.counter(NOTIFICATIONS_PUBLISHED, labels) == 1
+    assert registry.counter(NOTIFICATIONS_PUBLISHED_BYTES, labels) == len("retried")
+
+    assert notifications.posted == [(address.address, "retried")]
@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, List, Set
+from unittest.mock import MagicMock, patch
+
+import pytest
+from tests.unit.fixtures import *  # noqa: F403
+
+from theoriq import Agent, AgentDeploymentConfiguration
+from theoriq.api.v1alpha2 import ProtocolClient, publish
+from theoriq.api.v1alpha2.publish import Publisher, PublisherContext, VirtualPublisherSupervisor
+from theoriq.biscuit import AgentAddress
+
+
+class FakeRefresh:
+    """Replaces the configuration requests, tracking how many run at once."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.refreshed: List[AgentAddress] = []
+
+    def __call__(self, context: PublisherContext) -> None:
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.01)
+        with self._lock:
+            self.running -= 1
+            self.refreshed.append(context.agent.virtual_address)
+
+
+def _wait_for(condition: Callable[[], bool], timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_supervisor_runs_coroutine_jobs_on_one_loop(agent_config: AgentDeploymentConfiguration) -> None:
+    addresses = [AgentAddress.random() for _ in range(20)]
+    threads: Set[int] = set()
+    started: List[AgentAddress] = []
+
+    async def job(context: PublisherContext) -> None:
+        threads.add(threading.get_ident())
+        started.append(context.agent.virtual_address)
+        while True:
+            await asyncio.sleep(1)
+
+    refresh = FakeRefresh()
+    with patch.object(PublisherContext, "refresh_configuration", autospec=True, side_effect=refresh):
+        supervisor = VirtualPublisherSupervisor(
+            Agent(agent_config), job, MagicMock(spec=ProtocolClient), refresh_concurrency=4
+        )
+        supervisor.start_or_update_many(addresses)
+        _wait_for(lambda: len(started) == 20)
+
+        assert sorted(refresh.refreshed, key=str) == sorted(addresses, key=str)
+        assert 1 < refresh.max_running <= 4
+        assert len(threads) == 1
+        assert sorted(supervisor.addresses, key=str) == sorted(addresses, key=str)
+
+        # Updating a running job refreshes its configuration without starting it again
+        supervisor.start_or_update(addresses[0])
+        assert len(refresh.refreshed) == 21 and len(started) == 20
+
+        assert supervisor.stop(addresses[0], timeout=5)
+        assert not supervisor.is_running(addresses[0]) and supervisor.publisher(addresses[0]) is None
+        assert supervisor.is_running(addresses[1])
+        assert supervisor.close(timeout=5)
+        assert supervisor.addresses == []
+
+
+def test_supervisor_stops_and_replaces_plain_jobs(agent_config: AgentDeploymentConfiguration) -> None:
+    address = AgentAddress.random()
+    runs: List[str] = []
+
+    def first_job(context: PublisherContext) -> None:
+        runs.append("first")
+        while not context.wait(1):
+            pass
+        runs.append("first stopped")
+
+    def second_job(context: PublisherContext) -> None:
+        runs.append("second")
+
+    with patch.object(PublisherContext, "refresh_configuration", autospec=True):
+        supervisor = VirtualPublisherSupervisor(Agent(agent_config), first_job, MagicMock(spec=ProtocolClient))
+        supervisor.start_or_update(address)
+        _wait_for(lambda: runs == ["first"])
+        first_publisher = supervisor.publisher(address)
+        assert first_publisher is not None
+
+        supervisor.replace(address, second_job)
+        _wait_for(lambda: len(runs) == 3)
+        assert runs == ["first", "first stopped", "second"]
+        second_publisher = supervisor.publisher(address)
+        assert second_publisher is not None and second_publisher is not first_publisher
+        assert first_publisher.context.is_stopped and not second_publisher.context.is_stopped
+        assert supervisor.close(timeout=5)
+
+
+def test_virtual_job_is_not_started_before_resume(agent_config: AgentDeploymentConfiguration) -> None:
+    root_agent = Agent(agent_config)
+    assert Publisher.virtual_supervisor(root_agent) is None
+    Publisher.start_or_update_virtual_job(root_agent, AgentAddress.random())
+    assert Publisher.virtual_supervisor(root_agent) is None
+
+
+def test_supervisor_stops_waiting_for_plain_jobs_after_the_timeout(
+    agent_config: AgentDeploymentConfiguration, caplog: pytest.LogCaptureFixture
+) -> None:
+    address = AgentAddress.random()
+    release = threading.Event()
+    runs: List[str] = []
+
+    def stuck_job(context: PublisherContext) -> None:
+        runs.append("stuck")
+        release.wait(10)  # ignores the stopped flag of its context
+        runs.append("stuck returned")
+
+    def next_job(context: PublisherContext) -> None:
+        runs.append("next")
+
+    with patch.object(PublisherContext, "refresh_configuration", autospec=True):
+        supervisor = VirtualPublisherSupervisor(Agent(agent_config), stuck_job, MagicMock(spec=ProtocolClient))
+        supervisor.start_or_update(address)
+        _wait_for(lambda: runs == ["stuck"])
+
+        with caplog.at_level(logging.WARNING, logger=publish.__name__):
+            assert not supervisor.replace(address, next_job, timeout=0.05)
+        assert f"Publish job of agent {address} did not stop within 0.05 seconds" in caplog.text
+
+        # The replacing job waits for the previous one to return, even when the agent is updated
+        supervisor.start_or_update(address)
+        time.sleep(0.05)
+        assert runs == ["stuck"] and not supervisor.is_running(address)
+        release.set()
+        _wait_for(lambda: runs == ["stuck", "stuck returned", "next"])
+
+        release.clear()
+        supervisor.replace(address, stuck_job)
+        _wait_for(lambda: runs.count("stuck") == 2)
+        assert not supervisor.close(timeout=0.05)
+        release.set()
+
+
+def test_supervisor_refuses_plain_jobs_when_the_workers_are_busy(
+    agent_config: AgentDeploymentConfiguration, caplog: pytest.LogCaptureFixture
+) -> None:
+    first, second = AgentAddress.random(), AgentAddress.random()
+    started: List[AgentAddress] = []
+
+    def job(context: PublisherContext) -> None:
+        started.append(context.agent.virtual_address)
+        context.wait(10)
+
+    with patch.object(PublisherContext, "refresh_configuration", autospec=True):
+        supervisor = VirtualPublisherSupervisor(Agent(agent_config), job, MagicMock(spec=ProtocolClient), max_workers=1)
+        supervisor.start_or_update(first)
+        _wait_for(lambda: supervisor.is_running(first))
+        with caplog.at_level(logging.ERROR, logger=publish.__name__):
+            supervisor.start_or_update(second)
+        assert f"Publish job of agent {second} not started" in caplog.text
+        assert supervisor.refused_jobs == 1 and not supervisor.is_running(second)
+
+        # Started once a worker is free
+        assert supervisor.stop(first, timeout=5)
+        supervisor.start_or_update(second)
+        _wait_for(lambda: supervisor.is_running(second))
+        assert started == [first, second]
+        assert supervisor.close(timeout=5)
+
+
+def test_resume_virtual_jobs_configures_the_supervisor(agent_config: AgentDeploymentConfiguration) -> None:
+    root_agent = Agent(agent_config)
+    started: List[AgentAddress] = []
+
+    def job(context: PublisherContext) -> None:
+        started.append(context.agent.virtual_address)
+        context.wait(10)
+
+    client = MagicMock(spec=ProtocolClient)
+    with (
+        patch.object(ProtocolClient, "from_env", return_value=client),
+        patch.object(VirtualPublisherSupervisor, "resume", autospec=True),
+        patch.object(PublisherContext, "refresh_configuration", autospec=True),
+    ):
+        Publisher.resume_virtual_jobs(root_agent, job, max_workers=1, refresh_concurrency=1)
+        supervisor = Publisher.virtual_supervisor(root_agent)
+        assert supervisor is not None
+        try:
+            supervisor.start_or_update_many([AgentAddress.random(), AgentAddress.random()])
+            _wait_for(lambda: len(started) == 1)
+            time.sleep(0.05)
+            # The second plain job is refused by the only worker
+            assert len(started) == 1 and supervisor.refused_jobs == 1
+            assert supervisor.close(timeout=5)
+        finally:
+            publish._supervisors.pop(root_agent.config.address, None)
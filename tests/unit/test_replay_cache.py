@@ -0,0 +1,101 @@
+import threading
+import time
+from typing import List
+
+from flask import Response
+
+from theoriq.extra.flask.replay import ExecuteReplayCache
+
+
+def _execute_fn(calls: List[int], status: int = 200, delay: float = 0.0):
+    def execute() -> Response:
+        calls.append(1)
+        time.sleep(delay)
+        response = Response(b'{"result": 42}', status=status, content_type="application/json")
+        response.headers.add("authorization", "bearer token")
+        return response
+
+    return execute
+
+
+def test_duplicate_request_is_replayed() -> None:
+    cache = ExecuteReplayCache(ttl=10, max_size=10)
+    calls: List[int] = []
+    key = ExecuteReplayCache.key("request_id", b"body")
+
+    first = cache.get_or_execute(key, _execute_fn(calls))
+    second = cache.get_or_execute(key, _execute_fn(calls))
+
+    assert len(calls) == 1
+    assert cache.hits == 1
+    assert second.get_data() == first.get_data()
+    assert second.headers["authorization"] == "bearer token"
+
+
+def test_different_body_is_executed() -> None:
+    cache = ExecuteReplayCache(ttl=10, max_size=10)
+    calls: List[int] = []
+
+    cache.get_or_execute(ExecuteReplayCache.key("request_id", b"body"), _execute_fn(calls))
+    cache.get_or_execute(ExecuteReplayCache.key("request_id", b"other body"), _execute_fn(calls))
+    assert len(calls) == 2
+
+
+def test_failed_request_is_not_stored() -> None:
+    cache = ExecuteReplayCache(ttl=10, max_size=10)
+    calls: List[int] = []
+    key = ExecuteReplayCache.key("request_id", b"body")
+
+    assert cache.get_or_execute(key, _execute_fn(calls, status=500)).status_code == 500
+    assert cache.get_or_execute(key, _execute_fn(calls)).status_code == 200
+    assert len(calls) == 2
+
+
+def test_in_flight_request_is_coalesced() -> None:
+    cache = ExecuteReplayCache(ttl=10, max_size=10)
+    calls: List[int] = []
+    key = ExecuteReplayCache.key("request_id", b"body")
+    responses: List[Response] = []
+
+    def run() -> None:
+        responses.append(cache.get_or_execute(key, _execute_fn(calls, delay=0.5)))
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert cache.coalesced == 3
+    assert all(response.get_data() == b'{"result": 42}' for response in responses)
+
+
+def test_failed_in_flight_request_is_not_shared() -> None:
+    cache = ExecuteReplayCache(ttl=10, max_size=10)
+    calls: List[int] = []
+    key = ExecuteReplayCache.key("request_id", b"body")
+    statuses: List[int] = []
+
+    leader = threading.Thread(
+        target=lambda: statuses.append(cache.get_or_execute(key, _execute_fn(calls, status=500, delay=0.5)).status_code)
+    )
+    leader.start()
+    time.sleep(0.1)
+    # The duplicate waits for the failed leader, then is executed itself
+    statuses.append(cache.get_or_execute(key, _execute_fn(calls)).status_code)
+    leader.join()
+
+    assert len(calls) == 2
+    assert cache.coalesced == 0
+    assert sorted(statuses) == [200, 500]
+
+
+def test_key_depends_on_negotiation_headers() -> None:
+    keys = {
+        ExecuteReplayCache.key("request_id", b"body"),
+        ExecuteReplayCache.key("request_id", b"body", "application/msgpack"),
+        ExecuteReplayCache.key("request_id", b"body", "application/msgpack", "gzip"),
+        ExecuteReplayCache.key("request_id", b"body", None, "gzip"),
+    }
+    assert len(keys) == 4
@@ -1,3 +1,5 @@
+import pytest
+
 from theoriq.biscuit import AgentAddress
 from theoriq.types import SourceType
 
@@ -8,3 +10,9 @@ def test_source_type():
 
     st = SourceType.from_address("0x1234512345123451234512345123451234512345")
     assert st.is_user
+
+    st = SourceType.from_address("1234512345123451234512345123451234512345")
+    assert st.is_user
+
+    with pytest.raises(ValueError):
+        SourceType.from_address("0x1234")
@@ -0,0 +1,96 @@
+from typing import List
+
+from theoriq.api.v1alpha2.protocol import SSEEvent, SSEParser
+
+STREAM = (
+    "\ufeff: keep-alive\n"
+    "retry: 1500\n"
+    "event: notification\n"
+    "id: 1\n"
+    "data: first line\n"
+    "data:second line é\n"
+    "\n"
+    "data\n"
+    "\n"
+    "id: 2\n"
+    "event: ignored\n"
+    "\n"
+    'data: {"a": 1}\r\n'
+    "unknown: field\r\n"
+    "\r\n"
+    "data: cr\r\r"
+).encode("utf-8")
+
+EXPECTED = [
+    SSEEvent(event="notification", data="first line\nsecond line é", id="1", retry=1500),
+    SSEEvent(data="", id="1", retry=1500),
+    SSEEvent(data='{"a": 1}', id="2", retry=1500),
+    SSEEvent(data="cr", id="2", retry=1500),
+]
+
+
+def _parse(chunks: List[bytes]) -> List[SSEEvent]:
+    return list(SSEParser().iter_events(chunks))
+
+
+def test_parse_stream():
+    assert _parse([STREAM]) == EXPECTED
+
+
+def test_parse_stream_split_anywhere():
+    assert _parse([STREAM[i : i + 1] for i in range(len(STREAM))]) == EXPECTED
+    for size in (2, 3, 7):
+        assert _parse([STREAM[i : i + size] for i in range(0, len(STREAM), size)]) == EXPECTED
+
+
+LF_STREAM = (
+    "\ufeffdata: é\n"
+    "\n"
+    "event: notification\n"
+    "data: typed\n"
+    "\n"
+    "\n"
+    "\n"
+    ": comment\n"
+    "data: {}\n"
+    "\n"
+    "id: 3\n"
+    "\n"
+    "data:no space\n"
+    "data: second\n"
+    "\n"
+    "data: last\n"
+    "\n"
+).encode("utf-8")
+
+LF_EXPECTED = [
+    SSEEvent(data="é"),
+    SSEEvent(event="notification", data="typed"),
+    SSEEvent(data="{}"),
+    SSEEvent(data="no space\nsecond", id="3"),
+    SSEEvent(data="last", id="3"),
+]
+
+
+def test_parse_line_feed_stream_split_anywhere():
+    for size in (1, 2, 3, 5, 8, 13, len(LF_STREAM)):
+        assert _parse([LF_STREAM[i : i + size] for i in range(0, len(LF_STREAM), size)]) == LF_EXPECTED
+
+
+def test_incomplete_event_is_not_dispatched():
+    parser = SSEParser()
+    assert parser.feed(b"data: a\n\ndata: b") == [SSEEvent(data="a")]
+    assert parser.feed(b"\n") == []
+    assert parser.feed(b"\n") == [SSEEvent(data="b")]
+
+
+def test_line_feed_after_carriage_return_in_the_middle_of_a_chunk():
+    assert _parse([b"data: a\rdata: b", b"\n\n"]) == [SSEEvent(data="a\nb")]
+    assert _parse([b"data: a\r", b"\ndata: b\n\n"]) == [SSEEvent(data="a\nb")]
+
+
+def test_last_event_id_and_retry():
+    parser = SSEParser()
+    parser.feed(b"id: 42\nretry: soon\nid: bad\0id\n\n")
+    assert parser.last_event_id == "42"
+    assert parser.retry is None
@@ -1,23 +1,54 @@
+import asyncio
+import threading
 import time
-from typing import Optional
-from unittest.mock import MagicMock
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Set
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 
 from theoriq.api.v1alpha2 import ProtocolClient
 from theoriq.api.v1alpha2.protocol.biscuit_provider import BiscuitProvider
+from theoriq.api.v1alpha2.protocol.sse import SSEEvent
 from theoriq.api.v1alpha2.subscribe import Subscriber, SubscriberStopException
 from theoriq.biscuit import AgentAddress
 
 
+@asynccontextmanager
+async def _stream(
+    events: List[SSEEvent], closed: Optional[threading.Event] = None, threads: Optional[Set[int]] = None
+) -> AsyncIterator:
+    """Stream replaying the given events, then staying open until closed if an event is given."""
+
+    async def _events() -> AsyncIterator[SSEEvent]:
+        if threads is not None:
+            threads.add(threading.get_ident())
+        for event in events:
+            yield event
+        if closed is not None:
+            await asyncio.Event().wait()
+
+    try:
+        yield _events()
+    finally:
+        if closed is not None:
+            closed.set()
+
+
+def _new_client() -> MagicMock:
+    client = MagicMock(spec=ProtocolClient)
+    client.new_async_http_client.return_value = AsyncMock()
+    return client
+
+
 @pytest.mark.timeout(10)
 def test_subscribe_job_handle_exception() -> None:
     biscuit_provider = MagicMock(spec=BiscuitProvider)
-    client = MagicMock(spec=ProtocolClient)
-    client.subscribe_to_agent_notifications.side_effect = [
-        ["first"],
+    client = _new_client()
+    client.open_agent_notification_stream.side_effect = [
+        _stream([SSEEvent("first", id="1")]),
         ValueError,
-        ["something"],
+        _stream([SSEEvent("something", id="2")]),
         SubscriberStopException,
     ]
     subscriber = Subscriber(biscuit_provider, client)
@@ -34,3 +65,91 @@ def test_subscribe_job_handle_exception() -> None:
 
     assert not job.is_alive()
     assert actual == "something"
+    # Streams are resumed after the last event received
+    last_event_ids = [call.args[3] for call in client.open_agent_notification_stream.call_args_list]
+    assert last_event_ids == [None, "1", "1", "2"]
+    subscriber.close()
+
+
+@pytest.mark.timeout(10)
+def test_subscriber_jobs_share_one_loop_and_close_cancels_streams() -> None:
+    biscuit_provider = MagicMock(spec=BiscuitProvider)
+    client = _new_client()
+    closed = [threading.Event(), threading.Event()]
+    stream_threads: Set[int] = set()
+    client.open_agent_notification_stream.side_effect = [
+        _stream([SSEEvent("first")], closed[0], stream_threads),
+        _stream([SSEEvent("second")], closed[1], stream_threads),
+    ]
+    subscriber = Subscriber(biscuit_provider, client)
+    received: List[str] = []
+
+    jobs = [subscriber.new_job(AgentAddress.random(), received.append, background=True) for _ in range(2)]
+    for job in jobs:
+        job.start()
+    deadline = time.monotonic() + 5
+    while len(received) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sorted(received) == ["first", "second"]
+    # Both streams are read by the event loop of the subscriber, outside the threads of the jobs
+    assert len(stream_threads) == 1 and not stream_threads & {job.ident for job in jobs}
+
+    subscriber.close()
+    for job in jobs:
+        job.join(5)
+        assert not job.is_alive()
+    assert all(event.is_set() for event in closed)
+
+
+@pytest.mark.timeout(10)
+def test_subscriber_subscribe_without_a_thread_and_cancel() -> None:
+    biscuit_provider = MagicMock(spec=BiscuitProvider)
+    client = _new_client()
+    closed = threading.Event()
+    stream_threads: Set[int] = set()
+    client.open_agent_notification_stream.side_effect = [_stream([SSEEvent("first")], closed, stream_threads)]
+    subscriber = Subscriber(biscuit_provider, client)
+    received: List[str] = []
+
+    future = subscriber.subscribe(AgentAddress.random(), received.append)
+    deadline = time.monotonic() + 5
+    while not received and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert received == ["first"]
+    # The stream is read by the event loop of the subscriber
+    assert stream_threads and threading.get_ident() not in stream_threads
+
+    future.cancel()
+    assert closed.wait(5)
+    subscriber.close()
+
+
+@pytest.mark.timeout(10)
+def test_subscriber_jobs_end_when_close_times_out() -> None:
+    @asynccontextmanager
+    async def _stuck_stream() -> AsyncIterator:
+        async def _events() -> AsyncIterator[SSEEvent]:
+            yield SSEEvent("first")
+            while True:
+                try:
+                    await asyncio.sleep(1)
+                except asyncio.CancelledError:
+                    pass
+
+        yield _events()
+
+    biscuit_provider = MagicMock(spec=BiscuitProvider)
+    client = _new_client()
+    client.open_agent_notification_stream.side_effect = [_stuck_stream()]
+    subscriber = Subscriber(biscuit_provider, client)
+    received: List[str] = []
+
+    job = subscriber.new_job(AgentAddress.random(), received.append, background=True)
+    job.start()
+    deadline = time.monotonic() + 5
+    while not received and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    subscriber.close(timeout=0.2)
+    job.join(5)
+    assert not job.is_alive()
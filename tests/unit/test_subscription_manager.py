@@ -0,0 +1,406 @@
+import asyncio
+import json
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from unittest.mock import MagicMock
+
+import pytest
+
+from theoriq.api.v1alpha2 import ProtocolClient
+from theoriq.api.v1alpha2.protocol.biscuit_provider import BiscuitProvider
+from theoriq.api.v1alpha2.protocol.sse import SSEEvent
+from theoriq.api.v1alpha2.subscription_manager import (
+    NotificationBroker,
+    OverflowPolicy,
+    ReconnectBackoff,
+    SubscriberStopException,
+    SubscriptionManager,
+)
+from theoriq.biscuit import AgentAddress, TheoriqBiscuit
+from theoriq.utils import InMemoryMetricsRegistry
+from theoriq.utils.metrics import (
+    NOTIFICATION_DELIVERY_SECONDS,
+    NOTIFICATION_HANDLER_SECONDS,
+    NOTIFICATIONS_RECEIVED,
+    NOTIFICATIONS_RECEIVED_BYTES,
+    SUBSCRIPTION_RECONNECTS,
+)
+
+
+class FakeStreams:
+    """Notification streams of agents, replaying the given messages and then staying open until closed."""
+
+    def __init__(self, messages: Dict[str, List[str]]) -> None:
+        self.messages = messages
+        self.opened: List[str] = []
+        self.closed: List[str] = []
+
+    @asynccontextmanager
+    async def open(
+        self, biscuit: TheoriqBiscuit, agent_id: str, last_event_id: Optional[str]
+    ) -> AsyncIterator[AsyncIterator[SSEEvent]]:
+        self.opened.append(agent_id)
+        try:
+            yield self._events(agent_id)
+        finally:
+            self.closed.append(agent_id)
+
+    async def _events(self, agent_id: str) -> AsyncIterator[SSEEvent]:
+        for message in self.messages.get(agent_id, []):
+            yield SSEEvent(message)
+        await asyncio.Event().wait()
+
+
+def _new_manager(streams: FakeStreams) -> SubscriptionManager:
+    biscuit_provider = MagicMock(spec=BiscuitProvider)
+    return SubscriptionManager(
+        biscuit_provider, MagicMock(spec=ProtocolClient), reconnect_delay=0, open_stream=streams.open
+    )
+
+
+async def _until(condition: Callable[[], bool], timeout: float = 5.0) -> None:
+    async def _poll() -> None:
+        while not condition():
+            await asyncio.sleep(0.001)
+
+    await asyncio.wait_for(_poll(), timeout)
+
+
+def test_subscriptions_share_one_loop() -> None:
+    addresses = [AgentAddress.random() for _ in range(3)]
+    streams = FakeStreams({address.address: [f"{address}-1", ":", f"{address}-2"] for address in addresses})
+    received: Dict[AgentAddress, List[str]] = {address: [] for address in addresses}
+
+    async def main() -> None:
+        async with _new_manager(streams) as manager:
+            subscriptions = []
+            for address in addresses:
+
+                async def handler(message: str, address: AgentAddress = address) -> None:
+                    received[address].append(message)
+
+                subscriptions.append(manager.subscribe(address, handler))
+            await _until(lambda: all(len(messages) == 2 for messages in received.values()))
+
+            assert len(manager.subscriptions) == 3
+            for subscription in subscriptions:
+                assert subscription.is_active
+                assert subscription.stats.connected and subscription.stats.messages == 2
+
+        assert manager.subscriptions == []
+        assert sorted(streams.closed) == sorted(address.address for address in addresses)
+
+    asyncio.run(main())
+    assert received == {address: [f"{address}-1", f"{address}-2"] for address in addresses}
+
+
+def test_unsubscribe_closes_only_its_stream() -> None:
+    first, second = AgentAddress.random(), AgentAddress.random()
+    streams = FakeStreams({})
+
+    async def main() -> None:
+        async with _new_manager(streams) as manager:
+            subscription = manager.subscribe(first, lambda message: None)
+            other = manager.subscribe(second, lambda message: None)
+            await _until(lambda: len(streams.opened) == 2)
+
+            await manager.unsubscribe(subscription)
+            assert not subscription.is_active and not subscription.stats.connected
+            assert streams.closed == [first.address]
+            assert manager.subscriptions == [other]
+
+    asyncio.run(main())
+
+
+def test_handler_errors_are_counted_and_stop_exception_ends_subscription() -> None:
+    address = AgentAddress.random()
+    streams = FakeStreams({address.address: ["fail", "ok", "stop", "never"]})
+    received: List[str] = []
+
+    def handler(message: str) -> None:
+        if message == "fail":
+            raise ValueError(message)
+        if message == "stop":
+            raise SubscriberStopException()
+        received.append(message)
+
+    async def main() -> None:
+        async with _new_manager(streams) as manager:
+            subscription = manager.subscribe(address, handler)
+            await asyncio.wait_for(subscription.wait(), 5)
+
+            assert not subscription.is_active
+            assert subscription.stats.handler_errors == 1
+            # The last message was read while the handler ran, and dropped with the subscription
+            assert subscription.stats.messages == 4
+            assert subscription.stats.handled == 3
+            assert subscription.stats.to_dict()["connected"] is False
+
+    asyncio.run(main())
+    assert received == ["ok"]
+
+
+def test_lost_streams_reconnect() -> None:
+    address = AgentAddress.random()
+    attempts: List[int] = []
+
+    @asynccontextmanager
+    async def open_stream(
+        biscuit: TheoriqBiscuit, agent_id: str, last_event_id: Optional[str]
+    ) -> AsyncIterator[AsyncIterator[SSEEvent]]:
+        attempts.append(len(attempts))
+        if len(attempts) == 1:
+            raise ConnectionError("refused")
+
+        async def events() -> AsyncIterator[SSEEvent]:
+            yield SSEEvent(f"message {len(attempts)}")
+
+        yield events()
+
+    async def main() -> None:
+        biscuit_provider = MagicMock(spec=BiscuitProvider)
+        client = MagicMock(spec=ProtocolClient)
+        async with SubscriptionManager(biscuit_provider, client, reconnect_delay=0, open_stream=open_stream) as manager:
+            subscription = manager.subscribe(address, lambda message: None)
+            await _until(lambda: subscription.stats.connects >= 3)
+
+            stats = subscription.stats
+            assert stats.errors == 1 and stats.last_error == "ConnectionError: refused"
+            assert stats.reconnects == stats.connects - 1
+            assert stats.disconnects >= 2
+            assert biscuit_provider.get_biscuit.call_count >= 3
+
+    asyncio.run(main())
+
+
+def test_reconnect_backoff_has_full_jitter_and_honors_retry_hint() -> None:
+    backoff = ReconnectBackoff(initial_delay=1.0, max_delay=10.0)
+    ceilings = [1.0, 2.0, 4.0, 8.0, 10.0, 10.0]
+    for ceiling in ceilings:
+        assert 0 <= backoff.next_delay() <= ceiling
+
+    backoff.reset()
+    backoff.set_retry_hint(100)
+    assert all(0 <= backoff.next_delay() <= ceiling for ceiling in [0.1, 0.2, 0.4])
+
+
+def test_lost_streams_resume_from_last_event_id() -> None:
+    address = AgentAddress.random()
+    last_event_ids: List[Optional[str]] = []
+    received: List[str] = []
+
+    @asynccontextmanager
+    async def open_stream(
+        biscuit: TheoriqBiscuit, agent_id: str, last_event_id: Optional[str]
+    ) -> AsyncIterator[AsyncIterator[SSEEvent]]:
+        last_event_ids.append(last_event_id)
+
+        async def events() -> AsyncIterator[SSEEvent]:
+            start = int(last_event_id or 0)
+            for index in range(start + 1, start + 3):
+                yield SSEEvent(f"message {index}", id=str(index), retry=0)
+
+        yield events()
+
+    async def main() -> None:
+        manager = SubscriptionManager(
+            MagicMock(spec=BiscuitProvider), MagicMock(spec=ProtocolClient), open_stream=open_stream
+        )
+        async with manager:
+            subscription = manager.subscribe(address, received.append)
+            await _until(lambda: len(received) >= 6)
+
+            stats = subscription.stats
+            assert stats.resumes >= 2 and stats.last_gap is not None and stats.total_gap >= stats.last_gap
+            # The retry hint of the server replaces the default delay of a second
+            assert stats.last_reconnect_delay == 0
+
+    asyncio.run(main())
+    assert last_event_ids[:3] == [None, "2", "4"]
+    assert received[:6] == [f"message {index}" for index in range(1, 7)]
+
+
+@pytest.mark.parametrize(
+    "overflow_policy, expected",
+    [
+        (OverflowPolicy.BLOCK, ["1", "2", "3", "4", "5"]),
+        (OverflowPolicy.DROP_OLDEST, ["4", "5"]),
+        (OverflowPolicy.DROP_NEWEST, ["1", "2"]),
+    ],
+)
+def test_queue_overflow_policies(overflow_policy: OverflowPolicy, expected: List[str]) -> None:
+    address = AgentAddress.random()
+    streams = FakeStreams({address.address: ["1", "2", "3", "4", "5"]})
+    handled: List[str] = []
+
+    async def main() -> None:
+        release = asyncio.Event()
+
+        async def handler(message: str) -> None:
+            await release.wait()
+            handled.append(message)
+
+        async with _new_manager(streams) as manager:
+            subscription = manager.subscribe(address, handler, queue_size=2, overflow_policy=overflow_policy)
+            stats = subscription.stats
+            await _until(lambda: stats.messages == 5 or (stats.messages >= 2 and stats.queue_depth == 2))
+            await asyncio.sleep(0.01)
+            release.set()
+            await _until(lambda: stats.handled + stats.dropped == stats.messages and stats.queue_depth == 0)
+
+            assert stats.max_queue_depth == 2
+            assert stats.dropped == 5 - len(expected)
+            assert stats.max_lag > 0 and stats.average_lag is not None
+
+    asyncio.run(main())
+    assert handled == expected
+
+
+def test_sync_handlers_run_on_worker_threads() -> None:
+    address = AgentAddress.random()
+    streams = FakeStreams({address.address: [str(index) for index in range(4)]})
+    threads: Dict[str, int] = {}
+    barrier = threading.Barrier(4, timeout=5)
+
+    def handler(message: str) -> None:
+        threads[message] = threading.get_ident()
+        # Blocks until the 4 messages are handled concurrently
+        barrier.wait()
+
+    async def main() -> None:
+        loop_thread = threading.get_ident()
+        async with _new_manager(streams) as manager:
+            subscription = manager.subscribe(address, handler, workers=4)
+            await _until(lambda: subscription.stats.handled == 4 and len(threads) == 4)
+            assert loop_thread not in threads.values()
+
+    asyncio.run(main())
+    assert sorted(threads) == ["0", "1", "2", "3"]
+
+
+def test_broker_shares_one_upstream_per_agent() -> None:
+    first, second = AgentAddress.random(), AgentAddress.random()
+    streams = FakeStreams({first.address: ["a", "b"], second.address: ["c"]})
+    received: Dict[str, List[str]] = {"x": [], "y": [], "z": []}
+
+    async def main() -> None:
+        async with _new_manager(streams) as manager:
+            broker = NotificationBroker(manager)
+            # Subscribed before the upstream is connected, so that both receive all the messages
+            x = broker.subscribe(first, received["x"].append)
+            y = broker.subscribe(AgentAddress(str(first)), received["y"].append)
+            z = broker.subscribe(second, received["z"].append)
+            await _until(lambda: len(received["x"]) == 2 and len(received["y"]) == 2 and len(received["z"]) == 1)
+
+            assert sorted(streams.opened) == sorted([first.address, second.address])
+            assert len(manager.subscriptions) == 2
+            upstream = broker.upstream(first)
+            assert upstream is not None and upstream.stats.connected
+            assert set(broker.subscribers(first)) == {x, y}
+
+            await broker.unsubscribe(x)
+            assert upstream.is_active and streams.closed == []
+
+            await broker.unsubscribe(y)
+            assert not upstream.is_active and broker.upstream(first) is None
+            assert streams.closed == [first.address]
+
+            await broker.close()
+            assert not z.is_active and manager.subscriptions == []
+
+    asyncio.run(main())
+    assert received == {"x": ["a", "b"], "y": ["a", "b"], "z": ["c"]}
+
+
+def test_broker_local_stop_does_not_stop_other_subscribers() -> None:
+    address = AgentAddress.random()
+    streams = FakeStreams({address.address: ["1", "2", "3"]})
+    received: List[str] = []
+
+    def stop(message: str) -> None:
+        raise SubscriberStopException()
+
+    async def main() -> None:
+        async with _new_manager(streams) as manager:
+            broker = NotificationBroker(manager)
+            stopped = broker.subscribe(address, stop)
+            broker.subscribe(address, received.append)
+            await asyncio.wait_for(stopped.wait(), 5)
+            await _until(lambda: len(received) == 3)
+
+            assert broker.subscribers(address) != [stopped]
+            assert len(broker.subscribers(address)) == 1
+            assert broker.upstream(address) is not None
+
+    asyncio.run(main())
+    assert received == ["1", "2", "3"]
+
+
+def test_broker_delivers_to_new_subscribers_and_isolates_failures() -> None:
+    address = AgentAddress.random()
+    streams = FakeStreams({address.address: ["a"]})
+    received: Dict[str, List[str]] = {"x": [], "y": []}
+
+    async def main() -> None:
+        async with _new_manager(streams) as manager:
+            broker = NotificationBroker(manager)
+            failing = broker.subscribe(address, received["x"].append)
+            await _until(lambda: received["x"] == ["a"])
+            upstream = broker.upstream(address)
+            assert upstream is not None
+
+            async def fail(message: str) -> None:
+                raise RuntimeError("queue closed")
+
+            failing._receive = fail  # type: ignore[method-assign]
+            # Messages fanned out before the task of a new subscription runs are queued for it
+            broker.subscribe(address, received["y"].append)
+            await upstream.handler("b")  # type: ignore[misc]
+            await _until(lambda: received["y"] == ["b"])
+
+    asyncio.run(main())
+    assert received == {"x": ["a"], "y": ["b"]}
+
+
+def test_subscriptions_report_metrics_by_agent() -> None:
+    address = AgentAddress.random()
+    labels = {"agent": str(address)}
+    registry = InMemoryMetricsRegistry()
+    published_at = time.time() - 2
+    connections: List[int] = []
+
+    @asynccontextmanager
+    async def open_stream(
+        biscuit: TheoriqBiscuit, agent_id: str, last_event_id: Optional[str]
+    ) -> AsyncIterator[AsyncIterator[SSEEvent]]:
+        connections.append(len(connections))
+
+        async def events() -> AsyncIterator[SSEEvent]:
+            if len(connections) == 1:
+                yield SSEEvent("héllo")
+                yield SSEEvent(json.dumps({"timestamp": published_at}))
+            else:
+                await asyncio.Event().wait()
+
+        yield events()
+
+    async def main() -> None:
+        biscuit_provider = MagicMock(spec=BiscuitProvider)
+        client = MagicMock(spec=ProtocolClient)
+        manager = SubscriptionManager(
+            biscuit_provider, client, reconnect_delay=0, open_stream=open_stream, metrics=registry
+        )
+        async with manager:
+            subscription = manager.subscribe(address, lambda message: None)
+            await _until(lambda: subscription.stats.connects == 2 and subscription.stats.handled == 2)
+
+    asyncio.run(main())
+    assert registry.counter(NOTIFICATIONS_RECEIVED, labels) == 2
+    assert registry.counter(NOTIFICATIONS_RECEIVED_BYTES, labels) == 6 + len(json.dumps({"timestamp": published_at}))
+    assert registry.counter(SUBSCRIPTION_RECONNECTS, labels) == 1
+    handler_seconds = registry.histogram(NOTIFICATION_HANDLER_SECONDS, labels)
+    assert handler_seconds is not None and handler_seconds.count == 2
+    delivery_seconds = registry.histogram(NOTIFICATION_DELIVERY_SECONDS, labels)
+    assert delivery_seconds is not None and delivery_seconds.count == 1 and delivery_seconds.sum >= 2
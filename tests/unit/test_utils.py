@@ -1,5 +1,9 @@
+import threading
 import time
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import pytest
 
 from theoriq.utils import TTLCache
 
@@ -66,3 +70,118 @@ def test_optional_type():
 
     assert cache.get("key1") == 123
     assert cache.get("key2") is None
+
+
+def test_lru_order_on_hit():
+    """Test that reading an item protects it from eviction."""
+    cache = TTLCache[str](ttl=10, max_size=2)
+    cache.set("key1", "value1")
+    cache.set("key2", "value2")
+    cache.get("key1")
+    cache.set("key3", "value3")  # This should evict "key2"
+
+    assert cache.get("key1") == "value1"
+    assert cache.get("key2") is None
+    assert cache.stats.evictions == 1
+
+
+def test_per_item_ttl_and_sweep():
+    """Test that items expire after their own TTL and are removed by a sweep."""
+    cache = TTLCache[str](ttl=None, max_size=3)
+    cache.set("key1", "value1", ttl=0.05)
+    cache.set("key2", "value2")
+    time.sleep(0.1)
+
+    assert cache.sweep() == 1
+    assert len(cache) == 1
+    assert cache.get("key2") == "value2"
+    assert cache.stats.expirations == 1
+
+
+def test_expired_items_make_room_before_eviction():
+    """Test that a full cache removes expired items before evicting live ones."""
+    cache = TTLCache[str](ttl=None, max_size=2)
+    cache.set("key1", "value1")
+    cache.set("key2", "value2", ttl=0.05)
+    time.sleep(0.1)
+    cache.set("key3", "value3")
+
+    assert cache.get("key1") == "value1"
+    assert cache.get("key3") == "value3"
+    assert cache.stats.evictions == 0
+    assert cache.stats.expirations == 1
+
+
+def test_get_or_load():
+    """Test that values are loaded once and then served from the cache, None included."""
+    cache = TTLCache[Optional[int]](ttl=10, max_size=3)
+    loads: List[str] = []
+
+    def loader() -> Optional[int]:
+        loads.append("key1")
+        return None
+
+    assert cache.get_or_load("key1", loader) is None
+    assert cache.get_or_load("key1", loader) is None
+    assert loads == ["key1"]
+    assert (cache.stats.hits, cache.stats.misses, cache.stats.loads) == (1, 1, 1)
+    assert cache.stats.hit_ratio == 0.5
+
+
+def test_get_or_load_cache_if():
+    """Test that loaded values not matching the predicate are returned without being stored."""
+    cache = TTLCache[Optional[int]](ttl=10, max_size=3)
+    values = iter([None, 0, 42])
+
+    def loader() -> Optional[int]:
+        return next(values)
+
+    assert cache.get_or_load("key1", loader, cache_if=bool) is None
+    assert cache.get_or_load("key1", loader, cache_if=bool) == 0
+    assert cache.get_or_load("key1", loader, cache_if=bool) == 42
+    assert cache.get_or_load("key1", loader, cache_if=bool) == 42
+    assert cache.stats.loads == 3 and len(cache) == 1
+
+
+def test_get_or_load_single_flight():
+    """Test that concurrent lookups of a cold key call the loader once."""
+    cache = TTLCache[int](ttl=10, max_size=3)
+    calls: List[int] = []
+    release = threading.Event()
+
+    def loader() -> int:
+        calls.append(1)
+        release.wait(5)
+        return 42
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(cache.get_or_load, "key1", loader) for _ in range(8)]
+        while cache.stats.coalesced < 7:
+            time.sleep(0.01)
+        release.set()
+        results = [future.result(timeout=5) for future in futures]
+
+    assert results == [42] * 8
+    assert len(calls) == 1
+
+
+def test_get_or_load_failure_is_shared_and_not_cached():
+    """Test that a failed load raises in all the waiting lookups and is retried by the next one."""
+    cache = TTLCache[int](ttl=10, max_size=3)
+    release = threading.Event()
+
+    def failing_loader() -> int:
+        release.wait(5)
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(cache.get_or_load, "key1", failing_loader) for _ in range(2)]
+        while cache.stats.coalesced < 1:
+            time.sleep(0.01)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result(timeout=5)
+
+    assert cache.stats.load_failures == 1
+    assert cache.get_or_load("key1", lambda: 1) == 1
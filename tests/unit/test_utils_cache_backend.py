@@ -0,0 +1,189 @@
+import multiprocessing
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import pytest
+
+from theoriq.types import AgentMetadata
+from theoriq.utils import (
+    CacheBackend,
+    InMemoryCacheBackend,
+    JsonCacheCodec,
+    ModelCacheCodec,
+    SQLiteCacheBackend,
+    TTLCache,
+    set_shared_cache_backend,
+)
+from theoriq.utils.cache_backend import BackendEntry
+
+
+class FailingBackend(CacheBackend):
+    def get(self, namespace: str, key: str) -> Optional[BackendEntry]:
+        raise OSError("disk error")
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float]) -> None:
+        raise OSError("disk error")
+
+    def delete(self, namespace: str, key: str) -> None:
+        raise OSError("disk error")
+
+    def clear(self, namespace: str) -> None:
+        raise OSError("disk error")
+
+    def sweep(self) -> int:
+        raise OSError("disk error")
+
+
+def test_sqlite_backend(tmp_path) -> None:
+    backend = SQLiteCacheBackend(str(tmp_path / "cache.db"))
+    backend.set("ns", "key1", b"value1", None)
+    backend.set("ns", "key2", b"value2", 0.05)
+    backend.set("other", "key1", b"other1", None)
+
+    entry = backend.get("ns", "key1")
+    assert entry is not None and entry == (b"value1", None)
+    entry = backend.get("ns", "key2")
+    assert entry is not None and entry[0] == b"value2" and entry[1] is not None
+
+    time.sleep(0.1)
+    assert backend.get("ns", "key2") is None
+    assert backend.sweep() == 1
+
+    backend.clear("ns")
+    assert backend.get("ns", "key1") is None
+    assert backend.get("other", "key1") == (b"other1", None)
+    backend.delete("other", "key1")
+    assert backend.get("other", "key1") is None
+    backend.close()
+
+
+def test_sqlite_backend_is_shared_across_processes(tmp_path) -> None:
+    path = str(tmp_path / "cache.db")
+    backend = SQLiteCacheBackend(path)
+    script = (
+        "from theoriq.utils import SQLiteCacheBackend\n"
+        f"SQLiteCacheBackend({path!r}).set('ns', 'key1', b'from worker', 60)\n"
+    )
+    subprocess.run([sys.executable, "-c", script], check=True, timeout=60)
+
+    entry = backend.get("ns", "key1")
+    assert entry is not None and entry[0] == b"from worker"
+    backend.close()
+
+
+def test_sqlite_backend_is_shared_by_threads(tmp_path) -> None:
+    backend = SQLiteCacheBackend(str(tmp_path / "cache.db"))
+
+    def write_and_read(worker: int) -> List[Optional[bytes]]:
+        values: List[Optional[bytes]] = []
+        for i in range(50):
+            backend.set("ns", f"{worker}_{i}", f"{worker}_{i}".encode(), 60)
+            entry = backend.get("ns", f"{worker}_{i}")
+            values.append(entry[0] if entry is not None else None)
+        return values
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(write_and_read, range(8)))
+
+    assert results == [[f"{worker}_{i}".encode() for i in range(50)] for worker in range(8)]
+    backend.close()
+
+
+def _write_from_child(backend: SQLiteCacheBackend) -> None:
+    backend.set("ns", "key1", b"from child", 60)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="fork is not available")
+def test_sqlite_backend_reopens_after_fork(tmp_path) -> None:
+    backend = SQLiteCacheBackend(str(tmp_path / "cache.db"))
+    backend.set("ns", "key0", b"from parent", 60)
+
+    child = multiprocessing.get_context("fork").Process(target=_write_from_child, args=(backend,))
+    child.start()
+    child.join(30)
+
+    assert child.exitcode == 0
+    entry = backend.get("ns", "key1")
+    assert entry is not None and entry[0] == b"from child"
+    assert backend.get("ns", "key0") is not None
+    backend.close()
+
+
+def test_caches_share_loaded_items(tmp_path) -> None:
+    """Two caches on the same file stand for two workers: the second one finds the item loaded by the first one."""
+    path = str(tmp_path / "cache.db")
+    loads: List[str] = []
+
+    def loader() -> dict:
+        loads.append("key1")
+        return {"answer": 42}
+
+    worker1 = TTLCache[dict](ttl=60, namespace="config", codec=JsonCacheCodec(), backend=SQLiteCacheBackend(path))
+    worker2 = TTLCache[dict](ttl=60, namespace="config", codec=JsonCacheCodec(), backend=SQLiteCacheBackend(path))
+
+    assert worker1.get_or_load("key1", loader) == {"answer": 42}
+    assert worker2.get_or_load("key1", loader) == {"answer": 42}
+    assert worker2.get_or_load("key1", loader) == {"answer": 42}
+
+    assert loads == ["key1"]
+    assert worker2.stats.shared_hits == 1
+    assert worker2.stats.hits == 1
+
+
+def test_local_copy_expires_with_shared_item() -> None:
+    backend = InMemoryCacheBackend()
+    writer = TTLCache[dict](ttl=60, namespace="config", codec=JsonCacheCodec(), backend=backend)
+    reader = TTLCache[dict](ttl=60, namespace="config", codec=JsonCacheCodec(), backend=backend)
+
+    writer.set("key1", {"a": 1}, ttl=0.05)
+    assert reader.get("key1") == {"a": 1}
+    time.sleep(0.1)
+    assert reader.get("key1") is None
+
+
+def test_delete_and_shared_clear_reach_the_backend() -> None:
+    backend = InMemoryCacheBackend()
+    cache = TTLCache[dict](namespace="config", codec=JsonCacheCodec(), backend=backend)
+    cache.set("key1", {"a": 1})
+    cache.set("key2", {"b": 2})
+
+    cache.delete("key1")
+    assert backend.get("config", "key1") is None
+    cache.clear()
+    assert len(cache) == 0 and backend.get("config", "key2") is not None
+    cache.clear(shared=True)
+    assert backend.get("config", "key2") is None
+
+
+def test_model_codec() -> None:
+    codec = ModelCacheCodec(AgentMetadata)
+    metadata = AgentMetadata(name="agent", short_description="short", long_description="long", tags=["a"])
+    assert codec.decode(codec.encode(metadata)) == metadata
+
+
+def test_backend_errors_keep_the_cache_local() -> None:
+    cache = TTLCache[dict](namespace="config", codec=JsonCacheCodec(), backend=FailingBackend())
+
+    assert cache.get_or_load("key1", lambda: {"a": 1}) == {"a": 1}
+    assert cache.get("key1") == {"a": 1}
+    cache.delete("key1")
+    cache.clear(shared=True)
+    assert cache.stats.loads == 1
+
+
+def test_shared_cache_backend_is_used_by_default() -> None:
+    backend = InMemoryCacheBackend()
+    set_shared_cache_backend(backend)
+    try:
+        cache = TTLCache[dict](namespace="config", codec=JsonCacheCodec())
+        cache.set("key1", {"a": 1})
+        assert backend.get("config", "key1") is not None
+
+        local = TTLCache[dict]()
+        local.set("key1", {"a": 1})
+        assert backend.get("", "key1") is None
+    finally:
+        set_shared_cache_backend(None)
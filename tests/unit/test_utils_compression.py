@@ -0,0 +1,60 @@
+import pytest
+
+from theoriq.utils import (
+    GZIP_CODING,
+    ZSTD_CODING,
+    ContentDecodingError,
+    UnsupportedContentEncodingError,
+    content_coding,
+    decompress_body,
+    negotiate_content_coding,
+)
+
+
+def test_gzip_round_trip():
+    data = b"lorem ipsum " * 1000
+    compressed = GZIP_CODING.compress(data)
+    assert len(compressed) < len(data)
+    assert GZIP_CODING.decompress(compressed) == data
+    assert decompress_body(compressed, "gzip") == data
+    assert decompress_body(data, None) == data
+
+
+def test_gzip_rejects_invalid_and_oversized_bodies():
+    compressed = GZIP_CODING.compress(b"a" * 10_000)
+    with pytest.raises(ContentDecodingError):
+        GZIP_CODING.decompress(compressed, max_size=1000)
+    with pytest.raises(ContentDecodingError):
+        GZIP_CODING.decompress(compressed[:-10])
+    with pytest.raises(ContentDecodingError):
+        GZIP_CODING.decompress(b"not gzip")
+
+
+def test_zstd_round_trip():
+    pytest.importorskip("zstandard")
+    data = b"lorem ipsum " * 1000
+    assert ZSTD_CODING.decompress(ZSTD_CODING.compress(data)) == data
+    with pytest.raises(ContentDecodingError):
+        ZSTD_CODING.decompress(ZSTD_CODING.compress(data), max_size=1000)
+
+
+def test_content_coding():
+    assert content_coding(" GZIP ") is GZIP_CODING
+    with pytest.raises(UnsupportedContentEncodingError):
+        content_coding("br")
+    with pytest.raises(UnsupportedContentEncodingError):
+        decompress_body(b"data", "gzip, br")
+
+
+def test_negotiate_content_coding():
+    assert negotiate_content_coding(None) is None
+    assert negotiate_content_coding("identity") is None
+    assert negotiate_content_coding("br") is None
+    assert negotiate_content_coding("gzip;q=0") is None
+    assert negotiate_content_coding("gzip, deflate") is GZIP_CODING
+
+    preferred = ZSTD_CODING if ZSTD_CODING.is_available else GZIP_CODING
+    assert negotiate_content_coding("gzip, zstd") is preferred
+    assert negotiate_content_coding("*") is preferred
+    assert negotiate_content_coding("gzip, zstd;q=0.5") is GZIP_CODING
+    assert negotiate_content_coding("gzip;level=9;q=0") is None
@@ -0,0 +1,53 @@
+import pytest
+
+from theoriq.api.v1alpha2.schemas import ExecuteRequestBody
+from theoriq.biscuit import AgentAddress
+from theoriq.dialog import Dialog, DialogItem
+from theoriq.utils import (
+    JSON_ENCODING,
+    MSGPACK_ENCODING,
+    UnsupportedBodyEncodingError,
+    body_encoding,
+    negotiate_body_encoding,
+)
+
+
+def test_body_encoding_from_content_type():
+    assert body_encoding(None) is JSON_ENCODING
+    assert body_encoding("application/json; charset=utf-8") is JSON_ENCODING
+    assert body_encoding("Application/MsgPack") is MSGPACK_ENCODING
+    with pytest.raises(UnsupportedBodyEncodingError):
+        body_encoding("application/cbor")
+
+
+def test_negotiate_body_encoding_defaults_to_json():
+    assert negotiate_body_encoding(None) is JSON_ENCODING
+    assert negotiate_body_encoding("*/*") is JSON_ENCODING
+    assert negotiate_body_encoding("application/cbor") is JSON_ENCODING
+    assert negotiate_body_encoding("application/json, application/msgpack;q=0.5") is JSON_ENCODING
+    assert negotiate_body_encoding("application/msgpack;q=0") is JSON_ENCODING
+
+    expected = MSGPACK_ENCODING if MSGPACK_ENCODING.is_available else JSON_ENCODING
+    assert negotiate_body_encoding("application/msgpack, application/json;q=0.9") is expected
+
+
+def test_model_dump_bytes_defaults_to_json():
+    body = ExecuteRequestBody(dialog=Dialog(items=[DialogItem.new_text(source=str(AgentAddress.one()), text="hello")]))
+    assert body.model_dump_bytes() == body.model_dump_json_bytes()
+    assert body.model_dump_bytes(JSON_ENCODING) == body.model_dump_json_bytes()
+    assert ExecuteRequestBody.model_validate(JSON_ENCODING.decode(body.model_dump_bytes())) == body
+
+
+def test_model_dump_bytes_with_msgpack():
+    pytest.importorskip("msgpack")
+    body = ExecuteRequestBody(dialog=Dialog(items=[DialogItem.new_text(source=str(AgentAddress.one()), text="hello")]))
+    encoded = body.model_dump_bytes(MSGPACK_ENCODING)
+    assert ExecuteRequestBody.model_validate(MSGPACK_ENCODING.decode(encoded)) == body
+    assert MSGPACK_ENCODING.decode(encoded) == JSON_ENCODING.decode(body.model_dump_json_bytes())
+
+
+def test_msgpack_is_unsupported_without_msgpack():
+    if MSGPACK_ENCODING.is_available:
+        pytest.skip("msgpack is installed")
+    with pytest.raises(UnsupportedBodyEncodingError):
+        MSGPACK_ENCODING.encode({"a": 1})
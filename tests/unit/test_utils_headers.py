@@ -0,0 +1,10 @@
+from theoriq.utils.headers import header_quality
+
+
+def test_header_quality():
+    assert header_quality("application/json") == 1.0
+    assert header_quality("gzip") == 1.0
+    assert header_quality("application/msgpack;q=0.5") == 0.5
+    assert header_quality("application/json; charset=utf-8; Q = 0.8") == 0.8
+    assert header_quality("zstd;q=0") == 0.0
+    assert header_quality("gzip;q=high") == 0.0
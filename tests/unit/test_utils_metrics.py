@@ -0,0 +1,95 @@
+from datetime import datetime, timezone
+from typing import Sequence, Tuple
+from unittest.mock import MagicMock
+from uuid import UUID
+
+from theoriq.api.v1alpha2.protocol.biscuit_provider import BiscuitProvider
+from theoriq.biscuit import TheoriqBiscuit
+from theoriq.biscuit.facts import FactConvertibleBase
+from theoriq.utils import InMemoryMetricsRegistry, notification_timestamp, set_default_metrics_sink
+from theoriq.utils.metrics import BISCUIT_RENEWALS, get_default_metrics_sink
+
+
+def test_registry_counts_by_name_and_labels() -> None:
+    registry = InMemoryMetricsRegistry()
+    registry.increment("received", labels={"agent": "a"})
+    registry.increment("received", 2, labels={"agent": "a"})
+    registry.increment("received", labels={"agent": "b"})
+
+    assert registry.counter("received", {"agent": "a"}) == 3
+    assert registry.counter("received", {"agent": "b"}) == 1
+    assert registry.counter("received", {"agent": "c"}) == 0
+    assert registry.snapshot()["received"] == [
+        {"labels": {"agent": "a"}, "value": 3},
+        {"labels": {"agent": "b"}, "value": 1},
+    ]
+
+    registry.reset()
+    assert registry.snapshot() == {}
+
+
+def test_registry_histograms() -> None:
+    registry = InMemoryMetricsRegistry(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        registry.observe("latency", value, labels={"agent": "a"})
+
+    histogram = registry.histogram("latency", {"agent": "a"})
+    assert histogram is not None
+    assert histogram.count == 4 and histogram.sum == 2.65 and histogram.min == 0.05 and histogram.max == 2.0
+    assert histogram.bucket_counts == [2, 1, 1]
+    assert histogram.quantile(0.5) == 0.1 and histogram.quantile(0.75) == 1.0 and histogram.quantile(1) == 2.0
+    assert registry.histogram("latency", {"agent": "b"}) is None
+
+
+def test_registry_prometheus_exposition() -> None:
+    registry = InMemoryMetricsRegistry(buckets=(0.1, 1.0))
+    registry.increment("theoriq_received_total", 1234567, labels={"agent": 'a"b'})
+    registry.observe("theoriq_latency_seconds", 0.5)
+
+    assert registry.to_prometheus().splitlines() == [
+        "# TYPE theoriq_received_total counter",
+        'theoriq_received_total{agent="a\\"b"} 1234567',
+        "# TYPE theoriq_latency_seconds histogram",
+        'theoriq_latency_seconds_bucket{le="0.1"} 0',
+        'theoriq_latency_seconds_bucket{le="1"} 1',
+        'theoriq_latency_seconds_bucket{le="+Inf"} 1',
+        "theoriq_latency_seconds_sum 0.5",
+        "theoriq_latency_seconds_count 1",
+    ]
+
+
+def test_notification_timestamp() -> None:
+    published_at = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    assert notification_timestamp('{"timestamp": 1714566600.5, "price": 1}') == 1714566600.5
+    assert notification_timestamp('{"timestamp": "2024-05-01T12:30:00Z"}') == published_at.timestamp()
+    assert notification_timestamp('{"timestamp": "2024-05-01T12:30:00"}') == published_at.timestamp()
+    assert notification_timestamp('{"timestamp": "yesterday"}') is None
+    assert notification_timestamp('{"timestamp": true}') is None
+    assert notification_timestamp('{"timestamp": ') is None
+    assert notification_timestamp("timestamp") is None
+
+
+class CountingBiscuitProvider(BiscuitProvider):
+    @property
+    def address(self) -> str:
+        return "0x1234"
+
+    def _get_new_biscuit(self) -> Tuple[TheoriqBiscuit, int]:
+        return MagicMock(spec=TheoriqBiscuit), 0
+
+    def get_request_biscuit(self, request_id: UUID, facts: Sequence[FactConvertibleBase]) -> TheoriqBiscuit:
+        raise NotImplementedError()
+
+
+def test_biscuit_renewals_are_counted() -> None:
+    previous = get_default_metrics_sink()
+    registry = InMemoryMetricsRegistry()
+    set_default_metrics_sink(registry)
+    try:
+        provider = CountingBiscuitProvider()
+        provider.get_biscuit()
+        provider.get_biscuit()  # expired on renewal, since it expires at 0
+    finally:
+        set_default_metrics_sink(previous)
+
+    assert registry.counter(BISCUIT_RENEWALS, {"agent": "0x1234"}) == 2
@@ -1,6 +1,7 @@
 from .v1alpha2.protocol import ProtocolClient as ProtocolClientV1alpha2
 from .v1alpha2.execute import ExecuteContext as ExecuteContextV1alpha2
 from .v1alpha2.execute import ExecuteRequestFn as ExecuteRequestFnV1alpha2
+from .v1alpha2.execute import ExecuteStreamFn as ExecuteStreamFnV1alpha2
 from .v1alpha2.schemas import AgentResponse as AgentResponseV1alpha2
 from .v1alpha2.schemas import AgentSchemas as AgentSchemasV1alpha2
 from .v1alpha2.schemas import ExecuteSchema as ExecuteSchemaV1alpha2
@@ -4,10 +4,10 @@ import abc
 from typing import Any, Dict, Optional, Sequence
 from uuid import UUID
 
-from ..biscuit import RequestBiscuit, ResponseBiscuit
+from ..biscuit import PayloadHash, RequestBiscuit, ResponseBiscuit
 from ..dialog import BlockBase, DialogItem, ErrorBlock, TextBlock
 from ..types import AgentMetadata, SourceType
-from ..utils import TTLCache
+from ..utils import ModelCacheCodec, TTLCache
 from .v1alpha2.agent import Agent
 
 
@@ -35,7 +35,9 @@ class ExecuteContextBase(RequestSenderBase):
     Represents the context for executing a request, managing interactions with the agent and protocol client.
     """
 
-    _metadata_cache: TTLCache[AgentMetadata] = TTLCache(ttl=180, max_size=40)
+    _metadata_cache: TTLCache[AgentMetadata] = TTLCache(
+        ttl=180, max_size=40, namespace="agent_metadata", codec=ModelCacheCodec(AgentMetadata)
+    )
 
     def __init__(self, agent: Agent, request_biscuit: RequestBiscuit) -> None:
         """
@@ -60,6 +62,19 @@ class ExecuteContextBase(RequestSenderBase):
         """
         return self._agent.attenuate_biscuit_for_response(self._request_biscuit, body)
 
+    def new_response_biscuit_for_hash(self, body_hash: PayloadHash) -> ResponseBiscuit:
+        """
+        Builds a biscuit for the response to an 'execute' request from the hash of the response body.
+        Used when the body is streamed and never held in memory as a whole.
+
+        Args:
+            body_hash (PayloadHash): The hash of the body content of the response.
+
+        Returns:
+            ResponseBiscuit: A biscuit for the response, incorporating the provided body hash.
+        """
+        return self._agent.attenuate_biscuit_for_response_hash(self._request_biscuit, body_hash)
+
     def new_error_response_biscuit(self, body: bytes) -> ResponseBiscuit:
         """
         Builds a biscuit for the response to an 'execute' request in case of an error.
@@ -165,13 +180,7 @@ class ExecuteContextBase(RequestSenderBase):
             return None
 
         key = self._request_biscuit.request_facts.request.from_addr
-        result = self._metadata_cache.get(key)
-        if result is not None:
-            return result
-
-        result = self._sender_metadata(key)
-        self._metadata_cache.set(key, result)
-        return result
+        return self._metadata_cache.get_or_load(key, lambda: self._sender_metadata(key))
 
     @abc.abstractmethod
     def _sender_metadata(self, agent_id: str) -> AgentMetadata:
@@ -1,5 +1,5 @@
 from .protocol import ProtocolClient
 from .schemas import AgentResponse, ExecuteRequestBody
-from .execute import ExecuteContext, ExecuteRequestFn
+from .execute import ExecuteContext, ExecuteRequestFn, ExecuteStreamFn
 from .configure import ConfigureContext, ConfigureFn
 from .publish import PublisherContext, PublishJob, Publisher
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+import json
 import os
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 import biscuit_auth
 from biscuit_auth import Biscuit, KeyPair, PrivateKey  # pylint: disable=E0611
@@ -22,14 +23,84 @@ from theoriq.biscuit import (
     TheoriqFactBase,
     VerificationError,
 )
+from theoriq.dialog import BaseData, BlockBase, CommandBlock, CustomBlock, DataBlock, DialogItem, TextBlock
+from theoriq.utils import TTLCache
 
-from .schemas import AgentSchemas
+from .schemas import AgentSchemas, ExecuteRequestBody
 
 
 class AgentSchemaError(Exception):
     pass
 
 
+class ExecuteRequestSchemaError(AgentSchemaError):
+    """Raised when the payload of an execute request does not match the operation's request schema."""
+
+    pass
+
+
+class ExecuteResponseSchemaError(AgentSchemaError):
+    """Raised when the payload of an execute response does not match the operation's response schema."""
+
+    pass
+
+
+_compiled_validators: TTLCache[Draft7Validator] = TTLCache(ttl=None, max_size=256)
+
+
+def compiled_validator(schema: Dict[str, Any]) -> Draft7Validator:
+    """
+    Returns a validator for the given JSON schema.
+    Validators are cached by the hash of the canonical form of the schema.
+    """
+    key = PayloadHash.compute_hash(json.dumps(schema, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+    return _compiled_validators.get_or_load(key, lambda: Draft7Validator(schema))
+
+
+def execute_payload(block: BlockBase) -> Any:
+    """Returns the value of a block validated against an execute schema."""
+    if isinstance(block, CommandBlock):
+        arguments = block.data.arguments
+        return arguments if isinstance(arguments, dict) else arguments.model_dump(mode="json")
+    if isinstance(block, TextBlock):
+        return block.data.text
+    if isinstance(block, DataBlock):
+        return json.loads(block.data.data) if block.data.type == "json" else block.data.data
+    if isinstance(block, CustomBlock):
+        return block.data.data
+    if isinstance(block.data, BaseData):
+        return block.data.model_dump(mode="json")
+    return block.data
+
+
+class AgentSchemaValidators:
+    """Validators compiled once from the schemas of an agent."""
+
+    def __init__(self, schemas: AgentSchemas) -> None:
+        self.configuration = compiled_validator(schemas.configuration) if schemas.configuration is not None else None
+        self.execute: Dict[str, Tuple[Draft7Validator, Draft7Validator]] = {
+            operation: (compiled_validator(schema.request), compiled_validator(schema.response))
+            for operation, schema in (schemas.execute or {}).items()
+        }
+
+    def execute_operation(self, body: ExecuteRequestBody) -> Optional[str]:
+        """
+        Returns the operation targeted by an execute request.
+
+        The operation is the name of the command when the last block of the request is a command block,
+        or the only operation of the agent otherwise.
+        """
+        if not self.execute:
+            return None
+
+        last_item = body.last_item
+        if last_item is not None and len(last_item.blocks) > 0:
+            block = last_item.blocks[-1]
+            if isinstance(block, CommandBlock) and block.data.name in self.execute:
+                return block.data.name
+        return next(iter(self.execute)) if len(self.execute) == 1 else None
+
+
 class AgentDeploymentConfiguration:
     """Expected configuration for a deployment of a 'Theoriq' agent."""
 
@@ -65,9 +136,15 @@ class Agent:
         schemas (AgentSchemas): Schemas for the agent.
     """
 
-    def __init__(self, config: AgentDeploymentConfiguration, schemas: AgentSchemas = AgentSchemas.empty()) -> None:
+    def __init__(
+        self,
+        config: AgentDeploymentConfiguration,
+        schemas: AgentSchemas = AgentSchemas.empty(),
+        validators: Optional[AgentSchemaValidators] = None,
+    ) -> None:
         self._config = config
         self._schemas = schemas
+        self._validators = validators or AgentSchemaValidators(schemas)
         self.virtual_address: AgentAddress = AgentAddress.null()
 
     @property
@@ -98,6 +175,11 @@ class Agent:
     def attenuate_biscuit_for_response(self, req_biscuit: RequestBiscuit, body: bytes) -> ResponseBiscuit:
         return req_biscuit.attenuate_for_response(body, self.config.private_key)
 
+    def attenuate_biscuit_for_response_hash(
+        self, req_biscuit: RequestBiscuit, body_hash: PayloadHash
+    ) -> ResponseBiscuit:
+        return req_biscuit.attenuate_for_response_hash(body_hash, self.config.private_key)
+
     def attenuate_biscuit(self, biscuit: TheoriqBiscuit, fact: TheoriqFactBase) -> TheoriqBiscuit:
         return biscuit.attenuate_third_party_block(self.config.private_key, fact)
 
@@ -128,16 +210,59 @@ class Agent:
         private_key = Ed25519PrivateKey.from_private_bytes(private_key_bytes)
         return private_key.sign(challenge)
 
+    @property
+    def validators(self) -> AgentSchemaValidators:
+        return self._validators
+
     def validate_configuration(self, values: Any) -> None:
-        if self.schemas.configuration is None:
+        validator = self._validators.configuration
+        if validator is None:
             return
 
-        validator = Draft7Validator(self.schemas.configuration)
         try:
             validator.validate(values)
         except ValidationError as e:
             raise AgentSchemaError(f"ValidationError for agent configuration: {e.message}") from e
 
+    def validate_execute_request(self, body: ExecuteRequestBody) -> Optional[str]:
+        """
+        Validate the payload of an execute request against the request schema of the targeted operation.
+
+        :return: the targeted operation, or None if no operation could be identified
+        :raises ExecuteRequestSchemaError: if the payload does not match the request schema
+        """
+        operation = self._validators.execute_operation(body)
+        last_item = body.last_item
+        if operation is None or last_item is None:
+            return None
+
+        if len(last_item.blocks) == 0:
+            raise ExecuteRequestSchemaError(f"ValidationError for execute/{operation} request: no blocks")
+
+        request_validator, _ = self._validators.execute[operation]
+        try:
+            request_validator.validate(execute_payload(last_item.blocks[-1]))
+        except (ValidationError, ValueError) as e:
+            message = e.message if isinstance(e, ValidationError) else str(e)
+            raise ExecuteRequestSchemaError(f"ValidationError for execute/{operation} request: {message}") from e
+        return operation
+
+    def validate_execute_response(self, operation: str, dialog_item: DialogItem) -> None:
+        """
+        Validate the payload of an execute response against the response schema of the given operation.
+
+        :raises ExecuteResponseSchemaError: if the payload does not match the response schema
+        """
+        if len(dialog_item.blocks) == 0:
+            raise ExecuteResponseSchemaError(f"ValidationError for execute/{operation} response: no blocks")
+
+        _, response_validator = self._validators.execute[operation]
+        try:
+            response_validator.validate(execute_payload(dialog_item.blocks[-1]))
+        except (ValidationError, ValueError) as e:
+            message = e.message if isinstance(e, ValidationError) else str(e)
+            raise ExecuteResponseSchemaError(f"ValidationError for execute/{operation} response: {message}") from e
+
     def __str__(self) -> str:
         return f"Address: {self.config.address}, Public key: 0x{self.config.public_key.to_hex()}"
 
@@ -7,12 +7,13 @@ Types and functions used by an Agent when executing a Theoriq request
 from __future__ import annotations
 
 import uuid
-from typing import Any, Callable, Dict, List, Optional, Sequence
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Union
 
 from theoriq.biscuit import AgentAddress, RequestBiscuit, ResponseBiscuit, TheoriqBiscuit
 from theoriq.biscuit.facts import TheoriqRequest
 from theoriq.dialog import BlockBase, Dialog, DialogItem
 from theoriq.types import AgentMetadata, Metric
+from theoriq.utils import BodyEncoding
 
 from ..common import ExecuteContextBase, ExecuteResponse
 from .agent import Agent
@@ -72,13 +73,17 @@ class ExecuteContext(ExecuteContextBase):
         biscuit = self.agent_biscuit()
         self._protocol_client.post_notification(biscuit=biscuit, agent_id=self.agent_address, notification=notification)
 
-    def send_request(self, blocks: Sequence[BlockBase], to_addr: str) -> ExecuteResponse:
+    def send_request(
+        self, blocks: Sequence[BlockBase], to_addr: str, encoding: Optional[BodyEncoding] = None
+    ) -> ExecuteResponse:
         """
         Sends a request to another address, attenuating the biscuit for the request and handling the response.
 
         Args:
             blocks (Sequence[ItemBlock]): The blocks of data to include in the request.
             to_addr (str): The address to which the request is sent.
+            encoding (Optional[BodyEncoding]): The encoding of the request body, also requested for the response.
+                Defaults to JSON.
 
         Returns:
             ExecuteResponse: The response received from the request.
@@ -87,12 +92,14 @@ class ExecuteContext(ExecuteContextBase):
         execute_request_body = ExecuteRequestBody(
             dialog=Dialog(items=[DialogItem.new(source=self.agent_address, blocks=blocks)])
         )
-        body = execute_request_body.model_dump_json().encode("utf-8")
+        body = execute_request_body.model_dump_bytes(encoding)
 
         request_id = uuid.uuid4()
         theoriq_request = TheoriqRequest.from_body(body=body, from_addr=config.address, to_addr=to_addr)
         request_biscuit = self._request_biscuit.attenuate_for_request(theoriq_request, config.private_key, request_id)
-        response = self._protocol_client.post_request(request_biscuit=request_biscuit, content=body, to_addr=to_addr)
+        response = self._protocol_client.post_request(
+            request_biscuit=request_biscuit, content=body, to_addr=to_addr, encoding=encoding
+        )
         return ExecuteResponse.from_protocol_response(
             data={"dialog_item": response}, request_id=request_id, status_code=200
         )
@@ -151,3 +158,9 @@ ExecuteRequestFn = Callable[[ExecuteContext, ExecuteRequestBody], ExecuteRespons
 Type alias for a function that takes an ExecuteContext and an ExecuteRequestBody,
 and returns an ExecuteResponse.
 """
+
+ExecuteStreamFn = Callable[[ExecuteContext, ExecuteRequestBody], Iterable[Union[BlockBase, str]]]
+"""
+Type alias for a function that takes an ExecuteContext and an ExecuteRequestBody,
+and yields the blocks of the response, or text deltas, as they are produced.
+"""
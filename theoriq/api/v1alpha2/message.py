@@ -6,6 +6,7 @@ from typing import Optional, Sequence
 from theoriq import ExecuteResponse
 from theoriq.biscuit import TheoriqRequest
 from theoriq.dialog import BlockBase, Dialog, DialogItem
+from theoriq.utils import BodyEncoding
 
 from ..common import RequestSenderBase
 from .protocol.biscuit_provider import BiscuitProvider, BiscuitProviderFactory
@@ -20,13 +21,17 @@ class Messenger(RequestSenderBase):
         self._client = client or ProtocolClient.from_env()
         self._biscuit_provider = biscuit_provider
 
-    def send_request(self, blocks: Sequence[BlockBase], to_addr: str) -> ExecuteResponse:
+    def send_request(
+        self, blocks: Sequence[BlockBase], to_addr: str, encoding: Optional[BodyEncoding] = None
+    ) -> ExecuteResponse:
         """
         Sends a request to another address, attenuating the biscuit for the request and handling the response.
 
         Args:
             blocks (Sequence[ItemBlock]): The blocks of data to include in the request.
             to_addr (str): The address to which the request is sent.
+            encoding (Optional[BodyEncoding]): The encoding of the request body, also requested for the response.
+                Defaults to JSON.
 
         Returns:
             ExecuteResponse: The response received from the request.
@@ -34,12 +39,14 @@ class Messenger(RequestSenderBase):
 
         dialog = Dialog(items=[DialogItem.new(source=self._biscuit_provider.address, blocks=blocks)])
         execute_request_body = ExecuteRequestBody(dialog=dialog)
-        body = execute_request_body.model_dump_json().encode("utf-8")
+        body = execute_request_body.model_dump_bytes(encoding)
 
         request_id = uuid.uuid4()
         theoriq_request = TheoriqRequest.from_body(body=body, from_addr=self._biscuit_provider.address, to_addr=to_addr)
         theoriq_biscuit = self._biscuit_provider.get_request_biscuit(request_id=request_id, facts=[theoriq_request])
-        response = self._client.post_request(request_biscuit=theoriq_biscuit, content=body, to_addr=to_addr)
+        response = self._client.post_request(
+            request_biscuit=theoriq_biscuit, content=body, to_addr=to_addr, encoding=encoding
+        )
         return ExecuteResponse.from_protocol_response(
             data={"dialog_item": response}, request_id=request_id, status_code=200
         )
@@ -1 +1,2 @@
 from .protocol_client import ProtocolClient
+from .sse import SSEEvent, SSEParser
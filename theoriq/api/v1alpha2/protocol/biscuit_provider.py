@@ -12,12 +12,14 @@ from theoriq.biscuit import AgentAddress, TheoriqBiscuit
 from theoriq.biscuit.authentication_biscuit import AuthenticationBiscuit, AuthenticationFacts
 from theoriq.biscuit.facts import ExpiresAtFact, FactConvertibleBase
 from theoriq.biscuit.utils import get_user_address_from_biscuit
+from theoriq.utils.metrics import BISCUIT_RENEWALS, agent_labels, get_default_metrics_sink
 
 
 class BiscuitProvider(abc.ABC):
     def __init__(self) -> None:
         self._biscuit: Optional[TheoriqBiscuit] = None
         self._renew_after: int = int(time.time())
+        self._metrics = get_default_metrics_sink()
 
     @property
     @abc.abstractmethod
@@ -39,6 +41,7 @@ class BiscuitProvider(abc.ABC):
         if self._biscuit is None or time.time() > self._renew_after:
             (self._biscuit, expires_at) = self._get_new_biscuit()
             self._renew_after = expires_at - 300
+            self._metrics.increment(BISCUIT_RENEWALS, labels=agent_labels(self.address))
         return self._biscuit
 
 
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 import os
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from enum import Enum
-from typing import Any, Dict, Final, Iterator, List, Optional, Union
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Union
 from uuid import UUID
 
 import httpx
@@ -13,7 +14,20 @@ from pydantic import BaseModel
 from theoriq.biscuit import AgentAddress, PayloadHash, RequestBiscuit, RequestFact, ResponseFact, TheoriqBiscuit
 from theoriq.biscuit.authentication_biscuit import AuthenticationBiscuit
 from theoriq.types import Metric, SourceType
-from theoriq.utils import TTLCache, is_protocol_secured
+from theoriq.utils import (
+    DEFAULT_MIN_COMPRESS_SIZE,
+    JSON_ENCODING,
+    BodyEncoding,
+    ContentCoding,
+    JsonCacheCodec,
+    ModelCacheCodec,
+    TTLCache,
+    accept_encoding_header,
+    accept_header,
+    content_coding,
+    find_body_encoding,
+    is_protocol_secured,
+)
 
 from ..agent import Agent
 from ..schemas import (
@@ -26,6 +40,7 @@ from ..schemas import (
     RequestAudit,
     RequestItem,
 )
+from .sse import SSEEvent, SSEParser
 
 
 class ConfigureResponse(BaseModel):
@@ -38,21 +53,33 @@ class RequestStatus(Enum):
 
 
 class ProtocolClient:
-    _config_cache: TTLCache[Dict[str, Any]] = TTLCache()
-    _public_key_cache: TTLCache[PublicKeyResponse] = TTLCache(ttl=None, max_size=5)
+    _config_cache: TTLCache[Dict[str, Any]] = TTLCache(namespace="configuration", codec=JsonCacheCodec())
+    _public_key_cache: TTLCache[PublicKeyResponse] = TTLCache(
+        ttl=None, max_size=5, namespace="public_key", codec=ModelCacheCodec(PublicKeyResponse)
+    )
 
-    def __init__(self, uri: str, timeout: Optional[int] = 120, max_retries: Optional[int] = None) -> None:
+    def __init__(
+        self,
+        uri: str,
+        timeout: Optional[int] = 120,
+        max_retries: Optional[int] = None,
+        request_compression: Optional[ContentCoding] = None,
+        compression_min_size: int = DEFAULT_MIN_COMPRESS_SIZE,
+    ) -> None:
+        """
+        :param request_compression: optional coding compressing the bodies of execute requests,
+            to use only with agents decompressing request bodies
+        :param compression_min_size: minimum size of the bodies compressed with `request_compression`
+        """
         self._uri = f"{uri}/api/v1alpha2"
         self._timeout = timeout
         self._max_retries = max_retries or 0
+        self._request_compression = request_compression
+        self._compression_min_size = compression_min_size
 
     @property
     def public_key(self) -> str:
-        key = self._public_key_cache.get(self._uri)
-        if key is None:
-            key = self.get_public_key()
-            self._public_key_cache.set(self._uri, key)
-        return key.public_key
+        return self._public_key_cache.get_or_load(self._uri, self.get_public_key).public_key
 
     def get_public_key(self) -> PublicKeyResponse:
         with httpx.Client(timeout=self._timeout) as client:
@@ -149,30 +176,50 @@ class ProtocolClient:
         agent_address: AgentAddress,
         configuration_hash: str,
     ) -> Dict[str, Any]:
-        key = f"{agent_address.address}_{configuration_hash}"
-        cached_response = self._config_cache.get(key)
-        if cached_response:
-            return cached_response
+        def load() -> Dict[str, Any]:
+            url = f"{self._uri}/agents/{agent_address.address}/configuration"
+            headers = request_biscuit.to_headers()
+            with httpx.Client(timeout=self._timeout) as client:
+                response = client.get(url=url, headers=headers)
+                response.raise_for_status()
+                return response.json()
 
-        url = f"{self._uri}/agents/{agent_address.address}/configuration"
-        headers = request_biscuit.to_headers()
-        with httpx.Client(timeout=self._timeout) as client:
-            response = client.get(url=url, headers=headers)
-            response.raise_for_status()
-            configuration = response.json()
-            if configuration is not None:
-                self._config_cache.set(key, configuration)
-            return configuration
+        key = f"{agent_address.address}_{configuration_hash}"
+        # Missing configurations are not cached, so that they are found once set
+        return self._config_cache.get_or_load(key, load, cache_if=bool)
 
     def post_request(
-        self, request_biscuit: Union[TheoriqBiscuit, RequestBiscuit], content: bytes, to_addr: str
+        self,
+        request_biscuit: Union[TheoriqBiscuit, RequestBiscuit],
+        content: bytes,
+        to_addr: str,
+        encoding: Optional[BodyEncoding] = None,
     ) -> Dict[str, Any]:
+        """
+        Posts an execute request to an agent.
+
+        The body is compressed when a request compression is configured, after being hashed: payload hashes are
+        always defined over the uncompressed body. Compressed responses are decompressed by `httpx`.
+
+        :param content: the body of the request, encoded with `encoding`, as hashed in the request biscuit
+        :param encoding: encoding of the body, also requested for the response. Defaults to JSON.
+        :return: the body of the response, decoded according to its Content-Type and as JSON by default
+        """
+        encoding = encoding or JSON_ENCODING
         url = f'{self._uri}/agents/{to_addr.removeprefix("0x")}/execute'
         headers = request_biscuit.to_headers()
+        headers["Accept-Encoding"] = accept_encoding_header()
+        if not encoding.is_json:
+            headers["Content-Type"] = encoding.content_type
+            headers["Accept"] = accept_header(encoding)
+        if self._request_compression is not None and len(content) >= self._compression_min_size:
+            content = self._request_compression.compress(content)
+            headers["Content-Encoding"] = self._request_compression.name
         with httpx.Client(timeout=self._timeout) as client:
             response = client.post(url=url, content=content, headers=headers)
             response.raise_for_status()
-            return response.json()
+            response_encoding = find_body_encoding(response.headers.get("Content-Type")) or JSON_ENCODING
+            return response_encoding.decode(response.content)
 
     def post_configure(self, biscuit: TheoriqBiscuit, to_addr: str) -> AgentResponse:
         url = f'{self._uri}/agents/{to_addr.removeprefix("0x")}/configure'
@@ -316,28 +363,68 @@ class ProtocolClient:
             response = client.post(url=url, content=notification, headers=headers)
             response.raise_for_status()
 
-    def subscribe_to_agent_notifications(self, biscuit: TheoriqBiscuit, agent_id: str) -> Iterator[str]:
-        CHUNK_SEP: Final[str] = "\n\n"
-
+    async def post_notification_async(
+        self, client: httpx.AsyncClient, biscuit: TheoriqBiscuit, agent_id: str, notification: str
+    ) -> None:
+        """Posts a notification of an agent with an asynchronous HTTP client, reusing its pooled connections."""
         url = f"{self._uri}/agents/{agent_id}/notifications"
         headers = biscuit.to_headers()
+        response = await client.post(url=url, content=notification, headers=headers)
+        response.raise_for_status()
+
+    def subscribe_to_agent_notifications(self, biscuit: TheoriqBiscuit, agent_id: str) -> Iterator[str]:
+        """Yields the data of the notifications of an agent, as they are received."""
+        for event in self.subscribe_to_agent_notification_events(biscuit, agent_id):
+            if event.data.strip() != ":":
+                yield event.data
+
+    def subscribe_to_agent_notification_events(
+        self, biscuit: TheoriqBiscuit, agent_id: str, last_event_id: Optional[str] = None
+    ) -> Iterator[SSEEvent]:
+        """
+        Yields the server-sent events of the notifications of an agent, as they are received.
+        :param last_event_id: id of the last event received, to resume a stream after it
+        """
+        url = f"{self._uri}/agents/{agent_id}/notifications"
+        headers = self._notification_stream_headers(biscuit, last_event_id)
         with httpx.Client(timeout=self._timeout) as client:
             with client.stream("GET", url, headers=headers) as response:
                 response.raise_for_status()
-                buffer = ""
-                for chunk in response.iter_text():
-                    if not chunk or chunk.strip() == ":":
-                        continue
-
-                    buffer += chunk
+                yield from SSEParser().iter_events(response.iter_bytes())
+
+    def new_async_http_client(self, max_connections: Optional[int] = None) -> httpx.AsyncClient:
+        """
+        Returns an asynchronous HTTP client pooling its connections, with the timeout of this client.
+        :param max_connections: maximum number of concurrent connections, unlimited by default
+        """
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=None)
+        return httpx.AsyncClient(timeout=self._timeout, limits=limits)
+
+    @asynccontextmanager
+    async def open_agent_notification_stream(
+        self,
+        client: httpx.AsyncClient,
+        biscuit: TheoriqBiscuit,
+        agent_id: str,
+        last_event_id: Optional[str] = None,
+    ) -> AsyncIterator[AsyncIterator[SSEEvent]]:
+        """
+        Opens the stream of the notifications of an agent with an asynchronous HTTP client.
+        The stream is open once the context is entered, and its events are received by iterating the context value.
+        :param last_event_id: id of the last event received, to resume a stream after it
+        """
+        url = f"{self._uri}/agents/{agent_id}/notifications"
+        headers = self._notification_stream_headers(biscuit, last_event_id)
+        async with client.stream("GET", url, headers=headers) as response:
+            response.raise_for_status()
+            yield SSEParser().aiter_events(response.aiter_bytes())
 
-                    # Process complete messages in buffer
-                    while CHUNK_SEP in buffer:
-                        message, buffer = buffer.split(CHUNK_SEP, 1)
-                        if message.startswith("data: "):
-                            payload = message[6:]  # remove the "data: " prefix
-                            if payload.strip() != ":":
-                                yield payload
+    @staticmethod
+    def _notification_stream_headers(biscuit: TheoriqBiscuit, last_event_id: Optional[str]) -> Dict[str, str]:
+        headers = biscuit.to_headers()
+        if last_event_id is not None:
+            headers["Last-Event-ID"] = last_event_id
+        return headers
 
     def get_web3_transactions(
         self,
@@ -395,10 +482,12 @@ class ProtocolClient:
         if not uri.startswith("http"):
             raise ValueError(f"THEORIQ_URI `{uri}` is not a valid URI")
 
+        request_compression = os.getenv("THEORIQ_REQUEST_COMPRESSION")
         result = cls(
             uri=uri,
             timeout=int(os.getenv("THEORIQ_TIMEOUT", "120")),
             max_retries=int(os.getenv("THEORIQ_MAX_RETRIES", "0")),
+            request_compression=content_coding(request_compression) if request_compression else None,
         )
         public_key = os.getenv("THEORIQ_PUBLIC_KEY")
         if public_key:
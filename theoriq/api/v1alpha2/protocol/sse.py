@@ -0,0 +1,172 @@
+"""Incremental parser of server-sent events streams."""
+
+from __future__ import annotations
+
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, List, Optional
+
+_BOM = "\ufeff".encode("utf-8")
+
+
+class SSEEvent:
+    """Event dispatched from a server-sent events stream."""
+
+    __slots__ = ("event", "data", "id", "retry")
+
+    def __init__(self, data: str, event: str = "message", id: Optional[str] = None, retry: Optional[int] = None):
+        """
+        :param data: the data of the event, the values of its `data` fields joined by new lines
+        :param event: the type of the event, `message` when the event has no `event` field
+        :param id: the last event id of the stream when the event was dispatched
+        :param retry: the reconnection time of the stream in milliseconds, if set by a `retry` field
+        """
+        self.data = data
+        self.event = event
+        self.id = id
+        self.retry = retry
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, SSEEvent):
+            return False
+        return (self.event, self.data, self.id, self.retry) == (other.event, other.data, other.id, other.retry)
+
+    def __repr__(self) -> str:
+        return f"SSEEvent(event={self.event!r}, data={self.data!r}, id={self.id!r}, retry={self.retry!r})"
+
+
+class SSEParser:
+    """
+    Parses a stream of server-sent events, following the event stream interpretation of the HTML specification,
+    from chunks of bytes split anywhere.
+
+    Chunks are split into lines as they are fed and only the incomplete last line of a chunk is kept, so that parsing
+    is linear in the size of the stream however the events are chunked. Lines may end with `\\n`, `\\r\\n` or `\\r`.
+    The complete events of a chunk with `\\n` line endings only are decoded at once, and an event made of a single
+    `data` line is dispatched without going through the fields one line at a time.
+    Comment lines and unknown fields are ignored.
+    """
+
+    def __init__(self) -> None:
+        self.last_event_id: Optional[str] = None
+        self.retry: Optional[int] = None
+        self._partial_line: List[bytes] = []
+        self._pending_cr = False
+        self._started = False
+        self._event_type = ""
+        self._data: List[str] = []
+
+    def feed(self, chunk: bytes) -> List[SSEEvent]:
+        """Parses a chunk of the stream and returns the events completed by it."""
+        if self._started and not self._pending_cr and b"\r" not in chunk:
+            return self._feed_lf(chunk)
+        return self._feed_lines(chunk)
+
+    def iter_events(self, chunks: Iterable[bytes]) -> Iterator[SSEEvent]:
+        """Yields the events of a stream as its chunks are received. An incomplete last event is discarded."""
+        for chunk in chunks:
+            yield from self.feed(chunk)
+
+    async def aiter_events(self, chunks: AsyncIterable[bytes]) -> AsyncIterator[SSEEvent]:
+        """Yields the events of a stream as its chunks are received asynchronously."""
+        async for chunk in chunks:
+            for event in self.feed(chunk):
+                yield event
+
+    def _feed_lf(self, chunk: bytes) -> List[SSEEvent]:
+        events: List[SSEEvent] = []
+        if self._partial_line:
+            end = chunk.find(b"\n")
+            if end < 0:
+                self._partial_line.append(chunk)
+                return events
+            self._partial_line.append(chunk[:end])
+            self._process_line(b"".join(self._partial_line).decode("utf-8", "replace"), events)
+            self._partial_line.clear()
+            chunk = chunk[end + 1 :]
+
+        # Lines and events are separated by ASCII characters, which never split a UTF-8 sequence
+        end = chunk.rfind(b"\n\n")
+        if end >= 0:
+            # Every block before the last blank line is followed by a blank line, ending its event
+            clean = not self._data and not self._event_type
+            last_event_id, retry = self.last_event_id, self.retry
+            for block in chunk[:end].decode("utf-8", "replace").split("\n\n"):
+                if clean and block[:6] == "data: " and "\n" not in block:
+                    events.append(SSEEvent(block[6:], "message", last_event_id, retry))
+                    continue
+                for line in block.split("\n"):
+                    self._process_line(line, events)
+                self._process_line("", events)
+                clean = True
+                last_event_id, retry = self.last_event_id, self.retry
+            chunk = chunk[end + 2 :]
+
+        if chunk:
+            raw_lines = chunk.split(b"\n")
+            partial = raw_lines.pop()
+            for raw_line in raw_lines:
+                self._process_line(raw_line.decode("utf-8", "replace"), events)
+            if partial:
+                self._partial_line.append(partial)
+        return events
+
+    def _feed_lines(self, chunk: bytes) -> List[SSEEvent]:
+        if self._pending_cr:
+            # The carriage return ending the previous chunk was the first half of a `\r\n` line ending
+            self._pending_cr = False
+            if chunk[:1] == b"\n":
+                chunk = chunk[1:]
+        if not chunk:
+            return []
+
+        lines = chunk.splitlines()
+        last = chunk[-1]
+        self._pending_cr = last == 0x0D
+        partial = lines.pop() if last != 0x0A and last != 0x0D else None
+        if lines:
+            if self._partial_line:
+                self._partial_line.append(lines[0])
+                lines[0] = b"".join(self._partial_line)
+                self._partial_line.clear()
+            if not self._started:
+                self._started = True
+                lines[0] = lines[0].removeprefix(_BOM)
+        if partial is not None:
+            self._partial_line.append(partial)
+
+        events: List[SSEEvent] = []
+        for line in lines:
+            self._process_line(line.decode("utf-8", "replace"), events)
+        return events
+
+    def _process_line(self, line: str, events: List[SSEEvent]) -> None:
+        if not line:
+            if self._data:
+                events.append(self._dispatch())
+            else:
+                self._event_type = ""
+            return
+        if line[0] == ":":  # comment
+            return
+
+        field, colon, value = line.partition(":")
+        if colon and value[:1] == " ":
+            value = value[1:]
+
+        if field == "data":
+            self._data.append(value)
+        elif field == "event":
+            self._event_type = value
+        elif field == "id":
+            if "\0" not in value:
+                self.last_event_id = value
+        elif field == "retry":
+            if value.isascii() and value.isdigit():
+                self.retry = int(value)
+
+    def _dispatch(self) -> SSEEvent:
+        lines = self._data
+        data = lines[0] if len(lines) == 1 else "\n".join(lines)
+        event = SSEEvent(data, self._event_type or "message", self.last_event_id, self.retry)
+        self._data = []
+        self._event_type = ""
+        return event
@@ -1,39 +1,112 @@
 from __future__ import annotations
 
+import asyncio
+import concurrent.futures
+import inspect
 import logging
 import threading
-from typing import Any, Callable, Dict, Optional
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Union, cast
 
 from ...biscuit import AgentAddress
+from ...utils.metrics import (
+    NOTIFICATION_PUBLISH_FAILURES,
+    NOTIFICATION_PUBLISH_SECONDS,
+    NOTIFICATIONS_PUBLISHED,
+    NOTIFICATIONS_PUBLISHED_BYTES,
+    MetricsSink,
+    agent_labels,
+    get_default_metrics_sink,
+)
 from .agent import Agent
 from .protocol import ProtocolClient
 from .protocol.biscuit_provider import BiscuitProviderFromPrivateKey
+from .publish_pipeline import PublishPipeline
 
 logger = logging.getLogger(__name__)
 
+# Time in seconds waited for the publish jobs of virtual agents to end once asked to stop
+DEFAULT_STOP_TIMEOUT = 10.0
+
 
 class PublisherContext:
-    def __init__(self, agent: Agent, client: ProtocolClient) -> None:
+    def __init__(
+        self,
+        agent: Agent,
+        client: ProtocolClient,
+        pipeline: Optional[PublishPipeline] = None,
+        metrics: Optional[MetricsSink] = None,
+    ) -> None:
+        """
+        :param pipeline: Pipeline publishing the messages asynchronously. Messages are published with a blocking
+            request when not set.
+        :param metrics: Sink of the metrics of the messages published without a pipeline, the default one if not set.
+        """
         self._agent = agent
         self._client = client
+        self._pipeline = pipeline
         self._address = agent.config.address if agent.virtual_address.is_null else agent.virtual_address
         self._biscuit_provider = BiscuitProviderFromPrivateKey(
             agent.config.private_key, agent.config.address, self._client
         )
         self._configuration: Optional[Dict[str, Any]] = None
+        self._metrics = metrics or get_default_metrics_sink()
+        self._labels = agent_labels(self._address)
+        self._stopped = threading.Event()
 
     @classmethod
     def from_env(cls) -> PublisherContext:
         return cls(agent=Agent.from_env(), client=ProtocolClient.from_env())
 
-    def publish(self, message: str) -> None:
+    def publish(self, message: str, coalesce_key: Optional[str] = None) -> None:
+        """
+        Publishes a message to the notification channel of the agent.
+
+        :param coalesce_key: With a pipeline, key of the message superseding the queued message with the same key.
+        """
+        if self._pipeline is not None:
+            self._pipeline.publish(self._address, message, self._biscuit_provider, coalesce_key=coalesce_key)
+            return
+
+        started_at = time.monotonic()
         biscuit = self._biscuit_provider.get_biscuit()
-        self._client.post_notification(biscuit, self._address.address, message)
+        try:
+            self._client.post_notification(biscuit, self._address.address, message)
+        except Exception:
+            self._metrics.increment(NOTIFICATION_PUBLISH_FAILURES, labels=self._labels)
+            raise
+        self._metrics.increment(NOTIFICATIONS_PUBLISHED, labels=self._labels)
+        self._metrics.increment(NOTIFICATIONS_PUBLISHED_BYTES, len(message.encode("utf-8")), labels=self._labels)
+        self._metrics.observe(NOTIFICATION_PUBLISH_SECONDS, time.monotonic() - started_at, labels=self._labels)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits for the messages published with the pipeline to be sent.
+
+        :return: whether all the messages were sent before the timeout
+        """
+        return self._pipeline.flush(timeout) if self._pipeline is not None else True
 
     @property
     def agent(self) -> Agent:
         return self._agent
 
+    @property
+    def is_stopped(self) -> bool:
+        """Whether the job publishing with this context was asked to stop."""
+        return self._stopped.is_set()
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Waits for the given time, in seconds, or until the job publishing with this context is asked to stop.
+
+        :return: whether the job was asked to stop
+        """
+        return self._stopped.wait(timeout)
+
+    def _stop(self) -> None:
+        self._stopped.set()
+
     @property
     def configuration(self) -> Optional[Dict[str, Any]]:
         return self._configuration
@@ -53,20 +126,26 @@ class PublisherContext:
 
 PublishJob = Callable[[PublisherContext], None]
 
-virtual_publishers: Dict[AgentAddress, Publisher] = {}
-virtual_publisher_job: Dict[AgentAddress, PublishJob] = {}
+# Type alias for a publish job run as a coroutine on the event loop of a `VirtualPublisherSupervisor`
+AsyncPublishJob = Callable[[PublisherContext], Awaitable[None]]
 
 
 class Publisher:
     """Manages publishing messages from an agent its notification channel."""
 
-    def __init__(self, agent: Agent, client: Optional[ProtocolClient] = None) -> None:
-        self._context = PublisherContext(agent=agent, client=client or ProtocolClient.from_env())
+    def __init__(
+        self, agent: Agent, client: Optional[ProtocolClient] = None, pipeline: Optional[PublishPipeline] = None
+    ) -> None:
+        self._context = PublisherContext(agent=agent, client=client or ProtocolClient.from_env(), pipeline=pipeline)
 
     @classmethod
     def from_env(cls, env_prefix: str = "") -> Publisher:
         return cls(agent=Agent.from_env(env_prefix=env_prefix), client=ProtocolClient.from_env())
 
+    @property
+    def context(self) -> PublisherContext:
+        return self._context
+
     def new_job(self, job: PublishJob, background: bool = False) -> threading.Thread:
         """
         Create a new job to publish messages.
@@ -81,30 +160,338 @@ class Publisher:
         return threading.Thread(target=lambda: job(self._context), daemon=background)
 
     @staticmethod
-    def resume_virtual_jobs(root_agent: Agent, job: PublishJob) -> None:
-        virtual_publisher_job[root_agent.config.address] = job
-        client = ProtocolClient.from_env()
-        biscuit_provider = BiscuitProviderFromPrivateKey(
-            root_agent.config.private_key, root_agent.config.address, client
-        )
-        agents = client.get_agents(biscuit_provider.get_biscuit())
-        for agent in agents:
-            if agent.configuration.virtual and agent.configuration.virtual.agent_id == root_agent.config.address:
-                Publisher.start_or_update_virtual_job(root_agent, AgentAddress(agent.system.id))
+    def resume_virtual_jobs(
+        root_agent: Agent,
+        job: Union[PublishJob, AsyncPublishJob],
+        *,
+        max_workers: int = 1024,
+        refresh_concurrency: int = 8,
+        pipeline: Optional[PublishPipeline] = None,
+    ) -> None:
+        """
+        Starts the job for every virtual agent of the root agent, with the supervisor of the root agent.
+
+        The supervisor is created with the given `max_workers`, `refresh_concurrency` and `pipeline` by the first
+        call for the root agent, see `VirtualPublisherSupervisor`. Later calls only replace the job.
+        """
+        with _supervisors_lock:
+            supervisor = _supervisors.get(root_agent.config.address)
+            if supervisor is None:
+                supervisor = VirtualPublisherSupervisor(
+                    root_agent,
+                    job,
+                    max_workers=max_workers,
+                    refresh_concurrency=refresh_concurrency,
+                    pipeline=pipeline,
+                )
+                _supervisors[root_agent.config.address] = supervisor
+            else:
+                supervisor.job = job
+        supervisor.resume()
 
     @staticmethod
     def start_or_update_virtual_job(root_agent: Agent, virtual_address: AgentAddress) -> None:
-        job = virtual_publisher_job.get(root_agent.config.address, None)
-        if job is None:
-            return
+        """Starts the job of a virtual agent, or refreshes its configuration if already started."""
+        supervisor = Publisher.virtual_supervisor(root_agent)
+        if supervisor is not None:
+            supervisor.start_or_update(virtual_address)
+
+    @staticmethod
+    def virtual_supervisor(root_agent: Agent) -> Optional[VirtualPublisherSupervisor]:
+        """Returns the supervisor of the virtual jobs of the root agent, once resumed."""
+        with _supervisors_lock:
+            return _supervisors.get(root_agent.config.address)
+
+
+class _VirtualJob:
+    __slots__ = ("publisher", "job", "future", "started", "previous")
+
+    def __init__(
+        self,
+        publisher: Publisher,
+        job: Union[PublishJob, AsyncPublishJob],
+        previous: Optional[concurrent.futures.Future[None]] = None,
+    ) -> None:
+        self.publisher = publisher
+        self.job = job
+        self.future: Optional[concurrent.futures.Future[None]] = None
+        self.started = False  # set once the job runs, not while it waits for a worker
+        self.previous = previous  # future of the replaced job, which must end before this one starts
+
+    @property
+    def virtual_address(self) -> AgentAddress:
+        return self.publisher.context.agent.virtual_address
+
+    @property
+    def is_async(self) -> bool:
+        return inspect.iscoroutinefunction(self.job)
+
+    @property
+    def is_pending(self) -> bool:
+        """Whether the job was submitted and did not end yet."""
+        return self.future is not None and not self.future.done()
+
+    @property
+    def is_running(self) -> bool:
+        return self.started and self.is_pending
+
+    @property
+    def can_start(self) -> bool:
+        return not self.is_pending and (self.previous is None or self.previous.done())
+
+
+class VirtualPublisherSupervisor:
+    """
+    Runs the publish jobs of the virtual agents of a root agent on a shared event loop and worker pool.
+
+    Only coroutine jobs (`AsyncPublishJob`) avoid a thread per job: they run on the event loop of the supervisor, so
+    that hundreds of them share a thread. Long-lived jobs, e.g. publishing periodically until stopped, should be
+    coroutine jobs. Plain jobs run in a pool of `max_workers` threads, and each one holds a thread for as long as it
+    runs. A plain job started while `max_workers` plain jobs are running is refused: it is logged as an error, counted
+    in `refused_jobs` and not running, and is started again by the next `start_or_update` of its agent. The
+    configurations of the virtual agents are refreshed concurrently, by up to `refresh_concurrency` requests at once.
+
+    Jobs are stopped with `stop`, which sets the stopped flag of their context and cancels coroutine jobs. Plain jobs
+    cannot be cancelled: they are expected to return once `PublisherContext.is_stopped` is set, e.g. by waiting with
+    `PublisherContext.wait`. Stopping waits for the jobs up to a timeout, and logs the ones still running.
+    """
 
-        publisher = virtual_publishers.get(virtual_address, None)
-        if publisher is None:
-            new_agent = Agent(root_agent.config, root_agent.schemas)
-            new_agent.virtual_address = virtual_address
-            publisher = Publisher(new_agent)
-            virtual_publishers[new_agent.virtual_address] = publisher
-            publisher._context.refresh_configuration()
-            publisher.new_job(job, background=True).start()
+    def __init__(
+        self,
+        root_agent: Agent,
+        job: Union[PublishJob, AsyncPublishJob],
+        client: Optional[ProtocolClient] = None,
+        *,
+        max_workers: int = 1024,
+        refresh_concurrency: int = 8,
+        pipeline: Optional[PublishPipeline] = None,
+    ) -> None:
+        """
+        :param job: Job run for each virtual agent, unless replaced for an agent.
+        :param max_workers: Maximum number of plain jobs running at once, each one in its own thread.
+        :param refresh_concurrency: Maximum number of configurations refreshed at once.
+        :param pipeline: Pipeline publishing the messages of the virtual agents asynchronously.
+        """
+        self.job = job
+        self._root_agent = root_agent
+        self._client = client or ProtocolClient.from_env()
+        self._pipeline = pipeline
+        self._lock = threading.Lock()
+        self._jobs: Dict[AgentAddress, _VirtualJob] = {}
+        self._max_workers = max_workers
+        self._plain_jobs = 0  # plain jobs holding a worker
+        self.refused_jobs = 0  # plain jobs not started because all the workers were busy
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix="theoriq-publish-job")
+        self._refresh_executor = concurrent.futures.ThreadPoolExecutor(
+            refresh_concurrency, thread_name_prefix="theoriq-refresh"
+        )
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="theoriq-publish-jobs", daemon=True)
+        self._thread.start()
+
+    @property
+    def addresses(self) -> List[AgentAddress]:
+        """Addresses of the virtual agents with a job."""
+        with self._lock:
+            return list(self._jobs)
+
+    def publisher(self, virtual_address: AgentAddress) -> Optional[Publisher]:
+        with self._lock:
+            virtual_job = self._jobs.get(virtual_address)
+            return virtual_job.publisher if virtual_job is not None else None
+
+    def is_running(self, virtual_address: AgentAddress) -> bool:
+        with self._lock:
+            virtual_job = self._jobs.get(virtual_address)
+            return virtual_job is not None and virtual_job.is_running
+
+    def resume(self) -> None:
+        """Starts the job of every virtual agent of the root agent, or refreshes the configuration of started ones."""
+        root_address = self._root_agent.config.address
+        biscuit_provider = BiscuitProviderFromPrivateKey(
+            self._root_agent.config.private_key, root_address, self._client
+        )
+        agents = self._client.get_agents(biscuit_provider.get_biscuit())
+        self.start_or_update_many(
+            AgentAddress(agent.system.id)
+            for agent in agents
+            if agent.configuration.virtual and _is_address(agent.configuration.virtual.agent_id, root_address)
+        )
+
+    def start_or_update(self, virtual_address: AgentAddress) -> None:
+        """Starts the job of a virtual agent, or refreshes its configuration if already started."""
+        self.start_or_update_many([virtual_address])
+
+    def start_or_update_many(self, virtual_addresses: Iterable[AgentAddress]) -> None:
+        """
+        Refreshes the configurations of virtual agents concurrently, then starts the jobs not running yet.
+        A failed refresh is logged and does not prevent the job from starting.
+        """
+        virtual_jobs: List[_VirtualJob] = []
+        with self._lock:
+            for virtual_address in dict.fromkeys(virtual_addresses):
+                virtual_job = self._jobs.get(virtual_address)
+                if virtual_job is None:
+                    virtual_job = self._jobs[virtual_address] = _VirtualJob(
+                        self._new_publisher(virtual_address), self.job
+                    )
+                virtual_jobs.append(virtual_job)
+
+        for virtual_job, error in zip(virtual_jobs, self._refresh_executor.map(self._refresh, virtual_jobs)):
+            if error is not None:
+                logger.warning(f"Failed to refresh configuration of agent {virtual_job.virtual_address}: {error}")
+
+        with self._lock:
+            for virtual_job in virtual_jobs:
+                if self._jobs.get(virtual_job.virtual_address) is virtual_job and virtual_job.can_start:
+                    self._start(virtual_job)
+
+    def replace(
+        self,
+        virtual_address: AgentAddress,
+        job: Union[PublishJob, AsyncPublishJob],
+        timeout: Optional[float] = DEFAULT_STOP_TIMEOUT,
+    ) -> bool:
+        """
+        Stops the job of a virtual agent, if any, and starts the given one instead once it ended. The two jobs never
+        run at the same time: if the previous job is still running after the timeout, the given one is started when
+        the previous one returns.
+
+        :param timeout: Maximum time in seconds to wait for the previous job to end, None to wait until it does.
+        :return: whether the previous job ended before the timeout
+        """
+        with self._lock:
+            previous = self._jobs.pop(virtual_address, None)
+            previous_future = previous.future if previous is not None else None
+            virtual_job = _VirtualJob(self._new_publisher(virtual_address), job, previous_future)
+            self._jobs[virtual_address] = virtual_job
+        stopped = self._stop([previous], timeout) if previous is not None else True
+        if previous_future is not None and not stopped:
+            logger.warning(f"Publish job of agent {virtual_address} will be replaced once the previous one returns")
+            previous_future.add_done_callback(lambda _: self._start_later(virtual_job))
         else:
-            publisher._context.refresh_configuration()
+            self.start_or_update(virtual_address)
+        return stopped
+
+    def stop(self, virtual_address: AgentAddress, timeout: Optional[float] = DEFAULT_STOP_TIMEOUT) -> bool:
+        """
+        Stops the job of a virtual agent and forgets its publisher.
+
+        :param timeout: Maximum time in seconds to wait for the job to end, None to wait until it does.
+        :return: whether the job ended before the timeout
+        """
+        with self._lock:
+            virtual_job = self._jobs.pop(virtual_address, None)
+        return self._stop([virtual_job], timeout) if virtual_job is not None else True
+
+    def close(self, timeout: Optional[float] = DEFAULT_STOP_TIMEOUT) -> bool:
+        """
+        Stops all the jobs and the event loop of the supervisor. Plain jobs still running after the timeout are left
+        to their threads.
+
+        :param timeout: Maximum time in seconds to wait for all the jobs to end, None to wait until they do.
+        :return: whether all the jobs ended before the timeout
+        """
+        with self._lock:
+            virtual_jobs = list(self._jobs.values())
+            self._jobs.clear()
+        stopped = self._stop(virtual_jobs, timeout)
+        asyncio.run_coroutine_threadsafe(self._cancel_tasks(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._executor.shutdown(wait=False)
+        self._refresh_executor.shutdown(wait=False)
+        return stopped
+
+    def _new_publisher(self, virtual_address: AgentAddress) -> Publisher:
+        agent = Agent(self._root_agent.config, self._root_agent.schemas)
+        agent.virtual_address = virtual_address
+        return Publisher(agent, self._client, self._pipeline)
+
+    @staticmethod
+    def _refresh(virtual_job: _VirtualJob) -> Optional[Exception]:
+        try:
+            virtual_job.publisher.context.refresh_configuration()
+            return None
+        except Exception as e:
+            return e
+
+    def _start_later(self, virtual_job: _VirtualJob) -> None:
+        # Called from the event loop, which must not wait for the configuration to be refreshed
+        try:
+            self._refresh_executor.submit(self.start_or_update, virtual_job.virtual_address)
+        except RuntimeError:  # the supervisor was closed
+            pass
+
+    @staticmethod
+    def _stop(virtual_jobs: List[_VirtualJob], timeout: Optional[float]) -> bool:
+        """Stops the given jobs and waits for them to end, logging the ones still running after the timeout."""
+        futures: Dict[concurrent.futures.Future[None], _VirtualJob] = {}
+        for virtual_job in virtual_jobs:
+            virtual_job.publisher.context._stop()
+            if virtual_job.future is not None:
+                if virtual_job.is_async:
+                    virtual_job.future.cancel()
+                futures[virtual_job.future] = virtual_job
+        if not futures:
+            return True
+
+        _, not_done = concurrent.futures.wait(futures, timeout)
+        for future in not_done:
+            logger.warning(
+                f"Publish job of agent {futures[future].virtual_address} did not stop within {timeout} seconds"
+            )
+        return not not_done
+
+    @staticmethod
+    async def _cancel_tasks() -> None:
+        # The tasks of the plain jobs still running end, leaving the jobs to their threads
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _start(self, virtual_job: _VirtualJob) -> None:
+        """Starts a job, unless it is a plain job and all the workers are busy. Called with the lock held."""
+        if not virtual_job.is_async:
+            if self._plain_jobs >= self._max_workers:
+                self.refused_jobs += 1
+                logger.error(
+                    f"Publish job of agent {virtual_job.virtual_address} not started: the {self._max_workers} workers "
+                    "are busy with plain jobs. Long-lived jobs should be coroutine jobs, which do not hold a worker."
+                )
+                return
+            self._plain_jobs += 1
+        virtual_job.started = False
+        virtual_job.future = asyncio.run_coroutine_threadsafe(self._run(virtual_job), self._loop)
+
+    async def _run(self, virtual_job: _VirtualJob) -> None:
+        context = virtual_job.publisher.context
+        try:
+            if virtual_job.is_async:
+                virtual_job.started = True
+                await cast(AsyncPublishJob, virtual_job.job)(context)
+            else:
+                await self._loop.run_in_executor(self._executor, self._run_plain, virtual_job)
+        except Exception:
+            logger.exception(f"Publish job of agent {context.agent.virtual_address} failed")
+
+    def _run_plain(self, virtual_job: _VirtualJob) -> None:
+        virtual_job.started = True
+        try:
+            cast(PublishJob, virtual_job.job)(virtual_job.publisher.context)
+        finally:
+            with self._lock:
+                self._plain_jobs -= 1
+
+
+def _is_address(value: str, address: AgentAddress) -> bool:
+    """Whether the given string is a spelling of the address, with or without its `0x` prefix, in any case."""
+    try:
+        return AgentAddress(value) == address
+    except TypeError:
+        return False
+
+
+_supervisors: Dict[AgentAddress, VirtualPublisherSupervisor] = {}
+_supervisors_lock = threading.Lock()
@@ -0,0 +1,350 @@
+"""Asynchronous pipeline publishing the notifications of agents over pooled connections."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set
+
+import httpx
+
+from theoriq.biscuit import AgentAddress
+from theoriq.utils.metrics import (
+    NOTIFICATION_PUBLISH_FAILURES,
+    NOTIFICATION_PUBLISH_SECONDS,
+    NOTIFICATIONS_PUBLISHED,
+    NOTIFICATIONS_PUBLISHED_BYTES,
+    MetricsSink,
+    agent_labels,
+    get_default_metrics_sink,
+)
+
+from .protocol.biscuit_provider import BiscuitProvider
+from .protocol.protocol_client import ProtocolClient
+
+logger = logging.getLogger(__name__)
+
+
+class PublishQueueFullError(Exception):
+    """Raised when a notification cannot be queued before the timeout because the outbound queue is full."""
+
+    pass
+
+
+class PublishPipelineClosedError(Exception):
+    """Raised when publishing to a closed pipeline."""
+
+    pass
+
+
+class PublishStats:
+    """Throughput and health of a publish pipeline."""
+
+    def __init__(self) -> None:
+        self.started_at = time.monotonic()
+        self.queued = 0
+        self.in_flight = 0
+        self.published = 0
+        self.published_bytes = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Notifications published per second since the start of the pipeline."""
+        return self.published / max(time.monotonic() - self.started_at, 1e-9)
+
+    @property
+    def byte_throughput(self) -> float:
+        """Bytes of notifications published per second since the start of the pipeline."""
+        return self.published_bytes / max(time.monotonic() - self.started_at, 1e-9)
+
+    @property
+    def average_latency(self) -> Optional[float]:
+        """Average time between the publication of a notification and the end of its post, in seconds."""
+        return self.total_latency / self.published if self.published else None
+
+    def on_published(self, size: int, latency: float) -> None:
+        self.published += 1
+        self.published_bytes += size
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def on_failed(self, error: BaseException) -> None:
+        self.failed += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "queued": self.queued,
+            "inFlight": self.in_flight,
+            "published": self.published,
+            "publishedBytes": self.published_bytes,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "failed": self.failed,
+            "lastError": self.last_error,
+            "throughput": self.throughput,
+            "byteThroughput": self.byte_throughput,
+            "averageLatency": self.average_latency,
+            "maxLatency": self.max_latency,
+        }
+
+
+class _PendingNotification:
+    __slots__ = ("message", "coalesce_key", "published_at")
+
+    def __init__(self, message: str, coalesce_key: Optional[str]) -> None:
+        self.message = message
+        self.coalesce_key = coalesce_key
+        self.published_at = time.monotonic()
+
+
+class _Lane:
+    """Notifications of an agent waiting to be posted, in order."""
+
+    __slots__ = ("agent_address", "labels", "biscuit_provider", "pending", "by_key", "draining")
+
+    def __init__(self, agent_address: AgentAddress, biscuit_provider: BiscuitProvider) -> None:
+        self.agent_address = agent_address
+        self.labels = agent_labels(agent_address)
+        self.biscuit_provider = biscuit_provider
+        self.pending: Deque[_PendingNotification] = deque()
+        self.by_key: Dict[str, _PendingNotification] = {}
+        self.draining = False
+
+
+class PublishPipeline:
+    """
+    Publishes the notifications of agents from a background event loop, without waiting for their posts.
+
+    Notifications are queued in a bounded outbound queue, shared by all the agents, and posted over the pooled
+    connections of one HTTP client, with up to `max_in_flight` posts at once. The notifications of an agent are
+    posted one at a time, in the order of their publication, while the notifications of different agents are posted
+    concurrently.
+
+    A notification published with a coalesce key supersedes the notification of the same agent with the same key
+    still waiting in the queue, which is then not posted, and takes its place in the queue. Failed posts are retried
+    with an exponential delay, then logged and counted in the stats. The queue of an agent is removed once empty.
+
+    Usage:
+        with PublishPipeline() as pipeline:
+            pipeline.publish(agent_address, message, biscuit_provider)
+    """
+
+    def __init__(
+        self,
+        client: Optional[ProtocolClient] = None,
+        *,
+        max_queue_size: int = 10_000,
+        max_in_flight: int = 16,
+        max_connections: Optional[int] = None,
+        max_retries: int = 3,
+        retry_delay: float = 0.1,
+        metrics: Optional[MetricsSink] = None,
+    ) -> None:
+        """
+        :param max_queue_size: Maximum number of notifications waiting to be posted, for all the agents.
+        :param max_in_flight: Maximum number of concurrent posts.
+        :param max_connections: Maximum number of pooled connections, unlimited by default.
+        :param max_retries: Number of retries of a failed post.
+        :param retry_delay: Delay before the first retry of a failed post, in seconds, doubled on each retry.
+        :param metrics: Sink of the metrics of the published notifications, the default one if not set.
+        """
+        if max_queue_size < 1:
+            raise ValueError("max_queue_size must be positive")
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be positive")
+
+        self._client = client or ProtocolClient.from_env()
+        self._max_queue_size = max_queue_size
+        self._max_in_flight = max_in_flight
+        self._max_connections = max_connections
+        self._max_retries = max_retries
+        self._retry_delay = retry_delay
+        self.stats = PublishStats()
+        self._metrics = metrics or get_default_metrics_sink()
+
+        # The state of the queue is shared by the publishing threads and the event loop
+        self._condition = threading.Condition()
+        self._lanes: Dict[AgentAddress, _Lane] = {}
+        self._closed = False
+
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task[None]] = set()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="theoriq-publish-pipeline", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> PublishPipeline:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def publish(
+        self,
+        agent_address: AgentAddress,
+        message: str,
+        biscuit_provider: BiscuitProvider,
+        *,
+        coalesce_key: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> None:
+        """
+        Queues a notification of an agent, waiting for room in the queue if it is full.
+
+        :param coalesce_key: Key of the notification, superseding the queued notification of the agent with this key.
+        :param timeout: Maximum time to wait for room in the queue, in seconds, unlimited by default.
+        :raises PublishQueueFullError: if the queue is still full after the timeout
+        :raises PublishPipelineClosedError: if the pipeline is closed
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise PublishPipelineClosedError("the publish pipeline is closed")
+                # Idle lanes are removed while waiting for room in the queue
+                lane = self._lanes.get(agent_address)
+                superseded = lane.by_key.get(coalesce_key) if lane is not None and coalesce_key is not None else None
+                if superseded is not None:
+                    superseded.message = message
+                    superseded.published_at = time.monotonic()
+                    self.stats.coalesced += 1
+                    return
+                if self.stats.queued < self._max_queue_size:
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise PublishQueueFullError(f"the outbound queue is full ({self._max_queue_size} notifications)")
+                self._condition.wait(remaining)
+
+            if lane is None:
+                lane = self._lanes[agent_address] = _Lane(agent_address, biscuit_provider)
+            notification = _PendingNotification(message, coalesce_key)
+            lane.pending.append(notification)
+            if coalesce_key is not None:
+                lane.by_key[coalesce_key] = notification
+            self.stats.queued += 1
+            if not lane.draining:
+                lane.draining = True
+                self._loop.call_soon_threadsafe(self._start_draining, lane)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits for the notifications already queued to be posted, or to fail.
+
+        :return: whether the queue was emptied before the timeout
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self.stats.queued == 0, timeout)
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """
+        Stops accepting notifications, waits for the queued ones to be posted and closes the connections.
+        The notifications still queued after the timeout are dropped.
+
+        :return: whether all the queued notifications were posted or failed before the timeout
+        """
+        with self._condition:
+            if self._closed and not self._thread.is_alive():
+                return self.stats.queued == 0
+            self._closed = True
+            self._condition.notify_all()
+        flushed = self.flush(timeout)
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        return flushed
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    def _start_draining(self, lane: _Lane) -> None:
+        task = self._loop.create_task(self._drain(lane))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _drain(self, lane: _Lane) -> None:
+        while True:
+            with self._condition:
+                if not lane.pending:
+                    lane.draining = False
+                    del self._lanes[lane.agent_address]
+                    return
+                notification = lane.pending.popleft()
+                if notification.coalesce_key is not None:
+                    del lane.by_key[notification.coalesce_key]
+            try:
+                await self._post(lane, notification)
+            finally:
+                with self._condition:
+                    self.stats.queued -= 1
+                    self._condition.notify_all()
+
+    async def _post(self, lane: _Lane, notification: _PendingNotification) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_in_flight)
+        if self._http_client is None:
+            self._http_client = self._client.new_async_http_client(self._max_connections)
+
+        async with self._semaphore:
+            self.stats.in_flight += 1
+            try:
+                for attempt in range(self._max_retries + 1):
+                    try:
+                        # Biscuits are cached by their provider, and renewed with a blocking request
+                        biscuit = await asyncio.to_thread(lane.biscuit_provider.get_biscuit)
+                        await self._client.post_notification_async(
+                            self._http_client, biscuit, lane.agent_address.address, notification.message
+                        )
+                    except Exception as e:
+                        if attempt == self._max_retries:
+                            self.stats.on_failed(e)
+                            self._metrics.increment(NOTIFICATION_PUBLISH_FAILURES, labels=lane.labels)
+                            logger.warning(f"Failed to publish a notification of agent {lane.agent_address}: {e}")
+                            return
+                        self.stats.retries += 1
+                        await asyncio.sleep(self._retry_delay * 2**attempt)
+                    else:
+                        latency = time.monotonic() - notification.published_at
+                        size = len(notification.message.encode("utf-8"))
+                        self.stats.on_published(size, latency)
+                        self._metrics.increment(NOTIFICATIONS_PUBLISHED, labels=lane.labels)
+                        self._metrics.increment(NOTIFICATIONS_PUBLISHED_BYTES, size, labels=lane.labels)
+                        self._metrics.observe(NOTIFICATION_PUBLISH_SECONDS, latency, labels=lane.labels)
+                        return
+            finally:
+                self.stats.in_flight -= 1
+
+    async def _shutdown(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        with self._condition:
+            for lane in self._lanes.values():
+                lane.pending.clear()
+                lane.by_key.clear()
+                lane.draining = False
+            self._lanes.clear()
+            self.stats.queued = 0
+            self._condition.notify_all()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
@@ -4,6 +4,6 @@ from .biscuit import BiscuitResponse, BiscuitResponseData
 from .challenge import ChallengeRequestBody, ChallengeResponseBody
 from .event_request import EventRequestBody
 from .metrics import MetricsRequestBody
-from .request import ExecuteRequestBody, RequestAudit, RequestItem
+from .request import ExecuteRequestBody, LazyExecuteRequestBody, RequestAudit, RequestItem
 from .schemas import AgentSchemas, ExecuteSchema
 from .web3 import AgentWeb3Transaction
@@ -1,12 +1,12 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Annotated, Any, List, Optional
+from typing import Annotated, Any, Dict, List, Optional
 from uuid import UUID
 
 from pydantic import Field
 
-from theoriq.dialog import Dialog, DialogItem, DialogItemPredicate
+from theoriq.dialog import Dialog, DialogItem, DialogItemCache, DialogItemPredicate, LazyDialog
 from theoriq.dialog.block import BaseTheoriqModel
 from theoriq.types import SourceType
 
@@ -54,6 +54,51 @@ class ExecuteRequestBody(BaseTheoriqModel):
         return self.dialog.last_item_predicate(predicate)
 
 
+class _LazyDialogEnvelope(BaseTheoriqModel):
+    items: List[Dict[str, Any]]
+
+
+class _LazyExecuteRequestEnvelope(BaseTheoriqModel):
+    """Structure of an execute request body, validated without its dialog items."""
+
+    configuration: Optional[Configuration] = None
+    dialog: _LazyDialogEnvelope
+
+
+class LazyExecuteRequestBody(ExecuteRequestBody):
+    """
+    Body of an execute request whose dialog items are only validated when accessed.
+    Agents only reading the last items of long dialogs skip the validation of the rest of the history.
+    """
+
+    dialog: LazyDialog
+
+    @classmethod
+    def from_raw(cls, value: Any, item_cache: Optional[DialogItemCache] = None) -> LazyExecuteRequestBody:
+        """
+        Build a lazy request body from its JSON representation.
+        Dialog items are validated through `item_cache` when given.
+
+        :raises pydantic.ValidationError: if the configuration or the structure of the dialog is not valid
+        """
+        envelope = _LazyExecuteRequestEnvelope.model_validate(value)
+        dialog = LazyDialog.from_raw(value["dialog"], item_cache)
+        return cls.model_construct(configuration=envelope.configuration, dialog=dialog)
+
+    def validate_all(self) -> ExecuteRequestBody:
+        """Validate the whole dialog and return the request as a regular `ExecuteRequestBody`."""
+        return ExecuteRequestBody(configuration=self.configuration, dialog=self.dialog.validate_all())
+
+    def model_dump(self, **kwargs) -> dict[str, Any]:
+        return self.validate_all().model_dump(**kwargs)
+
+    def model_dump_json(self, **kwargs) -> str:
+        return self.validate_all().model_dump_json(**kwargs)
+
+    def model_dump_json_bytes(self) -> bytes:
+        return self.validate_all().model_dump_json_bytes()
+
+
 class RequestItem(BaseTheoriqModel):
     id: UUID
     source: str
@@ -1,68 +1,167 @@
 from __future__ import annotations
 
+import asyncio
+import concurrent.futures
 import logging
 import threading
-import time
-from typing import Callable, Optional
+from typing import Optional, Set, Tuple
 
 from theoriq.biscuit import AgentAddress
 
 from .protocol.biscuit_provider import BiscuitProvider, BiscuitProviderFactory
 from .protocol.protocol_client import ProtocolClient
+from .subscription_manager import OverflowPolicy, SubscribeHandlerFn, SubscriberStopException, SubscriptionManager
 
 logger = logging.getLogger(__name__)
 
-
-# Type alias for a function that handles subscription messages
-# The function takes a message string as input and returns nothing
-SubscribeHandlerFn = Callable[[str], None]
-
-
-class SubscriberStopException(Exception):
-    pass
+__all__ = ["OverflowPolicy", "Subscriber", "SubscribeHandlerFn", "SubscriberStopException"]
 
 
 class Subscriber:
-    """Enables subscribing to agent notifications."""
+    """
+    Enables subscribing to agent notifications from synchronous code.
+
+    The subscriptions of a subscriber share one `SubscriptionManager`, run by an event loop in a daemon thread
+    started with the first subscription. Plain handlers run in the default executor of that loop.
+    Use a `SubscriptionManager` directly from asynchronous code.
+    """
 
     def __init__(self, biscuit_provider: BiscuitProvider, client: Optional[ProtocolClient] = None) -> None:
         self._client = client or ProtocolClient.from_env()
         self._biscuit_provider = biscuit_provider
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._manager: Optional[SubscriptionManager] = None
+        self._futures: Set[concurrent.futures.Future[None]] = set()
+
+    def subscribe(
+        self,
+        agent_address: AgentAddress,
+        handler: SubscribeHandlerFn,
+        *,
+        queue_size: int = 1000,
+        workers: int = 1,
+        overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+    ) -> concurrent.futures.Future[None]:
+        """
+        Subscribe to an agent's notifications on the event loop of the subscriber, without a thread of its own.
+
+        Args:
+            agent_address: The address of the agent to subscribe to
+            handler: The handler function to call when a message is received
+            queue_size: The maximum number of messages received and waiting for the handler
+            workers: The number of messages handled concurrently, they may be handled out of order with more than one
+            overflow_policy: What to do with messages received when the queue is full
+
+        Returns:
+            A future done once the subscription is stopped by its handler, or cancelled. Cancelling the future, or
+            closing the subscriber, cancels the subscription and closes its stream.
+        """
+
+        async def _subscribe(manager: SubscriptionManager) -> None:
+            subscription = manager.subscribe(
+                agent_address, handler, queue_size=queue_size, workers=workers, overflow_policy=overflow_policy
+            )
+            try:
+                await subscription.wait()
+            finally:
+                subscription.cancel()
+
+        with self._lock:
+            loop, manager = self._start()
+            future = asyncio.run_coroutine_threadsafe(_subscribe(manager), loop)
+            self._futures.add(future)
+        future.add_done_callback(self._forget)
+        return future
 
     def new_job(
-        self, agent_address: AgentAddress, handler: SubscribeHandlerFn, background: bool = False
+        self,
+        agent_address: AgentAddress,
+        handler: SubscribeHandlerFn,
+        background: bool = False,
+        *,
+        queue_size: int = 1000,
+        workers: int = 1,
+        overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
     ) -> threading.Thread:
         """
-        Subscribe to an agent's notifications.
+        Subscribe to an agent's notifications, in a thread waiting for the subscription to end.
+
+        Each job costs a thread, although its stream is read on the shared event loop of the subscriber: use
+        `subscribe` to subscribe to many agents without a thread per subscription.
 
         Args:
             agent_address: The address of the agent to subscribe to
             handler: The handler function to call when a message is received
             background: Whether to run the job in the background
+            queue_size: The maximum number of messages received and waiting for the handler
+            workers: The number of messages handled concurrently, they may be handled out of order with more than one
+            overflow_policy: What to do with messages received when the queue is full
 
         Returns:
-            A thread object that can be started to run the subscription job
+            A thread object that can be started to run the subscription job, until it is stopped by its handler or
+            the subscriber is closed
         """
 
         def _subscribe_job() -> None:
             try:
-                while True:
-                    try:
-                        biscuit = self._biscuit_provider.get_biscuit()
-                        for message in self._client.subscribe_to_agent_notifications(biscuit, agent_address.address):
-                            handler(message)
-                        logger.warning("Connection to server lost. Reconnecting...")
-                    except SubscriberStopException:
-                        logger.info("Received stop exception")
-                        return
-                    except Exception as e:
-                        logger.warning(f"Something went wrong: {e}. Retrying...")
-                    time.sleep(1)  # wait for 1 second before reconnecting
+                future = self.subscribe(
+                    agent_address, handler, queue_size=queue_size, workers=workers, overflow_policy=overflow_policy
+                )
+                try:
+                    future.result()
+                except concurrent.futures.CancelledError:
+                    pass
             finally:
                 logger.warning("End of subscription job")
 
         return threading.Thread(target=_subscribe_job, daemon=background)
 
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """
+        Cancels the subscriptions, closing their streams, and stops the event loop of the subscriber.
+        The jobs and the futures of the subscriptions end, even if the streams are not closed before the timeout.
+
+        :param timeout: Maximum time in seconds to wait for the streams to be closed, None to wait until they are.
+        """
+        with self._lock:
+            loop, manager, futures = self._loop, self._manager, list(self._futures)
+            self._loop, self._manager = None, None
+            self._futures.clear()
+        if loop is None or manager is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(manager.close(), loop).result(timeout)
+        except concurrent.futures.TimeoutError:
+            logger.warning(f"Subscription streams still open after {timeout} seconds")
+        finally:
+            for future in futures:
+                future.cancel()
+            loop.call_soon_threadsafe(loop.stop)
+
+    def _forget(self, future: concurrent.futures.Future[None]) -> None:
+        with self._lock:
+            self._futures.discard(future)
+
+    def _start(self) -> Tuple[asyncio.AbstractEventLoop, SubscriptionManager]:
+        """Returns the event loop running the subscription manager, started by the first subscription."""
+        if self._loop is None or self._manager is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=self._run_loop, args=(loop,), name="theoriq-subscriber", daemon=True).start()
+            self._loop = loop
+            self._manager = SubscriptionManager(self._biscuit_provider, self._client)
+        return self._loop, self._manager
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop) -> None:
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.run_until_complete(loop.shutdown_default_executor())
+            loop.close()
+
     @classmethod
     def from_api_key(cls, api_key: str) -> Subscriber:
         return Subscriber(biscuit_provider=BiscuitProviderFactory.from_api_key(api_key=api_key))
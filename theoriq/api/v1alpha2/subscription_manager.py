@@ -0,0 +1,594 @@
+"""Subscriptions to the notifications of many agents, multiplexed on one asyncio event loop."""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+import random
+import time
+from enum import Enum
+from typing import Any, AsyncContextManager, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
+
+import httpx
+
+from theoriq.biscuit import AgentAddress, TheoriqBiscuit
+from theoriq.utils.metrics import (
+    NOTIFICATION_DELIVERY_SECONDS,
+    NOTIFICATION_HANDLER_SECONDS,
+    NOTIFICATION_QUEUE_SECONDS,
+    NOTIFICATIONS_RECEIVED,
+    NOTIFICATIONS_RECEIVED_BYTES,
+    SUBSCRIPTION_RECONNECTS,
+    MetricsSink,
+    agent_labels,
+    get_default_metrics_sink,
+    notification_timestamp,
+)
+
+from .protocol.biscuit_provider import BiscuitProvider
+from .protocol.protocol_client import ProtocolClient
+from .protocol.sse import SSEEvent
+
+logger = logging.getLogger(__name__)
+
+
+# Type alias for a function that handles subscription messages
+# The function takes a message string as input and returns nothing
+SubscribeHandlerFn = Callable[[str], None]
+
+# Type alias for a coroutine function that handles subscription messages
+AsyncSubscribeHandlerFn = Callable[[str], Awaitable[None]]
+
+# Type alias for a function opening the notification stream of an agent,
+# given a biscuit, the agent id and the id of the last event received, if any
+OpenNotificationStreamFn = Callable[[TheoriqBiscuit, str, Optional[str]], AsyncContextManager[AsyncIterator[SSEEvent]]]
+
+
+class SubscriberStopException(Exception):
+    pass
+
+
+class OverflowPolicy(str, Enum):
+    """What to do with a message received when the queue of its subscription is full."""
+
+    BLOCK = "block"  # stop reading the stream until a handler takes a message from the queue
+    DROP_OLDEST = "drop_oldest"  # drop the oldest queued message to make room for the new one
+    DROP_NEWEST = "drop_newest"  # drop the new message
+
+
+class ReconnectBackoff:
+    """
+    Exponential backoff with full jitter between the reconnections of a stream: the n-th consecutive delay is drawn
+    uniformly between 0 and `min(max_delay, base_delay * 2**n)`, so that subscribers losing their streams at the
+    same time do not reconnect in lockstep.
+    """
+
+    def __init__(self, initial_delay: float = 1.0, max_delay: float = 60.0) -> None:
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.base_delay = initial_delay
+        self.attempts = 0
+
+    def next_delay(self) -> float:
+        """Returns the delay before the next reconnection, and increases the following ones."""
+        ceiling = min(self.max_delay, self.base_delay * 2**self.attempts)
+        self.attempts += 1
+        return random.uniform(0, ceiling)
+
+    def set_retry_hint(self, retry_ms: int) -> None:
+        """Uses the reconnection time sent by the server in a `retry` field as the base delay."""
+        self.base_delay = min(self.max_delay, retry_ms / 1000)
+
+    def reset(self) -> None:
+        """Restarts the backoff from the base delay, once a stream is healthy."""
+        self.attempts = 0
+
+
+class SubscriptionStats:
+    """Health of the stream of a subscription."""
+
+    def __init__(self) -> None:
+        self.connected = False
+        self.connects = 0
+        self.disconnects = 0
+        self.resumes = 0
+        self.errors = 0
+        self.messages = 0
+        self.handled = 0
+        self.dropped = 0
+        self.handler_errors = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.last_lag: Optional[float] = None
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.last_connected_at: Optional[float] = None
+        self.last_disconnected_at: Optional[float] = None
+        self.last_message_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_reconnect_delay: Optional[float] = None
+        self.last_gap: Optional[float] = None
+        self.total_gap = 0.0
+
+    @property
+    def reconnects(self) -> int:
+        return max(0, self.connects - 1)
+
+    @property
+    def average_lag(self) -> Optional[float]:
+        """Average time spent by handled messages in the queue, in seconds."""
+        return self.total_lag / self.handled if self.handled else None
+
+    def on_connected(self, resumed: bool = False) -> None:
+        now = time.time()
+        if self.last_disconnected_at is not None:
+            # Time without a stream, during which notifications may have been missed
+            self.last_gap = now - self.last_disconnected_at
+            self.total_gap += self.last_gap
+            self.last_disconnected_at = None
+        self.connected = True
+        self.connects += 1
+        self.resumes += resumed
+        self.last_connected_at = now
+
+    def on_message(self) -> None:
+        self.messages += 1
+        self.last_message_at = time.time()
+
+    def on_queued(self, queue_depth: int) -> None:
+        self.queue_depth = queue_depth
+        self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+
+    def on_dequeued(self, queue_depth: int, lag: float) -> None:
+        self.queue_depth = queue_depth
+        self.handled += 1
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.total_lag += lag
+
+    def on_disconnected(self, error: Optional[BaseException] = None) -> None:
+        if self.connected:
+            self.connected = False
+            self.disconnects += 1
+            self.last_disconnected_at = time.time()
+        if error is not None:
+            self.errors += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected,
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "disconnects": self.disconnects,
+            "resumes": self.resumes,
+            "errors": self.errors,
+            "messages": self.messages,
+            "handled": self.handled,
+            "dropped": self.dropped,
+            "handlerErrors": self.handler_errors,
+            "queueDepth": self.queue_depth,
+            "maxQueueDepth": self.max_queue_depth,
+            "lastLag": self.last_lag,
+            "averageLag": self.average_lag,
+            "maxLag": self.max_lag,
+            "lastConnectedAt": self.last_connected_at,
+            "lastMessageAt": self.last_message_at,
+            "lastError": self.last_error,
+            "lastReconnectDelay": self.last_reconnect_delay,
+            "lastGap": self.last_gap,
+            "totalGap": self.total_gap,
+        }
+
+
+class Subscription:
+    """
+    Subscription to the notifications of an agent, run by a `SubscriptionManager`.
+
+    Messages are read from the stream into a bounded queue, and taken from it by the handler workers, so that a slow
+    handler does not stop the stream from being read. With more than one worker, messages may be handled out of order.
+    """
+
+    def __init__(
+        self,
+        agent_address: AgentAddress,
+        handler: Union[SubscribeHandlerFn, AsyncSubscribeHandlerFn],
+        queue_size: int = 1000,
+        workers: int = 1,
+        overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+    ):
+        if queue_size < 1:
+            raise ValueError("queue_size must be positive")
+        if workers < 1:
+            raise ValueError("workers must be positive")
+
+        self.agent_address = agent_address
+        self.handler = handler
+        self.queue_size = queue_size
+        self.workers = workers
+        self.overflow_policy = OverflowPolicy(overflow_policy)
+        self.stats = SubscriptionStats()
+        self.last_event_id: Optional[str] = None
+        self._queue: Optional[asyncio.Queue[Tuple[str, float]]] = None
+        self._task: Optional[asyncio.Task[None]] = None
+
+    @property
+    def is_active(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def cancel(self) -> None:
+        """Stops the subscription, closing its stream and dropping the messages not handled yet."""
+        if self._task is not None:
+            self._task.cancel()
+
+    async def wait(self) -> None:
+        """Waits for the end of the subscription, once cancelled or stopped by its handler."""
+        if self._task is None:
+            return
+        try:
+            await asyncio.shield(self._task)
+        except asyncio.CancelledError:
+            if not self._task.cancelled():
+                raise
+
+    async def _receive(self, message: str) -> None:
+        self.stats.on_message()
+        queue = self._queue
+        assert queue is not None
+        item = (message, time.monotonic())
+        if self.overflow_policy is OverflowPolicy.BLOCK:
+            await queue.put(item)
+        elif not queue.full():
+            queue.put_nowait(item)
+        elif self.overflow_policy is OverflowPolicy.DROP_OLDEST:
+            queue.get_nowait()
+            queue.task_done()
+            queue.put_nowait(item)
+            self.stats.dropped += 1
+        else:
+            self.stats.dropped += 1
+        self.stats.on_queued(queue.qsize())
+
+
+class SubscriptionManager:
+    """
+    Runs the notification streams of many agents on one asyncio event loop, each with its own handler.
+
+    Subscriptions are added with `subscribe` and removed with `unsubscribe` or `Subscription.cancel` while the
+    manager runs. Each stream reconnects when lost, with a biscuit from the shared `BiscuitProvider`, renewed by one
+    stream at a time. Reconnections follow a `ReconnectBackoff`, honoring the `retry` field of the server, and resume
+    the stream after the last event received with the `Last-Event-ID` header.
+
+    Messages are queued between the stream and the handler workers of each subscription, up to a queue size after
+    which the `OverflowPolicy` of the subscription applies. Coroutine handlers are awaited on the event loop, plain
+    handlers are run in the default executor of the loop. A handler raising `SubscriberStopException` ends its
+    subscription, other handler errors are logged and counted in the stats of the subscription.
+
+    Usage:
+        async with SubscriptionManager(biscuit_provider) as manager:
+            subscription = manager.subscribe(agent_address, handler)
+            ...
+    """
+
+    def __init__(
+        self,
+        biscuit_provider: BiscuitProvider,
+        client: Optional[ProtocolClient] = None,
+        *,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 60.0,
+        max_connections: Optional[int] = None,
+        queue_size: int = 1000,
+        handler_workers: int = 1,
+        overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+        open_stream: Optional[OpenNotificationStreamFn] = None,
+        metrics: Optional[MetricsSink] = None,
+        timestamp_fn: Callable[[str], Optional[float]] = notification_timestamp,
+    ) -> None:
+        """
+        :param reconnect_delay: Base delay before reconnecting a lost stream, in seconds, doubled on each failure.
+        :param max_reconnect_delay: Maximum delay before reconnecting a lost stream, in seconds.
+        :param max_connections: Maximum number of concurrent connections, unlimited by default.
+        :param queue_size: Default maximum number of messages waiting for the handler of a subscription.
+        :param handler_workers: Default number of messages of a subscription handled concurrently.
+        :param overflow_policy: Default policy applied to messages received when the queue of a subscription is full.
+        :param open_stream: Function opening the notification stream of an agent.
+            Defaults to `ProtocolClient.open_agent_notification_stream`.
+        :param metrics: Sink of the metrics of the subscriptions, the default one if not set.
+        :param timestamp_fn: Function returning the time a message was published, as a POSIX timestamp, if known,
+            to measure the delay between the publication and the reception of messages.
+        """
+        self._client = client or ProtocolClient.from_env()
+        self._biscuit_provider = biscuit_provider
+        self._reconnect_delay = reconnect_delay
+        self._max_reconnect_delay = max_reconnect_delay
+        self._max_connections = max_connections
+        self._queue_size = queue_size
+        self._handler_workers = handler_workers
+        self._overflow_policy = overflow_policy
+        self._open_stream = open_stream or self._open_protocol_stream
+        self._metrics = metrics or get_default_metrics_sink()
+        self._timestamp_fn = timestamp_fn
+        self._subscriptions: Set[Subscription] = set()
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._biscuit_lock: Optional[asyncio.Lock] = None
+
+    async def __aenter__(self) -> SubscriptionManager:
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    @property
+    def subscriptions(self) -> List[Subscription]:
+        return list(self._subscriptions)
+
+    def subscribe(
+        self,
+        agent_address: AgentAddress,
+        handler: Union[SubscribeHandlerFn, AsyncSubscribeHandlerFn],
+        *,
+        queue_size: Optional[int] = None,
+        workers: Optional[int] = None,
+        overflow_policy: Optional[OverflowPolicy] = None,
+    ) -> Subscription:
+        """
+        Subscribes to the notifications of an agent. Must be called from the event loop running the manager.
+        The queue size, number of workers and overflow policy default to the ones of the manager.
+
+        :return: the subscription, running until cancelled
+        """
+        subscription = self._new_subscription(agent_address, handler, queue_size, workers, overflow_policy)
+        task = self._start(subscription, lambda: self._read(subscription))
+        self._subscriptions.add(subscription)
+        task.add_done_callback(lambda _: self._subscriptions.discard(subscription))
+        return subscription
+
+    async def unsubscribe(self, subscription: Subscription) -> None:
+        """Stops a subscription and waits for its stream to be closed."""
+        subscription.cancel()
+        await subscription.wait()
+
+    async def close(self) -> None:
+        """Stops all the subscriptions and closes their connections."""
+        subscriptions = self.subscriptions
+        for subscription in subscriptions:
+            subscription.cancel()
+        for subscription in subscriptions:
+            await subscription.wait()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    def _new_subscription(
+        self,
+        agent_address: AgentAddress,
+        handler: Union[SubscribeHandlerFn, AsyncSubscribeHandlerFn],
+        queue_size: Optional[int],
+        workers: Optional[int],
+        overflow_policy: Optional[OverflowPolicy],
+    ) -> Subscription:
+        return Subscription(
+            agent_address,
+            handler,
+            queue_size=self._queue_size if queue_size is None else queue_size,
+            workers=self._handler_workers if workers is None else workers,
+            overflow_policy=self._overflow_policy if overflow_policy is None else overflow_policy,
+        )
+
+    def _start(self, subscription: Subscription, source: Callable[[], Awaitable[Any]]) -> asyncio.Task[None]:
+        """Runs the handler workers of a subscription, fed with messages by the given source until it returns."""
+        # Created before the task runs, so that the subscription receives messages as soon as it is registered
+        subscription._queue = asyncio.Queue(subscription.queue_size)
+        task = asyncio.get_running_loop().create_task(self._run(subscription, source))
+        subscription._task = task
+        return task
+
+    async def _run(self, subscription: Subscription, source: Callable[[], Awaitable[Any]]) -> None:
+        queue = subscription._queue
+        assert queue is not None
+        workers = [asyncio.create_task(self._work(subscription, queue)) for _ in range(subscription.workers)]
+        try:
+            await source()
+            # The source was stopped: handle the messages already received
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            subscription.stats.on_disconnected()
+            logger.debug(f"Subscription to {subscription.agent_address} ended")
+
+    async def _read(self, subscription: Subscription) -> None:
+        stats = subscription.stats
+        agent_id = subscription.agent_address.address
+        labels = agent_labels(subscription.agent_address)
+        backoff = ReconnectBackoff(self._reconnect_delay, self._max_reconnect_delay)
+        while True:
+            try:
+                biscuit = await self._get_biscuit()
+                last_event_id = subscription.last_event_id
+                async with self._open_stream(biscuit, agent_id, last_event_id) as events:
+                    stats.on_connected(resumed=last_event_id is not None)
+                    if stats.connects > 1:
+                        self._metrics.increment(SUBSCRIPTION_RECONNECTS, labels=labels)
+                    async for event in events:
+                        # The stream is healthy once it delivers events
+                        backoff.reset()
+                        if event.retry is not None:
+                            backoff.set_retry_hint(event.retry)
+                        if event.id is not None:
+                            subscription.last_event_id = event.id
+                        if event.data.strip() != ":":
+                            self._record_reception(event.data, labels)
+                            await subscription._receive(event.data)
+                stats.on_disconnected()
+                logger.warning("Connection to server lost. Reconnecting...")
+            except SubscriberStopException:
+                logger.info("Received stop exception")
+                return
+            except Exception as e:
+                stats.on_disconnected(e)
+                logger.warning(f"Something went wrong: {e}. Retrying...")
+            stats.last_reconnect_delay = backoff.next_delay()
+            await asyncio.sleep(stats.last_reconnect_delay)
+
+    def _record_reception(self, message: str, labels: Dict[str, str]) -> None:
+        self._metrics.increment(NOTIFICATIONS_RECEIVED, labels=labels)
+        self._metrics.increment(NOTIFICATIONS_RECEIVED_BYTES, len(message.encode("utf-8")), labels=labels)
+        published_at = self._timestamp_fn(message)
+        if published_at is not None:
+            self._metrics.observe(NOTIFICATION_DELIVERY_SECONDS, max(0.0, time.time() - published_at), labels=labels)
+
+    async def _work(self, subscription: Subscription, queue: asyncio.Queue[Tuple[str, float]]) -> None:
+        loop = asyncio.get_running_loop()
+        labels = agent_labels(subscription.agent_address)
+        while True:
+            message, queued_at = await queue.get()
+            started_at = time.monotonic()
+            subscription.stats.on_dequeued(queue.qsize(), started_at - queued_at)
+            self._metrics.observe(NOTIFICATION_QUEUE_SECONDS, started_at - queued_at, labels=labels)
+            try:
+                if inspect.iscoroutinefunction(subscription.handler):
+                    await subscription.handler(message)
+                else:
+                    result = await loop.run_in_executor(None, subscription.handler, message)
+                    if inspect.isawaitable(result):
+                        await result
+            except SubscriberStopException:
+                logger.info("Received stop exception")
+                subscription.cancel()
+                return
+            except Exception as e:
+                subscription.stats.handler_errors += 1
+                logger.exception(f"Handler of the subscription to {subscription.agent_address} failed: {e}")
+            finally:
+                self._metrics.observe(NOTIFICATION_HANDLER_SECONDS, time.monotonic() - started_at, labels=labels)
+                queue.task_done()
+
+    async def _get_biscuit(self) -> TheoriqBiscuit:
+        # Biscuits are renewed with blocking requests: one stream at a time, outside the event loop
+        if self._biscuit_lock is None:
+            self._biscuit_lock = asyncio.Lock()
+        async with self._biscuit_lock:
+            return await asyncio.to_thread(self._biscuit_provider.get_biscuit)
+
+    def _open_protocol_stream(
+        self, biscuit: TheoriqBiscuit, agent_id: str, last_event_id: Optional[str]
+    ) -> AsyncContextManager[AsyncIterator[SSEEvent]]:
+        if self._http_client is None:
+            self._http_client = self._client.new_async_http_client(self._max_connections)
+        return self._client.open_agent_notification_stream(self._http_client, biscuit, agent_id, last_event_id)
+
+
+class NotificationBroker:
+    """
+    Shares the notification streams of agents between the local subscribers of a process.
+
+    The broker keeps one upstream subscription of its `SubscriptionManager` per agent, opened with the first local
+    subscriber of the agent and closed when the last one goes away, and fans its messages out to the local
+    subscribers. Each local subscription has its own queue, handler workers, overflow policy and stats, while the
+    health of the stream is found in the stats of the upstream subscription. A local subscriber blocking on a full
+    queue delays the delivery of the messages of the agent to the other local subscribers, while a failed delivery
+    to a local subscriber is logged and does not stop the delivery to the others.
+
+    A local handler raising `SubscriberStopException` ends its own subscription only, and an upstream subscription
+    stopped by its stream ends all the local subscriptions of the agent.
+
+    Usage:
+        async with SubscriptionManager(biscuit_provider) as manager:
+            broker = NotificationBroker(manager)
+            subscription = broker.subscribe(agent_address, handler)
+            ...
+    """
+
+    def __init__(self, manager: SubscriptionManager) -> None:
+        self._manager = manager
+        self._upstreams: Dict[AgentAddress, Subscription] = {}
+        self._subscribers: Dict[AgentAddress, Set[Subscription]] = {}
+
+    async def __aenter__(self) -> NotificationBroker:
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    def upstream(self, agent_address: AgentAddress) -> Optional[Subscription]:
+        """Returns the upstream subscription to the notifications of an agent, if it has local subscribers."""
+        return self._upstreams.get(agent_address)
+
+    def subscribers(self, agent_address: AgentAddress) -> List[Subscription]:
+        """Returns the local subscriptions to the notifications of an agent."""
+        return list(self._subscribers.get(agent_address, ()))
+
+    def subscribe(
+        self,
+        agent_address: AgentAddress,
+        handler: Union[SubscribeHandlerFn, AsyncSubscribeHandlerFn],
+        *,
+        queue_size: Optional[int] = None,
+        workers: Optional[int] = None,
+        overflow_policy: Optional[OverflowPolicy] = None,
+    ) -> Subscription:
+        """
+        Subscribes locally to the notifications of an agent, opening its upstream subscription if needed.
+        Must be called from the event loop running the manager.
+
+        :return: the local subscription, running until cancelled
+        """
+        subscription = self._manager._new_subscription(agent_address, handler, queue_size, workers, overflow_policy)
+        if agent_address not in self._upstreams:
+            upstream = self._manager.subscribe(agent_address, self._fan_out_handler(agent_address), workers=1)
+            assert upstream._task is not None
+            upstream._task.add_done_callback(lambda _: self._on_upstream_done(upstream))
+            self._upstreams[agent_address] = upstream
+
+        # Local subscriptions are fed by the upstream one, and run until cancelled
+        task = self._manager._start(subscription, lambda: asyncio.Event().wait())
+        task.add_done_callback(lambda _: self._release(subscription))
+        self._subscribers.setdefault(agent_address, set()).add(subscription)
+        return subscription
+
+    async def unsubscribe(self, subscription: Subscription) -> None:
+        """Stops a local subscription, and waits for the upstream subscription to be closed if it was the last one."""
+        upstream = self._upstreams.get(subscription.agent_address)
+        subscription.cancel()
+        await subscription.wait()
+        self._release(subscription)
+        if upstream is not None and self._upstreams.get(subscription.agent_address) is not upstream:
+            await upstream.wait()
+
+    async def close(self) -> None:
+        """Stops all the local subscriptions, closing their upstream subscriptions."""
+        for subscribers in list(self._subscribers.values()):
+            for subscription in list(subscribers):
+                await self.unsubscribe(subscription)
+
+    def _fan_out_handler(self, agent_address: AgentAddress) -> AsyncSubscribeHandlerFn:
+        async def _fan_out(message: str) -> None:
+            for subscription in list(self._subscribers.get(agent_address, ())):
+                if subscription.is_active:
+                    try:
+                        await subscription._receive(message)
+                    except Exception as e:
+                        logger.exception(f"Failed to deliver a message to a subscriber of {agent_address}: {e}")
+
+        return _fan_out
+
+    def _release(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.agent_address)
+        if subscribers is None or subscription not in subscribers:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.agent_address]
+            upstream = self._upstreams.pop(subscription.agent_address, None)
+            if upstream is not None:
+                upstream.cancel()
+
+    def _on_upstream_done(self, upstream: Subscription) -> None:
+        if self._upstreams.get(upstream.agent_address) is upstream:
+            del self._upstreams[upstream.agent_address]
+            for subscription in self._subscribers.get(upstream.agent_address, ()):
+                subscription.cancel()
@@ -13,7 +13,7 @@ from .facts import (
     TheoriqRequest,
     TheoriqResponse,
 )
-from .payload_hash import PayloadHash
+from .payload_hash import IncrementalPayloadHash, PayloadHash
 from .request_biscuit import RequestBiscuit, RequestFacts
 from .response_biscuit import ResponseBiscuit, ResponseFacts
 from .theoriq_biscuit import TheoriqBiscuit
@@ -5,32 +5,94 @@ from __future__ import annotations
 import hashlib
 import os
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple, Type
 
 from biscuit_auth import Authorizer, Biscuit, BiscuitBuilder, Check, Policy, PublicKey, Rule  # pylint: disable=E0611
 
-from .utils import hash_public_key, verify_address
+from .utils import hash_public_key, parse_address
+
+_NULL_BYTES = bytes(32)
+
+# Maximum number of interned addresses
+_MAX_INTERNED = 4096
 
 
 class AgentAddress:
     """
     Address of an agent registered on the `theoriq` protocol
     Agent's address must be a 32 bytes hex encoded string
+
+    Addresses are immutable and compared by their 32 bytes. Addresses built from the same string are interned,
+    so that the addresses received with every request are only parsed once.
+
+    An address equals its canonical string, `0x` followed by its lowercase hex digits, and has the same hash, so that
+    addresses and their canonical strings are interchangeable as keys. Other strings are not equal to the address.
     """
 
-    def __init__(self, address: str) -> None:
-        self.address = verify_address(address)
+    __slots__ = ("_address", "_bytes", "_str", "_canonical", "_hash")
+
+    # Interned addresses, by the string they were built from, cleared once full
+    _interned: Dict[str, AgentAddress] = {}
+    _null: Optional[AgentAddress] = None
+
+    _address: str
+    _bytes: bytes
+    _str: str
+    _canonical: str
+    _hash: int
+
+    def __new__(cls, address: str) -> AgentAddress:
+        interned = cls._interned.get(address)
+        if interned is not None and type(interned) is cls:
+            return interned
+
+        result = super().__new__(cls)
+        result._address, result._bytes = parse_address(address)
+        result._str = f"0x{result._address}"
+        result._canonical = f"0x{result._bytes.hex()}"
+        result._hash = hash(result._canonical)
+        if len(cls._interned) >= _MAX_INTERNED:
+            cls._interned.clear()
+        cls._interned[address] = result
+        return result
+
+    @property
+    def address(self) -> str:
+        """The address as given, without its `0x` prefix"""
+        return self._address
+
+    def to_bytes(self) -> bytes:
+        """Returns the 32 bytes of the address"""
+        return self._bytes
 
     def __str__(self) -> str:
-        return self.address if self.address.startswith("0x") else f"0x{self.address}"
+        return self._str
+
+    def __repr__(self) -> str:
+        return f"AgentAddress({self._str!r})"
 
     def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
         if isinstance(other, AgentAddress):
-            return self.address.removeprefix("0x") == other.address.removeprefix("0x")
+            return self._bytes == other._bytes
         if isinstance(other, str):
-            return self.address.removeprefix("0x") == other.removeprefix("0x")
+            # Only the canonical string is equal, other spellings of the address would not have the same hash
+            return other == self._canonical
         return False
 
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __reduce__(self) -> Tuple[Type[AgentAddress], Tuple[str]]:
+        return type(self), (self._address,)
+
+    def __copy__(self) -> AgentAddress:
+        return self
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> AgentAddress:
+        return self
+
     def new_authority_builder(self, expires_at: Optional[datetime] = None) -> BiscuitBuilder:
         """Creates a new authority block builder."""
         expires_at = expires_at or datetime.now(tz=timezone.utc) + timedelta(days=1)
@@ -112,11 +174,12 @@ class AgentAddress:
 
     @classmethod
     def null(cls) -> AgentAddress:
-        return cls.from_int(0)
+        if cls is not AgentAddress:
+            return cls.from_int(0)
+        if AgentAddress._null is None:
+            AgentAddress._null = cls.from_int(0)
+        return AgentAddress._null
 
     @property
     def is_null(self) -> bool:
-        return self == AgentAddress.null()
-
-    def __hash__(self) -> int:
-        return hash(self.address)
+        return self._bytes == _NULL_BYTES
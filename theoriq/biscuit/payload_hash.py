@@ -63,3 +63,22 @@ class PayloadHash:
             raise ValueError(f"Hash value '{tmp}' is not a hex string")
         result._hash = tmp
         return result
+
+
+class IncrementalPayloadHash:
+    """
+    Computes the hash of a payload received or sent in chunks.
+    The resulting hash is the same as the hash of the concatenation of all the chunks.
+    """
+
+    def __init__(self) -> None:
+        self._hasher = hashlib.sha256()
+
+    def update(self, chunk: bytes) -> None:
+        self._hasher.update(chunk)
+
+    def payload_hash(self) -> PayloadHash:
+        """
+        Return the hash of the chunks received so far.
+        """
+        return PayloadHash.from_hash(self._hasher.hexdigest())
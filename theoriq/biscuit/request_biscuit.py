@@ -10,6 +10,7 @@ from biscuit_auth.biscuit_auth import PrivateKey, PublicKey  # type: ignore
 
 from .agent_address import AgentAddress
 from .facts import ExecuteRequestFacts, TheoriqRequest, TheoriqResponse
+from .payload_hash import PayloadHash
 from .response_biscuit import ResponseBiscuit, ResponseFacts
 from .theoriq_biscuit import TheoriqBiscuit
 from .utils import from_base64_token
@@ -73,7 +74,10 @@ class RequestBiscuit:
         self.request_facts = RequestFacts.from_biscuit(biscuit)
 
     def attenuate_for_response(self, body: bytes, agent_private_key: PrivateKey) -> ResponseBiscuit:
-        theoriq_response = TheoriqResponse.from_body(body, to_addr=self.request_facts.request.from_addr)
+        return self.attenuate_for_response_hash(PayloadHash(body), agent_private_key)
+
+    def attenuate_for_response_hash(self, body_hash: PayloadHash, agent_private_key: PrivateKey) -> ResponseBiscuit:
+        theoriq_response = TheoriqResponse(body_hash=body_hash, to_addr=self.request_facts.request.from_addr)
         response_facts = ResponseFacts(self.request_facts.req_id, theoriq_response)
         agent_kp = KeyPair.from_private_key(agent_private_key)
         attenuated_biscuit = self.biscuit.append_third_party_block(agent_kp, response_facts.to_block_builder())  # type: ignore
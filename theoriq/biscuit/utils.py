@@ -27,15 +27,23 @@ def verify_address(address: str) -> str:
     Verify the address
     :raise TypeError: if the address is not 32 bytes long or does not only contain hex digits
     """
+    return parse_address(address)[0]
+
+
+def parse_address(address: str) -> Tuple[str, bytes]:
+    """
+    Parse the address
+    :return: the address without its `0x` prefix, and its 32 bytes
+    :raise TypeError: if the address is not 32 bytes long or does not only contain hex digits
+    """
     add = address.removeprefix("0x").strip()
     try:
-        length = len(bytes.fromhex(add))
-        if length != 32:
-            raise TypeError(f"address must be 32 bytes long: {address}")
+        value = bytes.fromhex(add)
     except ValueError as e:
         raise TypeError(f"address must only contain hex digits: {address}") from e
-    else:
-        return add
+    if len(value) != 32:
+        raise TypeError(f"address must be 32 bytes long: {address}")
+    return add, value
 
 
 def get_user_address_from_biscuit(biscuit: Biscuit) -> str:
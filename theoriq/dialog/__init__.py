@@ -1,6 +1,10 @@
 from .command_items import UnknownCommandData
 from .dialog import *
 from .block import *
+from .item_cache import DialogItemCache
+from .lazy_dialog import LazyDialog, LazyDialogItems
+from .render import DialogRenderer, approximate_token_count
+from .store import DialogRecord, DialogStore
 
 # Import all items from their respective logical files
 from .code_items import CodeData, CodeBlock
@@ -30,6 +34,13 @@ __all__ = [
     # Dialog items
     "Dialog",
     "DialogItem",
+    "DialogItemCache",
+    "LazyDialog",
+    "LazyDialogItems",
+    "DialogRenderer",
+    "DialogRecord",
+    "DialogStore",
+    "approximate_token_count",
     # Error items
     "ErrorData",
     "ErrorBlock",
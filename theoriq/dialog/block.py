@@ -1,13 +1,37 @@
 from __future__ import annotations
 
 import json
-from typing import Annotated, Any, Callable, Generic, Optional, Sequence, Type, TypeVar, Union, get_args
+import threading
+from typing import Annotated, Any, Callable, Generic, List, Optional, Sequence, Type, TypeVar, Union, get_args
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Discriminator, Field, GetCoreSchemaHandler, GetJsonSchemaHandler, Tag, TypeAdapter
 from pydantic.alias_generators import to_camel
 from pydantic.fields import FieldInfo
+from pydantic.json_schema import JsonSchemaValue
+from pydantic_core import CoreSchema, core_schema
 from typing_extensions import TypeGuard
 
+from ..utils.encoding import BodyEncoding
+
+# Key marking a model as read-only in its `__dict__`, outside the fields of the model
+_FROZEN_KEY = "__theoriq_frozen__"
+
+
+class _SerializeByRuntimeType:
+    """
+    Annotation serializing a value by its runtime type, like the fields typed with a bound `TypeVar`.
+
+    Pydantic serializes those fields, e.g. the data of a block, through a python function calling back into
+    pydantic-core for every value. Chaining an `any` schema does the same from within pydantic-core.
+    """
+
+    def __get_pydantic_core_schema__(self, source_type: Any, handler: GetCoreSchemaHandler) -> CoreSchema:
+        # Chained schemas serialize values with their last step
+        return core_schema.chain_schema([handler(source_type), core_schema.any_schema()])
+
+    def __get_pydantic_json_schema__(self, schema: CoreSchema, handler: GetJsonSchemaHandler) -> JsonSchemaValue:
+        return handler(schema["steps"][0])  # type: ignore[typeddict-item]
+
 
 class BaseTheoriqModel(BaseModel):
 
@@ -15,6 +39,22 @@ class BaseTheoriqModel(BaseModel):
         populate_by_name = True
         alias_generator = to_camel
 
+    def __setattr__(self, name: str, value: Any) -> None:
+        if _FROZEN_KEY in self.__dict__:
+            raise TypeError(f"{type(self).__name__} is read-only, modify a copy made with model_copy(deep=True)")
+        super().__setattr__(name, value)
+
+    def __copy__(self):
+        # Copies of a read-only model can be modified
+        result = super().__copy__()
+        result.__dict__.pop(_FROZEN_KEY, None)
+        return result
+
+    def __deepcopy__(self, memo: Optional[dict[int, Any]] = None):
+        result = super().__deepcopy__(memo)
+        result.__dict__.pop(_FROZEN_KEY, None)
+        return result
+
     @staticmethod
     def _set_dump_defaults(kwargs):
         """Set default serialization options"""
@@ -26,12 +66,36 @@ class BaseTheoriqModel(BaseModel):
 
     def model_dump_json(self, **kwargs) -> str:
         """Override to ensure proper JSON serialization"""
+        if not kwargs:
+            return self.model_dump_json_bytes().decode("utf-8")
         return super().model_dump_json(**BaseTheoriqModel._set_dump_defaults(kwargs))
 
     def model_dump(self, **kwargs) -> dict[str, Any]:
         """Override to ensure proper JSON serialization"""
+        if not kwargs:
+            return self.__pydantic_serializer__.to_python(
+                self, by_alias=True, exclude_none=True, exclude_defaults=True, exclude_unset=True
+            )
         return super().model_dump(**BaseTheoriqModel._set_dump_defaults(kwargs))
 
+    def model_dump_json_bytes(self) -> bytes:
+        """
+        Returns the JSON of the model with the default serialization options, as UTF-8 bytes.
+        Same output as `model_dump_json()`, without the option handling of pydantic.
+        """
+        return self.__pydantic_serializer__.to_json(
+            self, by_alias=True, exclude_none=True, exclude_defaults=True, exclude_unset=True
+        )
+
+    def model_dump_bytes(self, encoding: Optional[BodyEncoding] = None) -> bytes:
+        """
+        Returns the model encoded with the given body encoding, with the default serialization options.
+        Defaults to JSON, which is the output of `model_dump_json_bytes()`.
+        """
+        if encoding is None or encoding.is_json:
+            return self.model_dump_json_bytes()
+        return encoding.encode(self.model_dump(mode="json"))
+
 
 class BaseData(BaseTheoriqModel):
     """
@@ -67,7 +131,7 @@ class BaseData(BaseTheoriqModel):
         """
         Returns a string representation of the BaseData instance.
         """
-        return self.model_dump_json(by_alias=True, exclude_none=True)
+        return self.model_dump_json_bytes().decode("utf-8")
 
 
 T_Data = TypeVar("T_Data", bound=Union[BaseData, dict[str, Any]])
@@ -76,34 +140,53 @@ T_Type = TypeVar("T_Type", bound=str)
 _registry: dict[str, Type[BlockBase]] = dict()
 _registryPrefix: dict[str, Type[BlockBase]] = dict()
 
+# Block types resolved from a type name, reset on registration
+_resolved: dict[str, Optional[Type[BlockBase]]] = dict()
+_RESOLVED_MAX_SIZE = 1024
+
+# Adapter compiled from the registry, replaced on registration. Registrations and compilations hold the lock.
+_compiled: Optional[_CompiledBlocks] = None
+_registry_lock = threading.Lock()
+
 
 class BlockBase(BaseTheoriqModel, Generic[T_Data, T_Type]):
     ref: Annotated[Optional[str], Field(default=None)] = None
     key: Annotated[Optional[str], Field(default=None)] = None
-    block_type: Annotated[T_Type, Field(alias="type")]
-    data: T_Data
+    block_type: Annotated[T_Type, Field(alias="type"), _SerializeByRuntimeType()]
+    data: Annotated[T_Data, _SerializeByRuntimeType()]
 
     class Config:
         populate_by_name = True
 
     @staticmethod
     def register(block_data: Type[BlockBase[T_Data, T_Type]]) -> None:
+        global _compiled
         values = get_args(block_data.model_fields["block_type"].annotation)
-        for item in values:
-            if isinstance(item, str):
-                _registry[item] = block_data
-            if isinstance(item, FieldInfo):
-                pattern = item.metadata[0].pattern
-                prefix = pattern.split("(")[0]
-                _registry[prefix] = block_data
-                _registryPrefix[prefix] = block_data
+        with _registry_lock:
+            for item in values:
+                if isinstance(item, str):
+                    _registry[item] = block_data
+                if isinstance(item, FieldInfo):
+                    pattern = item.metadata[0].pattern
+                    prefix = pattern.split("(")[0]
+                    _registry[prefix] = block_data
+                    _registryPrefix[prefix] = block_data
+            _resolved.clear()
+            # Validations in progress keep using the adapter they started with
+            _compiled = None
 
     @staticmethod
     def get_block_type(block_type: str) -> Optional[Type[BlockBase]]:
         result = _registry.get(block_type)
         if result is not None:
             return result
-        return _registryPrefix.get(block_type.split(":")[0])
+        try:
+            return _resolved[block_type]
+        except KeyError:
+            result = _registryPrefix.get(block_type.partition(":")[0])
+            if len(_resolved) < _RESOLVED_MAX_SIZE:
+                _resolved[block_type] = result
+            return result
 
     @classmethod
     def is_instance(cls, block: BlockBase[T_Data, T_Type]) -> TypeGuard[BlockBase[T_Data, T_Type]]:
@@ -123,6 +206,21 @@ class BlockBase(BaseTheoriqModel, Generic[T_Data, T_Type]):
         parts = block_type.split(":", 1)
         return parts[1] if len(parts) > 1 else None
 
+    @classmethod
+    def _sub_type_into_data(cls, values: Any, field_name: str) -> Any:
+        """
+        Copies the subtype of the block type into the given field of the raw data, unless already set.
+        Done before validation, so that parsing a block does not assign to the already validated data.
+        """
+        if isinstance(values, dict):
+            data = values.get("data")
+            block_type = values.get("type") or values.get("block_type")
+            if isinstance(data, dict) and isinstance(block_type, str) and not data.get(field_name):
+                sub_type = block_type.partition(":")[2]
+                if sub_type:
+                    return {**values, "data": {**data, field_name: sub_type}}
+        return values
+
     def is_of_type(self, block_type: T_Type) -> bool:
         """
         Checks if the block is of a specific type.
@@ -144,6 +242,60 @@ class BlockBase(BaseTheoriqModel, Generic[T_Data, T_Type]):
         return json.dumps(self.data, indent=2)
 
 
+UnknownBlock = BlockBase[dict[str, Any], str]
+
+_UNKNOWN_BLOCK_TAG = "unknown"
+
+
+def _block_class_tag(block_class: Type[BlockBase]) -> str:
+    return f"{block_class.__module__}.{block_class.__qualname__}"
+
+
+class _CompiledBlocks:
+    """
+    Adapter of a tagged union of the registered block types.
+
+    Block types are matched by prefix (`text:markdown` is a `text` block) and unknown types fall back to
+    `UnknownBlock`, which a field discriminator cannot express: the tag of a block is found by a callable
+    discriminator doing one or two lookups in mappings built with the adapter, and never changed afterwards.
+    """
+
+    def __init__(self, registry: dict[str, Type[BlockBase]], prefixes: dict[str, Type[BlockBase]]) -> None:
+        tags = {block_class: _block_class_tag(block_class) for block_class in registry.values()}
+        exact_tags = {block_type: tags[block_class] for block_type, block_class in registry.items()}
+        prefix_tags = {prefix: tags[block_class] for prefix, block_class in prefixes.items()}
+
+        def block_tag(value: Any) -> str:
+            block_type = value.get("type") or value.get("block_type") if isinstance(value, dict) else None
+            if isinstance(block_type, str):
+                tag = exact_tags.get(block_type) or prefix_tags.get(block_type.partition(":")[0])
+                if tag is not None:
+                    return tag
+            return _UNKNOWN_BLOCK_TAG
+
+        members = [Annotated[block_class, Tag(tag)] for block_class, tag in tags.items()]
+        members.append(Annotated[UnknownBlock, Tag(_UNKNOWN_BLOCK_TAG)])
+        block = Annotated[Union[tuple(members)], Discriminator(block_tag)]  # type: ignore[valid-type]
+        self.adapter: TypeAdapter[List[BlockBase]] = TypeAdapter(List[block])  # type: ignore[valid-type]
+
+
+def blocks_adapter() -> TypeAdapter[List[BlockBase]]:
+    """
+    Returns an adapter validating a list of block dictionaries in a single pass, as a tagged union
+    of all the registered block types. Blocks of an unknown type are validated as `UnknownBlock`.
+
+    The adapter is compiled on first use and again after a new block type is registered.
+    """
+    global _compiled
+    compiled = _compiled
+    if compiled is None:
+        with _registry_lock:
+            compiled = _compiled
+            if compiled is None:
+                compiled = _compiled = _CompiledBlocks(dict(_registry), dict(_registryPrefix))
+    return compiled.adapter
+
+
 BlockBasePredicate = Callable[[BlockBase], bool]
 
 
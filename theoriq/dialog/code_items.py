@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Annotated, Optional
+from typing import Annotated, Any, Optional
 
 from pydantic import Field, field_validator, model_validator
 
@@ -32,6 +32,11 @@ class CodeBlock(BlockBase[CodeData, Annotated[str, Field(pattern="code(:.*)?")]]
             raise ValueError('CodeBlock block_type must start with "code"')
         return v
 
+    @model_validator(mode="before")
+    @classmethod
+    def set_language_from_block_type_before(cls, values: Any) -> Any:
+        return cls._sub_type_into_data(values, "language")
+
     @model_validator(mode="after")
     def set_language_from_block_type(self):
         if self.data and not self.data.language:
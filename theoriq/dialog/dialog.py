@@ -2,12 +2,21 @@ from __future__ import annotations
 
 import re
 from datetime import datetime, timezone
-from typing import Annotated, Any, Callable, Iterable, List, Optional, Sequence, Tuple, Type
+from typing import Annotated, Any, Callable, ClassVar, Dict, Iterable, List, Optional, Sequence, Tuple, Type
 
-from pydantic import Field, field_serializer, field_validator
+from pydantic import Field, ValidationInfo, ValidatorFunctionWrapHandler, field_serializer, field_validator
 
 from ..types import SourceType
-from .block import AllBlocks, BaseData, BaseTheoriqModel, BlockBase, BlockBasePredicate, BlockOfType, BlockOfTypes
+from .block import (
+    AllBlocks,
+    BaseData,
+    BaseTheoriqModel,
+    BlockBase,
+    BlockBasePredicate,
+    BlockOfTypes,
+    UnknownBlock,
+    blocks_adapter,
+)
 from .code_items import CodeBlock
 from .command_items import CommandBlock
 from .custom_items import CustomBlock
@@ -19,7 +28,39 @@ from .text_items import TextBlock
 from .tool_items import ToolCallBlock, ToolCallResultBlock
 from .web3_items import Web3ProposedTxBlock, Web3SignedTxBlock
 
-UnknownBlock = BlockBase[dict[str, Any], str]
+# Key of the cached index in the `__dict__` of an item or a dialog, outside the fields of the model
+_INDEX_KEY = "__theoriq_index__"
+
+# Key of the `DialogItemCache` in the pydantic validation context of a dialog
+_ITEM_CACHE_CONTEXT_KEY = "dialog_item_cache"
+
+
+class _BlockIndex:
+    """Positions of the blocks of a dialog item, grouped by block type."""
+
+    def __init__(self, blocks: Sequence[BlockBase]) -> None:
+        self.blocks = blocks
+        self.snapshot = list(blocks)
+        self.by_type: Dict[str, List[int]] = {}
+        for position, block in enumerate(blocks):
+            self.by_type.setdefault(block.block_type, []).append(position)
+        self._by_query: Dict[str, List[int]] = {}
+
+    def is_valid_for(self, blocks: Sequence[BlockBase]) -> bool:
+        # Comparing lists compares identical elements by identity first, without calling `__eq__`
+        return blocks is self.blocks and blocks == self.snapshot
+
+    def positions(self, block_type: str) -> List[int]:
+        """Positions of the blocks matching `block_type`, with the same semantic as `BlockBase.is_of_type`."""
+        positions = self._by_query.get(block_type)
+        if positions is None:
+            if BlockBase.sub_type(block_type):
+                positions = self.by_type.get(block_type, [])
+            else:
+                matches = [key for key in self.by_type if key.startswith(block_type)]
+                positions = sorted(position for key in matches for position in self.by_type[key])
+            self._by_query[block_type] = positions
+        return positions
 
 
 # Main data model
@@ -29,6 +70,14 @@ class DialogItem(BaseTheoriqModel):
     source: Annotated[str, Field(pattern="0x[a-fA-F0-9]{40}([a-fA-F0-9]{24})?", description="Address of the source")]
     blocks: List[BlockBase]
 
+    # Number of assignments of the timestamp or source type of any item, invalidating the indexes of the dialogs
+    _index_edits: ClassVar[int] = 0
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name == "timestamp" or name == "source_type":
+            DialogItem._index_edits += 1
+        super().__setattr__(name, value)
+
     @field_validator("timestamp", mode="before")
     def validate_timestamp(cls, v):
         if isinstance(v, str):
@@ -61,6 +110,8 @@ class DialogItem(BaseTheoriqModel):
     @field_validator("blocks", mode="before")
     def parse_blocks(cls, v):
         if isinstance(v, list):
+            if all(isinstance(item, dict) for item in v):
+                return blocks_adapter().validate_python(v)
             result = [DialogItem.parse_block(item) for item in v]
             return result
         return v
@@ -96,7 +147,8 @@ class DialogItem(BaseTheoriqModel):
         return
 
     def find_blocks_of_type(self, block_type: str) -> Iterable[BlockBase]:
-        return self.find_blocks(BlockOfType(block_type))
+        blocks = self.blocks
+        return (blocks[position] for position in self._block_index().positions(block_type))
 
     def has_blocks(self, predicate: BlockBasePredicate) -> bool:
         for block in self.blocks:
@@ -105,19 +157,31 @@ class DialogItem(BaseTheoriqModel):
         return False
 
     def has_blocks_of_type(self, block_type: str) -> bool:
-        return self.has_blocks(BlockOfType(block_type))
+        return len(self._block_index().positions(block_type)) > 0
 
     def find_all_blocks_of_type(self, block_type: str) -> List[BlockBase]:
         return list(self.find_blocks_of_type(block_type))
 
     def find_first_block_of_type(self, block_type: str) -> Optional[BlockBase]:
-        return next(iter(self.find_blocks_of_type(block_type)), None)
+        positions = self._block_index().positions(block_type)
+        return self.blocks[positions[0]] if positions else None
 
     def find_last_block_of_type(self, block_type: str) -> Optional[BlockBase]:
-        last_item = None
-        for last_item in self.find_blocks_of_type(block_type):  # fall back to iteration
-            pass
-        return last_item
+        positions = self._block_index().positions(block_type)
+        return self.blocks[positions[-1]] if positions else None
+
+    def invalidate_index(self) -> None:
+        """
+        Drops the cached index of the blocks.
+        Only needed after changing the type of a block in place: adding, removing or replacing blocks is detected.
+        """
+        self.__dict__.pop(_INDEX_KEY, None)
+
+    def _block_index(self) -> _BlockIndex:
+        index = self.__dict__.get(_INDEX_KEY)
+        if index is None or not index.is_valid_for(self.blocks):
+            index = self.__dict__[_INDEX_KEY] = _BlockIndex(self.blocks)
+        return index
 
     def extract_last_text(self) -> str:
         """
@@ -176,9 +240,48 @@ def format_source_and_blocks(
     return source_str, blocks_str
 
 
+class _DialogIndex:
+    """Positions of the items of a dialog, ordered by timestamp and grouped by source type."""
+
+    def __init__(self, items: Sequence[DialogItem]) -> None:
+        self.items = items
+        self.snapshot = list(items)
+        self.edits = DialogItem._index_edits
+        # Oldest first; on equal timestamps, the first item of the dialog sorts last, as selected by `max`
+        self.by_time = sorted(range(len(items)), key=lambda position: (items[position].timestamp, -position))
+        self.latest_by_source_type: Dict[SourceType, int] = {}
+        for position in self.by_time:
+            self.latest_by_source_type[items[position].source_type] = position
+
+    def is_valid_for(self, items: Sequence[DialogItem]) -> bool:
+        # Comparing lists compares identical elements by identity first, without calling `__eq__`
+        return items is self.items and self.edits == DialogItem._index_edits and items == self.snapshot
+
+
 class Dialog(BaseData):
     items: List[DialogItem]
 
+    @field_validator("items", mode="wrap")
+    def validate_items(cls, v: Any, handler: ValidatorFunctionWrapHandler, info: ValidationInfo) -> Any:
+        item_cache = info.context.get(_ITEM_CACHE_CONTEXT_KEY) if isinstance(info.context, dict) else None
+        if item_cache is None or not isinstance(v, list):
+            return handler(v)
+        return item_cache.validate_items(v, handler)
+
+    def invalidate_index(self) -> None:
+        """
+        Drops the cached index of the items.
+        Not needed after changing the items: adding, removing or replacing items, and assigning their timestamp or
+        source type, are detected.
+        """
+        self.__dict__.pop(_INDEX_KEY, None)
+
+    def _index(self) -> _DialogIndex:
+        index = self.__dict__.get(_INDEX_KEY)
+        if index is None or not index.is_valid_for(self.items):
+            index = self.__dict__[_INDEX_KEY] = _DialogIndex(self.items)
+        return index
+
     def filter_items(self, predicate: DialogItemPredicate) -> List[DialogItem]:
         return [item for item in self.items if predicate(item)]
 
@@ -190,10 +293,8 @@ class Dialog(BaseData):
         Returns:
             Optional[DialogItem]: The dialog item with the most recent timestamp, or None if there are no items.
         """
-        if len(self.items) == 0:
-            return None
-
-        return max(self.items, key=lambda obj: obj.timestamp)
+        by_time = self._index().by_time
+        return self.items[by_time[-1]] if by_time else None
 
     @property
     def last_text(self) -> str:
@@ -224,7 +325,8 @@ class Dialog(BaseData):
                                   or None if no items match the source type.
         """
 
-        return self.last_item_predicate(lambda item: item.source_type == source_type)
+        position = self._index().latest_by_source_type.get(source_type)
+        return None if position is None else self.items[position]
 
     def last_item_predicate(self, predicate: DialogItemPredicate) -> Optional[DialogItem]:
         """
@@ -238,8 +340,11 @@ class Dialog(BaseData):
                                        or None if no items match the predicate.
         """
 
-        items = (item for item in self.items if predicate(item))
-        return max(items, key=lambda obj: obj.timestamp) if items else None
+        items = self.items
+        for position in reversed(self._index().by_time):
+            if predicate(items[position]):
+                return items[position]
+        return None
 
     def map(self, transformer: DialogItemTransformer) -> List[Any]:
         """Apply a function to each item in the dialog."""
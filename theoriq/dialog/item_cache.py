@@ -0,0 +1,219 @@
+"""Cache of parsed dialog items, shared across the requests of a conversation."""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+from pydantic_core import PydanticSerializationError, to_json
+
+from .block import _FROZEN_KEY
+from .dialog import _INDEX_KEY, _ITEM_CACHE_CONTEXT_KEY, DialogItem
+
+_object_setattr = object.__setattr__
+
+_READ_ONLY_MESSAGE = "cached dialog items are read-only, modify a copy made with model_copy(deep=True)"
+
+
+class _ReadOnlyDict(dict):
+    """Dictionary of the data of a cached item, copied to a regular dictionary."""
+
+    __slots__ = ()
+
+    def _read_only(self, *args: Any, **kwargs: Any) -> Any:
+        raise TypeError(_READ_ONLY_MESSAGE)
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _read_only  # type: ignore
+
+    def __copy__(self) -> Dict[Any, Any]:
+        return dict(self)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> Dict[Any, Any]:
+        return {key: copy.deepcopy(value, memo) for key, value in self.items()}
+
+    def __reduce__(self) -> Any:
+        return dict, (dict(self),)
+
+
+class _ReadOnlyList(list):
+    """List of the blocks or of the data of a cached item, copied to a regular list."""
+
+    __slots__ = ()
+
+    def _read_only(self, *args: Any, **kwargs: Any) -> Any:
+        raise TypeError(_READ_ONLY_MESSAGE)
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only  # type: ignore
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only  # type: ignore
+
+    def __copy__(self) -> List[Any]:
+        return list(self)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> List[Any]:
+        return [copy.deepcopy(value, memo) for value in self]
+
+    def __reduce__(self) -> Any:
+        return list, (list(self),)
+
+
+def _freeze_value(value: Any) -> Any:
+    """
+    Read-only version of a value parsed from JSON: models are made read-only in place, dictionaries and lists are
+    replaced by read-only subclasses, other values, such as strings, numbers and dates, are immutable.
+    """
+    # Checking for the slot of pydantic models is faster than `isinstance`, which goes through the metaclass
+    if hasattr(value, "__pydantic_fields_set__"):
+        _freeze_model(value)
+        return value
+    value_type = type(value)
+    if value_type is dict:
+        return _ReadOnlyDict({key: _freeze_value(item) for key, item in value.items()})
+    if value_type is list:
+        return _ReadOnlyList([_freeze_value(item) for item in value])
+    if value_type is tuple:
+        return tuple(_freeze_value(item) for item in value)
+    return value
+
+
+def _freeze_model(model: BaseModel) -> None:
+    """Makes a model and the values of its fields read-only, in place."""
+    values = model.__dict__
+    if _FROZEN_KEY in values:
+        return
+    values.update({key: _freeze_value(value) for key, value in values.items() if key != _INDEX_KEY})
+    extra = model.__pydantic_extra__
+    if extra is not None:
+        _object_setattr(model, "__pydantic_extra__", _freeze_value(extra))
+    values[_FROZEN_KEY] = True
+
+
+class DialogItemCache:
+    """
+    Bounded LRU cache of parsed dialog items, keyed by the hash of the JSON of the raw items.
+
+    Each request of a conversation resends the whole dialog: with the cache, only the items not seen before
+    are validated. Cached items are shared by the requests, so they are read-only: modifying an item, its blocks
+    or their data raises a `TypeError`. Agents modify a copy, made with `model_copy(deep=True)`.
+
+    Enable it by validating requests with `validation_context()`:
+    `ExecuteRequestBody.model_validate(payload, context=cache.validation_context())`
+    """
+
+    def __init__(self, *, max_size: int = 4096, max_bytes: Optional[int] = None) -> None:
+        """
+        :param max_size: Maximum number of cached items.
+        :param max_bytes: Maximum total size of the JSON of the cached items, used as an estimate of memory.
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self._items: OrderedDict[str, Tuple[DialogItem, int]] = OrderedDict()
+        self._size_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(raw_item: Any) -> Optional[Tuple[str, int]]:
+        """
+        Returns the hash and the size of the compact JSON of a raw item, or None if it is not a JSON object.
+        Keys are serialized in the order received: the same item sent with its keys in another order is a cache miss.
+        """
+        if not isinstance(raw_item, dict):
+            return None
+        try:
+            encoded = to_json(raw_item)
+        except PydanticSerializationError:
+            return None
+        return hashlib.sha256(encoded).hexdigest(), len(encoded)
+
+    def validation_context(self) -> Dict[str, Any]:
+        """Pydantic validation context making `Dialog` validate its items through this cache."""
+        return {_ITEM_CACHE_CONTEXT_KEY: self}
+
+    def get_or_validate(self, raw_item: Any) -> DialogItem:
+        """
+        Returns the cached item parsed from the given raw item, or validates and caches it.
+
+        :raises pydantic.ValidationError: if the raw item is not a valid dialog item
+        """
+        return self.validate_items([raw_item], lambda values: [DialogItem.model_validate(v) for v in values])[0]
+
+    def validate_items(
+        self, raw_items: List[Any], validate: Callable[[List[Any]], List[DialogItem]]
+    ) -> List[DialogItem]:
+        """
+        Returns the items parsed from the given raw items, validating with `validate` only the ones not cached.
+        The raw items are validated together, with cached items in place of the raw items already seen,
+        so that validation errors refer to the position of the item in the dialog.
+        """
+        keys = [self.key(raw_item) for raw_item in raw_items]
+        values: List[Any] = list(raw_items)
+        hits: List[Tuple[int, DialogItem]] = []
+        misses: List[Tuple[int, Tuple[str, int]]] = []
+        with self._lock:
+            for position, key in enumerate(keys):
+                entry = self._items.get(key[0]) if key is not None else None
+                if entry is not None and key is not None:
+                    self._items.move_to_end(key[0])
+                    hits.append((position, entry[0]))
+                elif key is not None:
+                    misses.append((position, key))
+            self.hits += len(hits)
+            self.misses += len(raw_items) - len(hits)
+
+        for position, item in hits:
+            values[position] = item
+        items = validate(values)
+
+        # Items are made read-only before being shared, outside the lock
+        stored = [(key, items[position]) for position, key in misses]
+        for _, item in stored:
+            _freeze_model(item)
+        if stored:
+            with self._lock:
+                for key, item in stored:
+                    self._store(key, item)
+        return items
+
+    def _store(self, key: Tuple[str, int], item: DialogItem) -> None:
+        digest, size = key
+        previous = self._items.pop(digest, None)
+        if previous is not None:
+            self._size_bytes -= previous[1]
+        self._items[digest] = (item, size)
+        self._size_bytes += size
+
+        while len(self._items) > self.max_size or (
+            self.max_bytes is not None and self._size_bytes > self.max_bytes and len(self._items) > 1
+        ):
+            _, (_, evicted_size) = self._items.popitem(last=False)
+            self._size_bytes -= evicted_size
+            self.evictions += 1
+
+    @property
+    def size(self) -> int:
+        """Number of cached items."""
+        return len(self._items)
+
+    @property
+    def size_bytes(self) -> int:
+        """Total size of the JSON of the cached items."""
+        return self._size_bytes
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._size_bytes = 0
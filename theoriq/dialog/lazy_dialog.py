@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union, cast, overload
+
+from ..types import SourceType
+from .dialog import Dialog, DialogItem
+from .item_cache import DialogItemCache
+
+
+class LazyDialogItems(Sequence[DialogItem]):
+    """
+    Items of a dialog kept as raw JSON objects, each one validated as a `DialogItem` the first time it is accessed.
+    """
+
+    def __init__(self, raw_items: List[Dict[str, Any]], item_cache: Optional[DialogItemCache] = None) -> None:
+        self._raw_items = raw_items
+        self._items: List[Optional[DialogItem]] = [None] * len(raw_items)
+        self._item_cache = item_cache
+        # Index of the latest item, overall (None key) or from a source type, computed on first use
+        self._latest: Dict[Optional[SourceType], Optional[int]] = {}
+
+    @classmethod
+    def from_items(cls, items: Sequence[DialogItem]) -> LazyDialogItems:
+        result = cls([{} for _ in items])
+        result._items = list(items)
+        return result
+
+    def __len__(self) -> int:
+        return len(self._raw_items)
+
+    @overload
+    def __getitem__(self, index: int) -> DialogItem: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[DialogItem]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[DialogItem, List[DialogItem]]:
+        if isinstance(index, slice):
+            return [self._materialize(i) for i in range(len(self))[index]]
+        return self._materialize(range(len(self))[index])
+
+    def __iter__(self) -> Iterator[DialogItem]:
+        for index in range(len(self)):
+            yield self._materialize(index)
+
+    @property
+    def raw_items(self) -> List[Dict[str, Any]]:
+        return self._raw_items
+
+    @property
+    def materialized_count(self) -> int:
+        """Number of items validated so far."""
+        return sum(1 for item in self._items if item is not None)
+
+    def timestamp(self, index: int) -> datetime:
+        """Returns the timestamp of an item, parsed from the raw item when it has not been validated yet."""
+        item = self._items[index]
+        if item is not None:
+            return item.timestamp
+
+        value = self._raw_items[index].get("timestamp")
+        if isinstance(value, str):
+            try:
+                return DialogItem._datetime_from_str(value)
+            except ValueError:
+                pass
+        # Validating the item raises the same validation error as an eager validation of the dialog
+        return self._materialize(index).timestamp
+
+    def source_type(self, index: int) -> SourceType:
+        """Returns the source type of an item, read from the raw item when it has not been validated yet."""
+        item = self._items[index]
+        if item is not None:
+            return item.source_type
+
+        raw_item = self._raw_items[index]
+        value = raw_item.get("sourceType", raw_item.get("source_type"))
+        try:
+            return SourceType(value)
+        except ValueError:
+            return self._materialize(index).source_type
+
+    def latest_index(self, indexes: Optional[Sequence[int]] = None) -> Optional[int]:
+        """
+        Returns the index of the item with the most recent timestamp, among the given indexes or all items.
+        The index among all items is computed once.
+        """
+        if indexes is not None:
+            return max(indexes, key=self.timestamp) if len(indexes) > 0 else None
+        if None not in self._latest:
+            self._latest[None] = self.latest_index(range(len(self)))
+        return self._latest[None]
+
+    def latest_index_from(self, source_type: SourceType) -> Optional[int]:
+        """Returns the index of the most recent item from a source type, computed once per source type."""
+        if source_type not in self._latest:
+            indexes = [index for index in range(len(self)) if self.source_type(index) == source_type]
+            self._latest[source_type] = self.latest_index(indexes)
+        return self._latest[source_type]
+
+    def _materialize(self, index: int) -> DialogItem:
+        item = self._items[index]
+        if item is None:
+            raw_item = self._raw_items[index]
+            if self._item_cache is not None:
+                item = self._item_cache.get_or_validate(raw_item)
+            else:
+                item = DialogItem.model_validate(raw_item)
+            self._items[index] = item
+        return item
+
+
+class LazyDialog(Dialog):
+    """
+    Dialog whose items are validated only when accessed.
+
+    `last_item` and `last_item_from` only parse the timestamps and source types of the raw items
+    and validate the selected item. Use `validate_all` to validate the whole dialog at once.
+    """
+
+    @classmethod
+    def from_raw(cls, value: Any, item_cache: Optional[DialogItemCache] = None) -> LazyDialog:
+        """
+        Build a lazy dialog from its JSON representation.
+        Items are validated through `item_cache` when given.
+
+        :raises pydantic.ValidationError: if the value is not an object with a list of items
+        """
+        raw_items = value.get("items") if isinstance(value, dict) else None
+        if isinstance(raw_items, list) and all(isinstance(item, dict) for item in raw_items):
+            return cls.model_construct(items=LazyDialogItems(raw_items, item_cache))
+
+        context = item_cache.validation_context() if item_cache is not None else None
+        dialog = Dialog.model_validate(value, context=context)
+        return cls.model_construct(items=LazyDialogItems.from_items(dialog.items))
+
+    @property
+    def lazy_items(self) -> LazyDialogItems:
+        return cast(LazyDialogItems, self.items)
+
+    @property
+    def last_item(self) -> Optional[DialogItem]:
+        index = self.lazy_items.latest_index()
+        return None if index is None else self.lazy_items[index]
+
+    def last_item_from(self, source_type: SourceType) -> Optional[DialogItem]:
+        index = self.lazy_items.latest_index_from(source_type)
+        return None if index is None else self.lazy_items[index]
+
+    def validate_all(self) -> Dialog:
+        """Validate all the items of the dialog and return them as a regular `Dialog`."""
+        return Dialog(items=list(self.lazy_items))
+
+    def model_dump(self, **kwargs) -> dict[str, Any]:
+        return self.validate_all().model_dump(**kwargs)
+
+    def model_dump_json(self, **kwargs) -> str:
+        return self.validate_all().model_dump_json(**kwargs)
+
+    def model_dump_json_bytes(self) -> bytes:
+        return self.validate_all().model_dump_json_bytes()
@@ -0,0 +1,119 @@
+"""Rendering of dialogs as markdown for LLM prompts, within a size budget."""
+
+from __future__ import annotations
+
+import io
+import math
+from typing import Callable, Iterator, List, Optional, Sequence, TextIO, Type
+
+from .block import AllBlocks, BlockBase, BlockBasePredicate, BlockOfTypes
+from .dialog import Dialog, DialogItem
+
+# Key of the rendered string of a block in its `__dict__`, outside the fields of the model
+_RENDERED_KEY = "__theoriq_rendered__"
+
+_SEPARATOR = "\n\n"
+
+
+def approximate_token_count(text: str) -> int:
+    """Rough number of tokens of a text, counting four characters per token."""
+    return math.ceil(len(text) / 4)
+
+
+def render_block(block: BlockBase) -> str:
+    """
+    Returns `block.to_str()`, cached in the block.
+    Blocks are expected not to be modified in place once rendered: the cache is only dropped when the data
+    of the block is replaced.
+    """
+    cached = block.__dict__.get(_RENDERED_KEY)
+    if cached is not None and cached[0] is block.data:
+        return cached[1]
+
+    rendered = block.to_str()
+    block.__dict__[_RENDERED_KEY] = (block.data, rendered)
+    return rendered
+
+
+class DialogRenderer:
+    """
+    Renders a dialog as markdown, in the format of `Dialog.format_as_markdown`, keeping only the newest items
+    fitting in a budget of characters or tokens.
+
+    Items are rendered newest-first and rendering stops at the first item exceeding the budget, so that the cost
+    is proportional to the size of the output and not to the size of the dialog. The newest item is always kept
+    as a whole, even when it exceeds the budget on its own. The rendered string of each block is cached in the block.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_chars: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        count_tokens: Callable[[str], int] = approximate_token_count,
+        with_address: bool = True,
+        block_types_to_format: Optional[Sequence[Type[BlockBase]]] = None,
+        indent: int = 1,
+    ) -> None:
+        """
+        :param max_chars: Maximum number of characters of the output.
+        :param max_tokens: Maximum number of tokens of the output, as counted by `count_tokens` for each item.
+        :param count_tokens: Function counting the tokens of a text. Defaults to an approximation.
+        :param with_address: Include the address of the source of each item.
+        :param block_types_to_format: Types of the blocks to render. Defaults to all blocks.
+        :param indent: Level of the markdown heading of each item.
+        """
+        self.max_chars = max_chars
+        self.max_tokens = max_tokens
+        self.count_tokens = count_tokens
+        self.with_address = with_address
+        self.indent = indent
+        self._predicate: BlockBasePredicate = (
+            BlockOfTypes(block_types_to_format) if block_types_to_format else AllBlocks
+        )
+        self._separator_tokens = count_tokens(_SEPARATOR) if max_tokens is not None else 0
+
+    def render_item(self, item: DialogItem) -> str:
+        """Renders a dialog item as a markdown section."""
+        blocks = _SEPARATOR.join(render_block(block) for block in item.blocks if self._predicate(block))
+        return f"{'#' * self.indent} {item.format_source(with_address=self.with_address)}{_SEPARATOR}{blocks}"
+
+    def iter_newest_first(self, dialog: Dialog) -> Iterator[str]:
+        """Yields the sections of the newest items of the dialog fitting in the budget, from the newest one."""
+        chars = 0
+        tokens = 0
+        items = dialog.items
+        for position in range(len(items) - 1, -1, -1):
+            section = self.render_item(items[position])
+            is_newest = position == len(items) - 1
+            separator_chars = 0 if is_newest else len(_SEPARATOR)
+            chars += len(section) + separator_chars
+            if self.max_tokens is not None:
+                tokens += self.count_tokens(section) + (0 if is_newest else self._separator_tokens)
+
+            if not is_newest and (
+                (self.max_chars is not None and chars > self.max_chars)
+                or (self.max_tokens is not None and tokens > self.max_tokens)
+            ):
+                return
+            yield section
+
+    def write(self, dialog: Dialog, buffer: TextIO) -> int:
+        """
+        Writes the newest items of the dialog fitting in the budget, in the order of the dialog.
+
+        :return: the number of characters written
+        """
+        sections: List[str] = list(self.iter_newest_first(dialog))
+        written = 0
+        for index in range(len(sections) - 1, -1, -1):
+            written += buffer.write(sections[index])
+            if index > 0:
+                written += buffer.write(_SEPARATOR)
+        return written
+
+    def render(self, dialog: Dialog) -> str:
+        """Returns the newest items of the dialog fitting in the budget, in the order of the dialog."""
+        buffer = io.StringIO()
+        self.write(dialog, buffer)
+        return buffer.getvalue()
@@ -0,0 +1,122 @@
+"""Compact in-memory representation of dialogs."""
+
+from __future__ import annotations
+
+import sys
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+from ..types import SourceType
+from .block import BlockBase, blocks_adapter
+from .dialog import Dialog, DialogItem
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NAIVE_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# UTC offset stored for timestamps without a time zone
+_NAIVE_OFFSET = -(2**31)
+
+_timezones: Dict[int, timezone] = {0: timezone.utc}
+
+
+def _timezone(offset: int) -> timezone:
+    tz = _timezones.get(offset)
+    if tz is None:
+        tz = _timezones[offset] = timezone(timedelta(seconds=offset))
+    return tz
+
+
+class DialogRecord:
+    """Source and blocks of a stored dialog item, the blocks being kept as their JSON."""
+
+    __slots__ = ("source_type", "source", "blocks")
+
+    def __init__(self, source_type: SourceType, source: str, blocks: bytes) -> None:
+        self.source_type = source_type
+        self.source = source
+        self.blocks = blocks
+
+    @classmethod
+    def from_item(cls, item: DialogItem) -> DialogRecord:
+        blocks = b"[" + b",".join(block.model_dump_json_bytes() for block in item.blocks) + b"]"
+        return cls(item.source_type, sys.intern(item.source), blocks)
+
+    def parse_blocks(self) -> List[BlockBase]:
+        return blocks_adapter().validate_json(self.blocks)
+
+
+class DialogStore:
+    """
+    Append-only dialog kept in a compact form, for conversations held in memory for a long time.
+
+    Timestamps are stored as microseconds since the epoch and UTC offsets in arrays of integers,
+    source addresses are interned and shared across stores, and blocks are stored as their JSON.
+    Items are converted back to `DialogItem` on access, and `to_dialog` returns a `Dialog` equal to the stored one.
+    """
+
+    __slots__ = ("_timestamps", "_offsets", "_records")
+
+    def __init__(self, items: Iterable[DialogItem] = ()) -> None:
+        self._timestamps = array("q")
+        self._offsets = array("i")
+        self._records: List[DialogRecord] = []
+        self.extend(items)
+
+    @classmethod
+    def from_dialog(cls, dialog: Dialog) -> DialogStore:
+        return cls(dialog.items)
+
+    def append(self, item: DialogItem) -> None:
+        timestamp = item.timestamp
+        offset = timestamp.utcoffset()
+        if offset is None:
+            self._timestamps.append((timestamp - _NAIVE_EPOCH) // _MICROSECOND)
+            self._offsets.append(_NAIVE_OFFSET)
+        else:
+            self._timestamps.append((timestamp - _EPOCH) // _MICROSECOND)
+            self._offsets.append(int(offset.total_seconds()))
+        self._records.append(DialogRecord.from_item(item))
+
+    def extend(self, items: Iterable[DialogItem]) -> None:
+        for item in items:
+            self.append(item)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __getitem__(self, index: int) -> DialogItem:
+        index = range(len(self))[index]
+        record = self._records[index]
+        return DialogItem.model_construct(
+            timestamp=self.timestamp(index),
+            source_type=record.source_type,
+            source=record.source,
+            blocks=record.parse_blocks(),
+        )
+
+    def __iter__(self) -> Iterator[DialogItem]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def timestamp(self, index: int) -> datetime:
+        """Returns the timestamp of an item, without converting its blocks."""
+        microseconds = timedelta(microseconds=self._timestamps[index])
+        offset = self._offsets[index]
+        if offset == _NAIVE_OFFSET:
+            return _NAIVE_EPOCH + microseconds
+        return (_EPOCH + microseconds).astimezone(_timezone(offset))
+
+    def source(self, index: int) -> str:
+        return self._records[index].source
+
+    def source_type(self, index: int) -> SourceType:
+        return self._records[index].source_type
+
+    @property
+    def records(self) -> Sequence[DialogRecord]:
+        return self._records
+
+    def to_dialog(self) -> Dialog:
+        return Dialog.model_construct(items=list(self))
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Annotated, Optional
+from typing import Annotated, Any, Optional
 
 from pydantic import Field, field_validator, model_validator
 
@@ -34,6 +34,11 @@ class TextBlock(BlockBase[TextData, Annotated[str, Field(pattern="text(:.*)?")]]
             raise ValueError('TextBlock block_type must start with "text"')
         return v
 
+    @model_validator(mode="before")
+    @classmethod
+    def set_text_type_from_block_type_before(cls, values: Any) -> Any:
+        return cls._sub_type_into_data(values, "type")
+
     @model_validator(mode="after")
     def set_text_type_from_block_type(self):
         if self.data and not self.data.type:
@@ -1,2 +1,5 @@
 from .logging import init_logging, init_logfmt, list_routes
 from .utils import run_agent_flask_app
+from .replay import ExecuteReplayCache
+from .admission import AdmissionController, AdmissionRejectedError
+from .compression import ResponseCompression
@@ -0,0 +1,277 @@
+"""Admission control of execute requests."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional
+
+from theoriq.utils.metrics import (
+    EXECUTE_ADMISSION_QUEUE_SECONDS,
+    EXECUTE_REQUESTS_ADMITTED,
+    EXECUTE_REQUESTS_REJECTED,
+    MetricsSink,
+    get_default_metrics_sink,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when an execute request is not admitted."""
+
+    def __init__(self, message: str, status_code: int = 429) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class AdmissionStats:
+    """Counters of an admission controller."""
+
+    def __init__(self) -> None:
+        self.admitted = 0
+        self.rejected = 0
+        self.queued = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    def observe_queue_wait(self, wait: float) -> None:
+        self.queued += 1
+        self.queue_wait_total += wait
+        self.queue_wait_max = max(self.queue_wait_max, wait)
+
+    @property
+    def queue_wait_avg(self) -> float:
+        return self.queue_wait_total / self.queued if self.queued else 0.0
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: float, now: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = now
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_take(self, now: float) -> bool:
+        self.refill(now)
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class _Waiter:
+    def __init__(self, sender: str) -> None:
+        self.sender = sender
+        self.granted = threading.Event()
+
+
+class AdmissionTicket:
+    """Slot granted to an admitted request, released when the request completes."""
+
+    def __init__(self, controller: Optional[AdmissionController], sender: str, queue_wait: float) -> None:
+        self._controller = controller
+        self._released = False
+        self.sender = sender
+        self.queue_wait = queue_wait
+
+    @classmethod
+    def unlimited(cls) -> AdmissionTicket:
+        """Ticket of a request processed without admission control."""
+        return cls(None, "", 0.0)
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            if self._controller is not None:
+                self._controller.release(self.sender)
+
+    def __enter__(self) -> AdmissionTicket:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """
+    Limits the execute requests processed concurrently by an agent.
+
+    Requests are identified by the address of their sender, as found in the verified request biscuit.
+    A request is rejected right away when its sender exceeds its rate limit, or when the queue is full.
+    Otherwise, it runs as soon as both the global and the per-sender concurrency limits allow it.
+    Waiting requests are served round-robin across senders, so that a single sender cannot starve the others,
+    and are rejected once they have waited longer than `max_queue_time`.
+    """
+
+    # Maximum number of idle token buckets kept before full buckets are dropped
+    _MAX_IDLE_BUCKETS = 10_000
+
+    def __init__(
+        self,
+        *,
+        max_in_flight: int = 32,
+        max_in_flight_per_sender: Optional[int] = None,
+        rate_per_sender: Optional[float] = None,
+        burst_per_sender: Optional[int] = None,
+        max_queue_size: int = 128,
+        max_queue_time: float = 30.0,
+        metrics: Optional[MetricsSink] = None,
+    ) -> None:
+        """
+        :param max_in_flight: Maximum number of requests processed at the same time.
+        :param max_in_flight_per_sender: Maximum number of requests processed at the same time for a single sender.
+        :param rate_per_sender: Maximum number of requests per second accepted from a single sender.
+        :param burst_per_sender: Number of requests a sender can send at once when under its rate. Defaults to the rate.
+        :param max_queue_size: Maximum number of requests waiting for a slot.
+        :param max_queue_time: Maximum time in seconds a request waits for a slot.
+        :param metrics: Sink of the admission metrics, the default one if not set.
+        """
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        if max_in_flight_per_sender is not None and max_in_flight_per_sender < 1:
+            raise ValueError("max_in_flight_per_sender must be at least 1")
+        if rate_per_sender is not None and rate_per_sender <= 0:
+            raise ValueError("rate_per_sender must be positive")
+
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_per_sender = max_in_flight_per_sender
+        self.rate_per_sender = rate_per_sender
+        self.burst_per_sender = max(1, burst_per_sender or int(rate_per_sender or 1))
+        self.max_queue_size = max_queue_size
+        self.max_queue_time = max_queue_time
+        self.stats = AdmissionStats()
+        self._metrics = metrics or get_default_metrics_sink()
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._in_flight_per_sender: Dict[str, int] = {}
+        self._queues: OrderedDict[str, Deque[_Waiter]] = OrderedDict()
+        self._queue_size = 0
+        self._buckets: Dict[str, _TokenBucket] = {}
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_size(self) -> int:
+        return self._queue_size
+
+    def admit(self, sender: str) -> AdmissionTicket:
+        """
+        Wait for a slot to process a request of the given sender.
+
+        :return: a ticket to release once the request is processed
+        :raises AdmissionRejectedError: if the request is not admitted
+        """
+        start = time.monotonic()
+        with self._lock:
+            if not self._take_token(sender, start):
+                raise self._reject(f"rate limit exceeded for sender {sender}", 429)
+
+            # Waiting requests left in the queue are blocked by their own sender's limit when slots are free
+            if sender not in self._queues and self._has_capacity(sender):
+                self._acquire(sender)
+                self.stats.admitted += 1
+                self._metrics.increment(EXECUTE_REQUESTS_ADMITTED)
+                return AdmissionTicket(self, sender, 0.0)
+
+            if self._queue_size >= self.max_queue_size:
+                status_code = 429 if self._is_sender_saturated(sender) else 503
+                raise self._reject("too many requests waiting to be processed", status_code)
+
+            waiter = _Waiter(sender)
+            self._queues.setdefault(sender, deque()).append(waiter)
+            self._queue_size += 1
+
+        granted = waiter.granted.wait(self.max_queue_time)
+        wait = time.monotonic() - start
+        with self._lock:
+            if not granted and not waiter.granted.is_set():
+                self._remove_waiter(waiter)
+                raise self._reject(f"request not processed after waiting {wait:.3f}s", 503)
+            self.stats.admitted += 1
+            self.stats.observe_queue_wait(wait)
+        self._metrics.increment(EXECUTE_REQUESTS_ADMITTED)
+        self._metrics.observe(EXECUTE_ADMISSION_QUEUE_SECONDS, wait)
+
+        logger.debug(f"Request from {sender} admitted after waiting {wait:.3f}s")
+        return AdmissionTicket(self, sender, wait)
+
+    def release(self, sender: str) -> None:
+        """Release the slot of a processed request of the given sender, usually through its ticket."""
+        with self._lock:
+            self._in_flight -= 1
+            count = self._in_flight_per_sender[sender] - 1
+            if count == 0:
+                del self._in_flight_per_sender[sender]
+            else:
+                self._in_flight_per_sender[sender] = count
+            self._grant_waiters()
+
+    def _grant_waiters(self) -> None:
+        """Grant free slots to waiting requests, one sender at a time in round-robin order."""
+        while self._queue_size > 0 and self._in_flight < self.max_in_flight:
+            for sender in list(self._queues):
+                if self._has_capacity(sender):
+                    queue = self._queues.pop(sender)
+                    waiter = queue.popleft()
+                    if queue:
+                        # Move the sender at the end of the round
+                        self._queues[sender] = queue
+                    self._queue_size -= 1
+                    self._acquire(sender)
+                    waiter.granted.set()
+                    break
+            else:
+                return
+
+    def _remove_waiter(self, waiter: _Waiter) -> None:
+        queue = self._queues.get(waiter.sender)
+        if queue is None:
+            return
+        queue.remove(waiter)
+        self._queue_size -= 1
+        if not queue:
+            del self._queues[waiter.sender]
+
+    def _has_capacity(self, sender: str) -> bool:
+        return self._in_flight < self.max_in_flight and not self._is_sender_saturated(sender)
+
+    def _is_sender_saturated(self, sender: str) -> bool:
+        limit = self.max_in_flight_per_sender
+        return limit is not None and self._in_flight_per_sender.get(sender, 0) >= limit
+
+    def _acquire(self, sender: str) -> None:
+        self._in_flight += 1
+        self._in_flight_per_sender[sender] = self._in_flight_per_sender.get(sender, 0) + 1
+
+    def _take_token(self, sender: str, now: float) -> bool:
+        if self.rate_per_sender is None:
+            return True
+
+        bucket = self._buckets.get(sender)
+        if bucket is None:
+            if len(self._buckets) >= self._MAX_IDLE_BUCKETS:
+                self._prune_buckets(now)
+            bucket = self._buckets[sender] = _TokenBucket(self.rate_per_sender, self.burst_per_sender, now)
+        return bucket.try_take(now)
+
+    def _prune_buckets(self, now: float) -> None:
+        for sender, bucket in list(self._buckets.items()):
+            bucket.refill(now)
+            if bucket.tokens >= bucket.burst:
+                del self._buckets[sender]
+
+    def _reject(self, message: str, status_code: int) -> AdmissionRejectedError:
+        self.stats.rejected += 1
+        self._metrics.increment(EXECUTE_REQUESTS_REJECTED, labels={"status": str(status_code)})
+        logger.warning(f"Request rejected: {message}")
+        return AdmissionRejectedError(message, status_code)
@@ -1,41 +1,136 @@
+import json
 import logging
 import os
 import sys
+import threading
 from datetime import datetime, timezone
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import flask
 from flask import Blueprint, Request, Response, jsonify, request
 
-from theoriq import Agent
+from theoriq import Agent, AgentDeploymentConfiguration
 from theoriq.api.common import ExecuteContextBase
 from theoriq.api.v1alpha2.schemas import ChallengeRequestBody
-from theoriq.biscuit import RequestBiscuit, RequestFacts, ResponseBiscuit, TheoriqBiscuitError
+from theoriq.biscuit import PayloadHash, RequestBiscuit, RequestFacts, ResponseBiscuit, TheoriqBiscuitError
 from theoriq.extra import start_time
 from theoriq.extra.globals import agent_var
 from theoriq.types import AgentDataObject
-from theoriq.utils import is_protocol_secured
+from theoriq.utils import DEFAULT_MAX_DECOMPRESSED_SIZE, decompress_body, is_protocol_secured
 
 logger = logging.getLogger(__name__)
 
+# Key of the decompressed body of a request in its WSGI environment
+_REQUEST_BODY_KEY = "theoriq.request_body"
+
+
+def theoriq_system_blueprint(agent_config: Optional[AgentDeploymentConfiguration] = None) -> Blueprint:
+    """
+    Theoriq system blueprint
+
+    Responses of the read-only endpoints are serialized once, when the blueprint is built if the agent configuration
+    is given, otherwise on the first request from the agent of the request context.
+    The `/agent` response is only rebuilt when the agent yaml file is modified.
+    """
+    lock = threading.Lock()
+    built = [SystemContents(Agent(agent_config))] if agent_config is not None else []
+
+    def contents() -> SystemContents:
+        if not built:
+            with lock:
+                if not built:
+                    built.append(SystemContents(agent_var.get()))
+        return built[0]
 
-def theoriq_system_blueprint() -> Blueprint:
     blueprint = Blueprint("theoriq_system", __name__, url_prefix="/system")
     blueprint.add_url_rule("/challenge", view_func=sign_challenge, methods=["POST"])
-    blueprint.add_url_rule("/agent", view_func=agent_data, methods=["GET"])
-    blueprint.add_url_rule("/public-key", view_func=public_key, methods=["GET"])
-    blueprint.add_url_rule("/livez", view_func=livez, methods=["GET"])
+    blueprint.add_url_rule(
+        "/agent",
+        endpoint="agent_data",
+        view_func=lambda: contents().agent_data.get().to_response(request),
+        methods=["GET"],
+    )
+    blueprint.add_url_rule(
+        "/public-key",
+        endpoint="public_key",
+        view_func=lambda: contents().public_key.to_response(request),
+        methods=["GET"],
+    )
+    blueprint.add_url_rule(
+        "/livez", endpoint="livez", view_func=lambda: contents().livez.to_response(request), methods=["GET"]
+    )
     return blueprint
 
 
-def livez() -> Response:
-    return jsonify({"startTime": start_time})
+class SystemContents:
+    """Contents of the read-only system endpoints of an agent."""
+
+    def __init__(self, agent: Agent) -> None:
+        self.livez = StaticJsonContent({"startTime": start_time})
+        self.public_key = StaticJsonContent(
+            {"publicKey": agent.public_key, "keyType": "ed25519", "keccak256Hash": str(agent.config.address)}
+        )
+        self.agent_data = AgentDataContent(agent.public_key, agent.config.agent_yaml_path)
+
+
+class StaticJsonContent:
+    """JSON payload serialized once and served with a strong ETag."""
+
+    def __init__(self, payload: Any) -> None:
+        # Same output as `jsonify` when the application is not in debug mode
+        self.body = (json.dumps(payload, sort_keys=True, separators=(",", ":")) + "\n").encode("utf-8")
+        self.etag = PayloadHash.compute_hash(self.body)
 
+    def to_response(self, req: Request) -> Response:
+        """Build the response, or a `304 Not Modified` if the request carries a matching `If-None-Match` header."""
+        response = Response(self.body, mimetype="application/json")
+        response.set_etag(self.etag)
+        response.make_conditional(req)
+        return response
 
-def public_key() -> Response:
-    """Public key endpoint"""
-    agent = agent_var.get()
-    return jsonify({"publicKey": agent.public_key, "keyType": "ed25519", "keccak256Hash": str(agent.config.address)})
+
+class AgentDataContent:
+    """Content of the `/system/agent` endpoint, rebuilt only when the agent yaml file changes."""
+
+    def __init__(self, public_key: str, path: Optional[str]) -> None:
+        self._public_key = public_key
+        self._path = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), path)) if path else None
+        self._lock = threading.Lock()
+        self._mtime = self._read_mtime()
+        self._content = self._build()
+
+    def get(self) -> StaticJsonContent:
+        if self._path is None:
+            return self._content
+
+        mtime = self._read_mtime()
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._content = self._build()
+                    self._mtime = mtime
+        return self._content
+
+    def _read_mtime(self) -> Optional[int]:
+        if self._path is None:
+            return None
+        try:
+            return os.stat(self._path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _build(self) -> StaticJsonContent:
+        metadata: Dict[str, Any] = {}
+        if self._path:
+            try:
+                logger.debug(f"loading metadata file: {self._path}")
+                agent_data = AgentDataObject.from_yaml(self._path)
+                data = agent_data.to_dict()
+                metadata = data["spec"] | {"name": agent_data.metadata.name}
+            except Exception as err:
+                logger.error(f"error loading metadata file: {self._path}, error: {err} ")
+
+        return StaticJsonContent({"system": {"publicKey": self._public_key}, "metadata": metadata})
 
 
 def sign_challenge() -> Response:
@@ -46,25 +141,20 @@ def sign_challenge() -> Response:
     return jsonify({"signature": f"0x{signature.hex()}", "nonce": challenge_body.nonce})
 
 
-def agent_data() -> Response:
-    """Agent data endpoint"""
-    agent = agent_var.get()
-    path = agent.config.agent_yaml_path
-    result: Dict[str, Any] = {"publicKey": agent.public_key}
-    metadata = {}
-
-    if path:
-        try:
-            path = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), path))
-            logger.debug(f"loading metadata file: {path}")
-            agent_data = AgentDataObject.from_yaml(path)
-            data = agent_data.to_dict()
-            metadata = data["spec"] | {"name": agent_data.metadata.name}
-        except Exception as err:
-            logger.error(f"error loading metadata file: {path}, error: {err} ")
+def request_body(req: Request) -> bytes:
+    """
+    Returns the body of the request, decompressed according to its Content-Encoding header.
+    Payload hashes are defined over this uncompressed body. The body is decompressed once per request.
 
-    result = {"system": result} | {"metadata": metadata}
-    return jsonify(result)
+    :raises UnsupportedContentEncodingError: if the body is compressed with a coding which is not available
+    :raises ContentDecodingError: if the compressed body is not valid or too large once decompressed
+    """
+    body = req.environ.get(_REQUEST_BODY_KEY)
+    if body is None:
+        max_size = req.max_content_length or DEFAULT_MAX_DECOMPRESSED_SIZE
+        body = decompress_body(req.get_data(), req.content_encoding, max_size)
+        req.environ[_REQUEST_BODY_KEY] = body
+    return body
 
 
 def process_biscuit_request(agent: Agent, protocol_public_key: str, req: Request) -> RequestBiscuit:
@@ -80,10 +170,10 @@ def process_biscuit_request(agent: Agent, protocol_public_key: str, req: Request
     if is_protocol_secured():
         token = get_bearer_token(req)
         request_biscuit = RequestBiscuit.from_token(token=token, public_key=protocol_public_key)
-        agent.verify_biscuit(request_biscuit, req.data)
+        agent.verify_biscuit(request_biscuit, request_body(req))
     else:
         address = str(agent.config.address)
-        biscuit = RequestFacts.generate_new_biscuit(req.data, from_addr=address, to_addr=address)
+        biscuit = RequestFacts.generate_new_biscuit(request_body(req), from_addr=address, to_addr=address)
         request_biscuit = RequestBiscuit(biscuit)
     return request_biscuit
 
@@ -0,0 +1,56 @@
+"""Compression of the bodies of responses."""
+
+from __future__ import annotations
+
+from typing import Optional
+
+import flask
+
+from theoriq.utils import DEFAULT_MIN_COMPRESS_SIZE, negotiate_content_coding
+
+
+class ResponseCompression:
+    """
+    Compresses the bodies of responses above a size threshold, with the coding preferred by the Accept-Encoding
+    header of the request.
+
+    Responses are compressed once complete: response biscuits are signed over the uncompressed body, which is also
+    the body stored by the replay cache. Streamed responses are not compressed, so that events are not delayed.
+    The ETag of a compressed response, or of a `304 Not Modified` one when a coding is negotiated, is made weak:
+    the compressed and identity bodies are not byte-identical, and `If-None-Match` is compared weakly.
+    """
+
+    def __init__(self, *, min_size: int = DEFAULT_MIN_COMPRESS_SIZE, level: Optional[int] = None) -> None:
+        """
+        :param min_size: Minimum size of the compressed bodies, in bytes.
+        :param level: Compression level, defaults to the default level of each coding.
+        """
+        self.min_size = min_size
+        self.level = level
+
+    def apply(self, response: flask.Response) -> flask.Response:
+        """Compresses the body of a response, as an `after_request` function."""
+        if response.is_streamed or response.direct_passthrough or "Content-Encoding" in response.headers:
+            return response
+
+        response.vary.add("Accept-Encoding")
+        coding = negotiate_content_coding(flask.request.headers.get("Accept-Encoding"))
+        data = response.get_data()
+        if coding is None:
+            return response
+        if response.status_code == 304:
+            self._weaken_etag(response)
+            return response
+        if len(data) < self.min_size:
+            return response
+
+        self._weaken_etag(response)
+        response.set_data(coding.compress(data, self.level))
+        response.headers["Content-Encoding"] = coding.name
+        return response
+
+    @staticmethod
+    def _weaken_etag(response: flask.Response) -> None:
+        etag, weak = response.get_etag()
+        if etag is not None and not weak:
+            response.set_etag(etag, weak=True)
@@ -0,0 +1,122 @@
+"""Replay of the responses of retried execute requests."""
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+import flask
+
+from theoriq.biscuit import PayloadHash
+from theoriq.utils import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayEntry:
+    """Signed response stored for a request."""
+
+    def __init__(self, body: bytes, authorization: Optional[str], status_code: int, content_type: str) -> None:
+        self.body = body
+        self.authorization = authorization
+        self.status_code = status_code
+        self.content_type = content_type
+
+    @classmethod
+    def from_response(cls, response: flask.Response) -> ReplayEntry:
+        return cls(
+            body=response.get_data(),
+            authorization=response.headers.get("authorization"),
+            status_code=response.status_code,
+            content_type=response.content_type or "application/json",
+        )
+
+    def to_response(self) -> flask.Response:
+        response = flask.Response(self.body, status=self.status_code, content_type=self.content_type)
+        if self.authorization is not None:
+            response.headers.add("authorization", self.authorization)
+        return response
+
+
+class _InFlight:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.entry: Optional[ReplayEntry] = None
+
+
+class ExecuteReplayCache:
+    """
+    Stores the signed responses of execute requests, so that a request delivered more than once
+    is only executed once.
+
+    Requests are identified by the request id of their biscuit, the hash of their body and the headers negotiating
+    the representation of the response. A request identical to one still being executed waits for the running one
+    and gets its response if it succeeded, otherwise it is executed in turn. Only successful responses are stored.
+    """
+
+    def __init__(self, *, ttl: int = 300, max_size: int = 1000, wait_timeout: Optional[float] = None) -> None:
+        """
+        :param ttl: Time-to-live of the stored responses in seconds.
+        :param max_size: Maximum number of stored responses.
+        :param wait_timeout: Maximum time in seconds a duplicate request waits for the running one.
+        """
+        self._responses: TTLCache[ReplayEntry] = TTLCache(ttl=ttl, max_size=max_size)
+        self._in_flight: Dict[str, _InFlight] = {}
+        self._lock = threading.Lock()
+        self._wait_timeout = wait_timeout
+        self.hits = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def key(request_id: str, body: bytes, accept: Optional[str] = None, accept_encoding: Optional[str] = None) -> str:
+        """
+        :param accept: Accept header of the request, negotiating the encoding of the response body.
+        :param accept_encoding: Accept-Encoding header of the request, negotiating the compression of the response.
+        """
+        return f"{request_id}:{PayloadHash.compute_hash(body)}:{accept or ''}:{accept_encoding or ''}"
+
+    def get_or_execute(self, key: str, execute: Callable[[], flask.Response]) -> flask.Response:
+        """
+        Returns the stored response for the given key, or the successful response of the request currently running
+        for the same key, or executes the request.
+        """
+        with self._lock:
+            entry = self._responses.get(key)
+            if entry is not None:
+                self.hits += 1
+                logger.info(f"Replaying response of request {key}")
+                return entry.to_response()
+
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                in_flight = self._in_flight[key] = _InFlight()
+                is_leader = True
+            else:
+                is_leader = False
+
+        if not is_leader:
+            in_flight.done.wait(self._wait_timeout)
+            if in_flight.entry is not None:
+                with self._lock:
+                    self.coalesced += 1
+                logger.info(f"Coalesced duplicate of request {key}")
+                return in_flight.entry.to_response()
+            return execute()
+
+        try:
+            response = execute()
+            entry = ReplayEntry.from_response(response)
+            if entry.status_code == 200:
+                in_flight.entry = entry
+                with self._lock:
+                    self._responses.set(key, entry)
+            return response
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            in_flight.done.set()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._responses.clear()
@@ -3,30 +3,51 @@
 import json
 import logging
 import threading
+from typing import Any, Callable, Iterator, Optional, Union
 
 import pydantic
-from flask import Blueprint, Response, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 
 import theoriq
 from theoriq import ExecuteRuntimeError
-from theoriq.api import ExecuteContextV1alpha2, ExecuteRequestFnV1alpha2
+from theoriq.api import ExecuteContextV1alpha2, ExecuteRequestFnV1alpha2, ExecuteStreamFnV1alpha2
 from theoriq.api.v1alpha2 import ConfigureContext
-from theoriq.api.v1alpha2.agent import Agent, AgentDeploymentConfiguration
+from theoriq.api.v1alpha2.agent import (
+    Agent,
+    AgentDeploymentConfiguration,
+    AgentSchemaValidators,
+    ExecuteRequestSchemaError,
+    ExecuteResponseSchemaError,
+)
 from theoriq.api.v1alpha2.configure import AgentConfigurator
-from theoriq.api.v1alpha2.schemas import AgentSchemas, ExecuteRequestBody
-from theoriq.biscuit import TheoriqBiscuit, TheoriqBiscuitError
+from theoriq.api.v1alpha2.schemas import AgentSchemas, ExecuteRequestBody, LazyExecuteRequestBody
+from theoriq.biscuit import IncrementalPayloadHash, TheoriqBiscuit, TheoriqBiscuitError
+from theoriq.dialog import BlockBase, DialogItem, DialogItemCache, ErrorBlock
 from theoriq.extra.flask.common import get_bearer_token
 from theoriq.extra.globals import agent_var
+from theoriq.utils import (
+    BodyDecodeError,
+    ContentDecodingError,
+    UnsupportedBodyEncodingError,
+    UnsupportedContentEncodingError,
+    body_encoding,
+    negotiate_body_encoding,
+)
 
 from ...logging.execute_context import ExecuteLogContext
 from ...logging.http_request_context import x_request_id_var
+from ..admission import AdmissionController, AdmissionRejectedError, AdmissionTicket
 from ..common import (
+    StaticJsonContent,
     add_biscuit_to_response,
     build_error_payload,
     new_error_response,
     process_biscuit_request,
+    request_body,
     theoriq_system_blueprint,
 )
+from ..compression import ResponseCompression
+from ..replay import ExecuteReplayCache
 
 logger = logging.getLogger(__name__)
 
@@ -36,22 +57,51 @@ def theoriq_blueprint(
     execute_fn: ExecuteRequestFnV1alpha2,
     schemas: AgentSchemas = AgentSchemas.empty(),
     agent_configurator: AgentConfigurator = AgentConfigurator.default(),
+    validate_execute_payloads: bool = False,
+    replay_cache: Optional[ExecuteReplayCache] = None,
+    admission_controller: Optional[AdmissionController] = None,
+    execute_stream_fn: Optional[ExecuteStreamFnV1alpha2] = None,
+    lazy_request_body: bool = False,
+    dialog_item_cache: Optional[DialogItemCache] = None,
+    response_compression: Optional[ResponseCompression] = None,
 ) -> Blueprint:
     """
     Theoriq blueprint
+    :param validate_execute_payloads: validate execute requests and responses against the schemas of the operation
+    :param replay_cache: optional cache replaying the response of execute requests delivered more than once
+    :param admission_controller: optional limits on the execute requests processed concurrently
+    :param execute_stream_fn: optional function streaming the response of requests sent to `/execute-stream`
+    :param lazy_request_body: pass execute functions a `LazyExecuteRequestBody`, validating dialog items on access
+    :param dialog_item_cache: optional cache of the dialog items parsed from previous requests
+    :param response_compression: optional compression of the responses, for clients accepting it.
+        Compressed request bodies are always decompressed.
     :return: a blueprint with all the routes required by the `theoriq` protocol
     """
 
     main_blueprint = Blueprint("main_blueprint", __name__)
     Agent.validate_schemas(schemas)
+    validators = AgentSchemaValidators(schemas)
 
     @main_blueprint.before_request
     def set_context() -> None:
-        agent_var.set(Agent(agent_config, schemas))
+        agent_var.set(Agent(agent_config, schemas, validators))
 
     configure_error_handlers(main_blueprint)
-
-    v1alpha2_blueprint = _build_v1alpha2_blueprint(execute_fn, agent_configurator)
+    if response_compression is not None:
+        main_blueprint.after_request(response_compression.apply)
+
+    v1alpha2_blueprint = _build_v1alpha2_blueprint(
+        agent_config,
+        execute_fn,
+        schemas,
+        agent_configurator,
+        validate_execute_payloads,
+        replay_cache,
+        admission_controller,
+        execute_stream_fn,
+        lazy_request_body,
+        dialog_item_cache,
+    )
     main_blueprint.register_blueprint(v1alpha2_blueprint)
     return main_blueprint
 
@@ -70,10 +120,37 @@ def configure_error_handlers(main_blueprint: Blueprint) -> None:
             agent_address=str(agent_var.get().config.address), request_id="", err=str(e), status_code=401
         )
 
+    @main_blueprint.errorhandler(UnsupportedContentEncodingError)
+    def handle_unsupported_content_encoding(e: UnsupportedContentEncodingError) -> Response:
+        return build_error_payload(
+            agent_address=str(agent_var.get().config.address), request_id="", err=str(e), status_code=415
+        )
+
+    @main_blueprint.errorhandler(ContentDecodingError)
+    def handle_content_decoding_error(e: ContentDecodingError) -> Response:
+        return build_error_payload(
+            agent_address=str(agent_var.get().config.address), request_id="", err=str(e), status_code=400
+        )
+
+
+def theoriq_configuration_blueprint(
+    agent_configurator: AgentConfigurator, schemas: Optional[AgentSchemas] = None
+) -> Blueprint:
+    """
+    Theoriq configuration blueprint
+
+    The configuration schema is serialized once, when the blueprint is built if the schemas are given, otherwise on
+    the first request from the schemas of the agent of the request context.
+    """
+    content = _lazy_json_content(lambda schemas: schemas.configuration or {}, schemas)
 
-def theoriq_configuration_blueprint(agent_configurator: AgentConfigurator) -> Blueprint:
     blueprint = Blueprint("theoriq_configuration", __name__, url_prefix="/configuration")
-    blueprint.add_url_rule("/schema", view_func=get_configuration_schema, methods=["GET"])
+    blueprint.add_url_rule(
+        "/schema",
+        endpoint="get_configuration_schema",
+        view_func=lambda: content().to_response(request),
+        methods=["GET"],
+    )
     blueprint.add_url_rule("/<string:agent_id>/validate", view_func=validate_configuration, methods=["POST"])
     blueprint.add_url_rule(
         "/<string:agent_id>/apply",
@@ -83,38 +160,117 @@ def theoriq_configuration_blueprint(agent_configurator: AgentConfigurator) -> Bl
     return blueprint
 
 
-def theoriq_schemas_blueprint() -> Blueprint:
+def theoriq_schemas_blueprint(schemas: Optional[AgentSchemas] = None) -> Blueprint:
+    """
+    Theoriq schemas blueprint
+
+    The schemas are serialized once, when the blueprint is built if they are given, otherwise on the first request
+    from the schemas of the agent of the request context.
+    """
+    content = _lazy_json_content(lambda schemas: schemas.model_dump(), schemas)
+
     blueprint = Blueprint("theoriq_schemas", __name__)
-    blueprint.add_url_rule("/schemas", view_func=get_schemas, methods=["GET"])
+    blueprint.add_url_rule(
+        "/schemas", endpoint="get_schemas", view_func=lambda: content().to_response(request), methods=["GET"]
+    )
     return blueprint
 
 
-def theoriq_execute_blueprint(execute_fn: ExecuteRequestFnV1alpha2) -> Blueprint:
+def _lazy_json_content(
+    payload: Callable[[AgentSchemas], Any], schemas: Optional[AgentSchemas]
+) -> Callable[[], StaticJsonContent]:
+    """Returns the content of a payload built from the given schemas, or from those of the agent of the first request."""
+    lock = threading.Lock()
+    built = [StaticJsonContent(payload(schemas))] if schemas is not None else []
+
+    def content() -> StaticJsonContent:
+        if not built:
+            with lock:
+                if not built:
+                    built.append(StaticJsonContent(payload(agent_var.get().schemas)))
+        return built[0]
+
+    return content
+
+
+def theoriq_execute_blueprint(
+    execute_fn: ExecuteRequestFnV1alpha2,
+    validate_payloads: bool = False,
+    replay_cache: Optional[ExecuteReplayCache] = None,
+    admission_controller: Optional[AdmissionController] = None,
+    execute_stream_fn: Optional[ExecuteStreamFnV1alpha2] = None,
+    lazy_request_body: bool = False,
+    dialog_item_cache: Optional[DialogItemCache] = None,
+) -> Blueprint:
     blueprint = Blueprint("theoriq_execute", __name__)
     blueprint.add_url_rule(
-        "/execute", view_func=lambda: execute_v1alpha2(execute_fn), methods=["POST"], endpoint="execute"
+        "/execute",
+        view_func=lambda: execute_v1alpha2(
+            execute_fn, validate_payloads, replay_cache, admission_controller, lazy_request_body, dialog_item_cache
+        ),
+        methods=["POST"],
+        endpoint="execute",
     )
     blueprint.add_url_rule(
         "/execute-async",
-        view_func=lambda: execute_async_v1alpha2(execute_fn),
+        view_func=lambda: execute_async_v1alpha2(
+            execute_fn, validate_payloads, admission_controller, lazy_request_body, dialog_item_cache
+        ),
         methods=["POST"],
         endpoint="execute-async",
     )
+    if execute_stream_fn is not None:
+        blueprint.add_url_rule(
+            "/execute-stream",
+            view_func=lambda: execute_stream_v1alpha2(
+                execute_stream_fn, validate_payloads, admission_controller, lazy_request_body, dialog_item_cache
+            ),
+            methods=["POST"],
+            endpoint="execute-stream",
+        )
 
     return blueprint
 
 
-def _build_v1alpha2_blueprint(execute_fn: ExecuteRequestFnV1alpha2, agent_configurator: AgentConfigurator) -> Blueprint:
+def _build_v1alpha2_blueprint(
+    agent_config: AgentDeploymentConfiguration,
+    execute_fn: ExecuteRequestFnV1alpha2,
+    schemas: AgentSchemas,
+    agent_configurator: AgentConfigurator,
+    validate_execute_payloads: bool,
+    replay_cache: Optional[ExecuteReplayCache],
+    admission_controller: Optional[AdmissionController],
+    execute_stream_fn: Optional[ExecuteStreamFnV1alpha2],
+    lazy_request_body: bool,
+    dialog_item_cache: Optional[DialogItemCache],
+) -> Blueprint:
     v1alpha2_blueprint = Blueprint("v1alpha2", __name__, url_prefix="/api/v1alpha2")
-    v1alpha2_blueprint.register_blueprint(theoriq_execute_blueprint(execute_fn))
-    v1alpha2_blueprint.register_blueprint(theoriq_system_blueprint())
-    v1alpha2_blueprint.register_blueprint(theoriq_configuration_blueprint(agent_configurator))
-    v1alpha2_blueprint.register_blueprint(theoriq_schemas_blueprint())
+    v1alpha2_blueprint.register_blueprint(
+        theoriq_execute_blueprint(
+            execute_fn,
+            validate_execute_payloads,
+            replay_cache,
+            admission_controller,
+            execute_stream_fn,
+            lazy_request_body,
+            dialog_item_cache,
+        )
+    )
+    v1alpha2_blueprint.register_blueprint(theoriq_system_blueprint(agent_config))
+    v1alpha2_blueprint.register_blueprint(theoriq_configuration_blueprint(agent_configurator, schemas))
+    v1alpha2_blueprint.register_blueprint(theoriq_schemas_blueprint(schemas))
 
     return v1alpha2_blueprint
 
 
-def execute_v1alpha2(execute_request_function: ExecuteRequestFnV1alpha2) -> Response:
+def execute_v1alpha2(
+    execute_request_function: ExecuteRequestFnV1alpha2,
+    validate_payloads: bool = False,
+    replay_cache: Optional[ExecuteReplayCache] = None,
+    admission_controller: Optional[AdmissionController] = None,
+    lazy_request_body: bool = False,
+    dialog_item_cache: Optional[DialogItemCache] = None,
+) -> Response:
     """Execute endpoint"""
     logger.debug("Executing request")
     agent = agent_var.get()
@@ -123,27 +279,124 @@ def execute_v1alpha2(execute_request_function: ExecuteRequestFnV1alpha2) -> Resp
     execute_context = ExecuteContextV1alpha2(agent, protocol_client, request_biscuit)
     with ExecuteLogContext(execute_context):
         try:
-            execute_request_body = ExecuteRequestBody.model_validate(request.json)
-            execute_context.set_configuration(execute_request_body.configuration)
-            # Execute user's function
-            try:
-                execute_response = execute_request_function(execute_context, execute_request_body)
-            except ExecuteRuntimeError as err:
-                execute_response = execute_context.runtime_error_response(err)
-
-            dump = execute_response.body.model_dump()
-            response = jsonify(dump)
-            response_biscuit = execute_context.new_response_biscuit(response.get_data())
-            response = add_biscuit_to_response(response, response_biscuit)
-            return response
-        except pydantic.ValidationError as err:
-            return new_error_response(execute_context, err, 400)
-        except Exception as err:
-            logger.exception(err)
-            return new_error_response(execute_context, err, 500)
+            ticket = _admit(admission_controller, execute_context)
+        except AdmissionRejectedError as err:
+            return new_error_response(execute_context, err, err.status_code)
+
+        with ticket:
+            if replay_cache is None:
+                return _execute(
+                    execute_request_function,
+                    execute_context,
+                    agent,
+                    validate_payloads,
+                    lazy_request_body,
+                    dialog_item_cache,
+                )
+
+            key = ExecuteReplayCache.key(
+                execute_context.request_id,
+                request_body(request),
+                request.headers.get("Accept"),
+                request.headers.get("Accept-Encoding"),
+            )
+            return replay_cache.get_or_execute(
+                key,
+                lambda: _execute(
+                    execute_request_function,
+                    execute_context,
+                    agent,
+                    validate_payloads,
+                    lazy_request_body,
+                    dialog_item_cache,
+                ),
+            )
+
 
+def _admit(
+    admission_controller: Optional[AdmissionController], execute_context: ExecuteContextV1alpha2
+) -> AdmissionTicket:
+    if admission_controller is None:
+        return AdmissionTicket.unlimited()
+    return admission_controller.admit(execute_context.request_sender_address)
 
-def execute_async_v1alpha2(execute_request_function: ExecuteRequestFnV1alpha2) -> Response:
+
+def _request_payload() -> Any:
+    """
+    Returns the decoded body of the request, according to its Content-Type and Content-Encoding.
+
+    :raises UnsupportedBodyEncodingError: if the body uses an unknown encoding or one which is not available
+    :raises BodyDecodeError: if the body cannot be decoded
+    """
+    if request.content_encoding:
+        return body_encoding(request.content_type).decode(request_body(request))
+    if request.is_json or not request.content_type:
+        return request.json
+    return body_encoding(request.content_type).decode(request.get_data())
+
+
+def _parse_execute_request_body(lazy: bool, item_cache: Optional[DialogItemCache] = None) -> ExecuteRequestBody:
+    payload = _request_payload()
+    if lazy:
+        return LazyExecuteRequestBody.from_raw(payload, item_cache)
+    context = item_cache.validation_context() if item_cache is not None else None
+    return ExecuteRequestBody.model_validate(payload, context=context)
+
+
+def _execute_response(body: DialogItem) -> Response:
+    """Returns the response of an execute request, encoded as requested by its Accept header."""
+    encoding = negotiate_body_encoding(request.headers.get("Accept"))
+    if encoding.is_json:
+        return jsonify(body.model_dump())
+    return Response(body.model_dump_bytes(encoding), content_type=encoding.content_type)
+
+
+def _execute(
+    execute_request_function: ExecuteRequestFnV1alpha2,
+    execute_context: ExecuteContextV1alpha2,
+    agent: Agent,
+    validate_payloads: bool,
+    lazy_request_body: bool = False,
+    dialog_item_cache: Optional[DialogItemCache] = None,
+) -> Response:
+    try:
+        execute_request_body = _parse_execute_request_body(lazy_request_body, dialog_item_cache)
+        operation = agent.validate_execute_request(execute_request_body) if validate_payloads else None
+        execute_context.set_configuration(execute_request_body.configuration)
+        # Execute user's function
+        try:
+            execute_response = execute_request_function(execute_context, execute_request_body)
+        except ExecuteRuntimeError as err:
+            execute_response = execute_context.runtime_error_response(err)
+        else:
+            if operation is not None:
+                try:
+                    agent.validate_execute_response(operation, execute_response.body)
+                except ExecuteResponseSchemaError as err:
+                    logger.error(str(err))
+                    error = ExecuteRuntimeError("InvalidResponse", str(err))
+                    execute_response = execute_context.runtime_error_response(error)
+
+        response = _execute_response(execute_response.body)
+        response_biscuit = execute_context.new_response_biscuit(response.get_data())
+        response = add_biscuit_to_response(response, response_biscuit)
+        return response
+    except (pydantic.ValidationError, ExecuteRequestSchemaError, BodyDecodeError) as err:
+        return new_error_response(execute_context, err, 400)
+    except UnsupportedBodyEncodingError as err:
+        return new_error_response(execute_context, err, 415)
+    except Exception as err:
+        logger.exception(err)
+        return new_error_response(execute_context, err, 500)
+
+
+def execute_async_v1alpha2(
+    execute_request_function: ExecuteRequestFnV1alpha2,
+    validate_payloads: bool = False,
+    admission_controller: Optional[AdmissionController] = None,
+    lazy_request_body: bool = False,
+    dialog_item_cache: Optional[DialogItemCache] = None,
+) -> Response:
     """Execute async endpoint"""
     logger.debug("Execute async request")
     agent = agent_var.get()
@@ -152,20 +405,39 @@ def execute_async_v1alpha2(execute_request_function: ExecuteRequestFnV1alpha2) -
     execute_context = ExecuteContextV1alpha2(agent, protocol_client, request_biscuit)
     with ExecuteLogContext(execute_context):
         try:
-            execute_request_body = ExecuteRequestBody.model_validate(request.json)
+            ticket = _admit(admission_controller, execute_context)
+        except AdmissionRejectedError as err:
+            return new_error_response(execute_context, err, err.status_code)
+
+        try:
+            execute_request_body = _parse_execute_request_body(lazy_request_body, dialog_item_cache)
+            operation = agent.validate_execute_request(execute_request_body) if validate_payloads else None
             execute_context.set_configuration(execute_request_body.configuration)
 
-            # Execute user's function
+            # Execute user's function, the admission ticket is released by the thread once done
             thread = threading.Thread(
                 target=_execute_async,
-                args=(execute_request_function, execute_context, execute_request_body, x_request_id_var.get()),
+                args=(
+                    execute_request_function,
+                    execute_context,
+                    execute_request_body,
+                    x_request_id_var.get(),
+                    ticket,
+                    agent if operation is not None else None,
+                    operation,
+                ),
             )
             thread.start()
             return Response(status=202)
 
-        except pydantic.ValidationError as err:
+        except (pydantic.ValidationError, ExecuteRequestSchemaError, BodyDecodeError) as err:
+            ticket.release()
             return new_error_response(execute_context, err, 400)
+        except UnsupportedBodyEncodingError as err:
+            ticket.release()
+            return new_error_response(execute_context, err, 415)
         except Exception as err:
+            ticket.release()
             logger.exception(err)
             return new_error_response(execute_context, err, 500)
 
@@ -175,12 +447,20 @@ def _execute_async(
     execute_context: ExecuteContextV1alpha2,
     execute_request_body: ExecuteRequestBody,
     request_id_header: str,
+    ticket: AdmissionTicket,
+    agent: Optional[Agent] = None,
+    operation: Optional[str] = None,
 ) -> None:
-    with ExecuteLogContext(execute_context, request_id_header):
+    with ExecuteLogContext(execute_context, request_id_header), ticket:
         try:
             execute_response = execute_fn(execute_context, execute_request_body)
+            if agent is not None and operation is not None:
+                agent.validate_execute_response(operation, execute_response.body)
         except ExecuteRuntimeError as err:
             execute_response = execute_context.runtime_error_response(err)
+        except ExecuteResponseSchemaError as err:
+            logger.error(str(err))
+            execute_response = execute_context.runtime_error_response(ExecuteRuntimeError("InvalidResponse", str(err)))
 
         response_payload = {"response": execute_response.body.model_dump()}
         response = Response(response=json.dumps(response_payload), content_type="application/json")
@@ -189,14 +469,94 @@ def _execute_async(
         execute_context.complete_request(response_biscuit, response.get_data())
 
 
-def get_configuration_schema() -> Response:
+def execute_stream_v1alpha2(
+    execute_stream_function: ExecuteStreamFnV1alpha2,
+    validate_payloads: bool = False,
+    admission_controller: Optional[AdmissionController] = None,
+    lazy_request_body: bool = False,
+    dialog_item_cache: Optional[DialogItemCache] = None,
+) -> Response:
+    """
+    Execute stream endpoint
+
+    The response is a stream of server-sent events, flushed as soon as the execute function yields them:
+    - `block` events hold a block of the response, as JSON
+    - `text` events hold a text delta, as a JSON object `{"text": "..."}`
+    The last event is a `biscuit` event holding the response biscuit, signed for the hash of all the bytes
+    of the stream preceding it.
+    """
+    logger.debug("Execute stream request")
     agent = agent_var.get()
-    return jsonify(agent.schemas.configuration or {})
+    protocol_client = theoriq.api.v1alpha2.ProtocolClient.from_env()
+    request_biscuit = process_biscuit_request(agent, protocol_client.public_key, request)
+    execute_context = ExecuteContextV1alpha2(agent, protocol_client, request_biscuit)
+    with ExecuteLogContext(execute_context):
+        try:
+            ticket = _admit(admission_controller, execute_context)
+        except AdmissionRejectedError as err:
+            return new_error_response(execute_context, err, err.status_code)
 
+        try:
+            execute_request_body = _parse_execute_request_body(lazy_request_body, dialog_item_cache)
+            if validate_payloads:
+                agent.validate_execute_request(execute_request_body)
+            execute_context.set_configuration(execute_request_body.configuration)
+        except (pydantic.ValidationError, ExecuteRequestSchemaError, BodyDecodeError) as err:
+            ticket.release()
+            return new_error_response(execute_context, err, 400)
+        except UnsupportedBodyEncodingError as err:
+            ticket.release()
+            return new_error_response(execute_context, err, 415)
+        except Exception as err:
+            ticket.release()
+            logger.exception(err)
+            return new_error_response(execute_context, err, 500)
 
-def get_schemas() -> Response:
-    agent = agent_var.get()
-    return jsonify(agent.schemas.model_dump())
+    events = _stream_events(execute_stream_function, execute_context, execute_request_body, x_request_id_var.get())
+    response = Response(stream_with_context(events), mimetype="text/event-stream")
+    # The stream may be closed without being iterated, e.g. when the client disconnects before the first event
+    response.call_on_close(ticket.release)
+    response.headers["Cache-Control"] = "no-cache"
+    # Ask reverse proxies not to buffer the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _stream_events(
+    execute_stream_function: ExecuteStreamFnV1alpha2,
+    execute_context: ExecuteContextV1alpha2,
+    execute_request_body: ExecuteRequestBody,
+    request_id_header: Optional[str],
+) -> Iterator[bytes]:
+    body_hash = IncrementalPayloadHash()
+    with ExecuteLogContext(execute_context, request_id_header):
+        try:
+            for chunk in execute_stream_function(execute_context, execute_request_body):
+                event = _chunk_event(chunk)
+                body_hash.update(event)
+                yield event
+        except ExecuteRuntimeError as err:
+            event = _sse_event("block", ErrorBlock.from_error(err=err.err, message=err.message).model_dump_json())
+            body_hash.update(event)
+            yield event
+        except Exception as err:
+            logger.exception(err)
+            event = _sse_event("block", ErrorBlock.from_exception(err).model_dump_json())
+            body_hash.update(event)
+            yield event
+
+        response_biscuit = execute_context.new_response_biscuit_for_hash(body_hash.payload_hash())
+        yield _sse_event("biscuit", response_biscuit.to_base64())
+
+
+def _chunk_event(chunk: Union[BlockBase, str]) -> bytes:
+    if isinstance(chunk, str):
+        return _sse_event("text", json.dumps({"text": chunk}))
+    return _sse_event("block", chunk.model_dump_json())
+
+
+def _sse_event(event: str, data: str) -> bytes:
+    return f"event: {event}\ndata: {data}\n\n".encode("utf-8")
 
 
 def validate_configuration(agent_id: str) -> Response:
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from enum import Enum
-from typing import Any
+from typing import Any, Dict
 
 
 class SourceType(str, Enum):
@@ -39,12 +39,10 @@ class SourceType(str, Enum):
         A static method that attempts to convert a given address to a `SourceType` enum.
         """
 
-        length = len(address.removeprefix("0x"))
-        if length == 40:
-            return SourceType.User
-        if length == 64:
-            return SourceType.Agent
-        raise ValueError(f"'{address}' is not a valid address")
+        source_type = _SOURCE_TYPE_BY_ADDRESS_LENGTH.get(len(address.removeprefix("0x")))
+        if source_type is None:
+            raise ValueError(f"'{address}' is not a valid address")
+        return source_type
 
     @property
     def is_user(self) -> bool:
@@ -56,3 +54,7 @@ class SourceType(str, Enum):
 
     def __str__(self) -> str:
         return str(self.value)
+
+
+# Source types by the length of their address without its `0x` prefix: 20 bytes for users, 32 bytes for agents
+_SOURCE_TYPE_BY_ADDRESS_LENGTH: Dict[int, SourceType] = {40: SourceType.User, 64: SourceType.Agent}
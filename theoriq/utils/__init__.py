@@ -1,4 +1,43 @@
-from .cache import TTLCache
+from .cache import CacheStats, TTLCache
+from .cache_backend import (
+    CACHE_PATH_ENV,
+    CacheBackend,
+    CacheCodec,
+    InMemoryCacheBackend,
+    JsonCacheCodec,
+    ModelCacheCodec,
+    SQLiteCacheBackend,
+    get_shared_cache_backend,
+    set_shared_cache_backend,
+)
+from .compression import (
+    DEFAULT_MAX_DECOMPRESSED_SIZE,
+    DEFAULT_MIN_COMPRESS_SIZE,
+    GZIP_CODING,
+    ZSTD_CODING,
+    ContentCoding,
+    ContentDecodingError,
+    GzipContentCoding,
+    UnsupportedContentEncodingError,
+    ZstdContentCoding,
+    accept_encoding_header,
+    content_coding,
+    decompress_body,
+    negotiate_content_coding,
+)
+from .encoding import (
+    JSON_ENCODING,
+    MSGPACK_ENCODING,
+    BodyDecodeError,
+    BodyEncoding,
+    JsonBodyEncoding,
+    MsgpackBodyEncoding,
+    UnsupportedBodyEncodingError,
+    accept_header,
+    body_encoding,
+    find_body_encoding,
+    negotiate_body_encoding,
+)
 from .env import (
     EnvVariableValueException,
     MissingEnvVariableException,
@@ -13,10 +52,30 @@ from .env import (
     must_read_env_str,
     must_read_env_decimal,
 )
+from .metrics import (
+    DEFAULT_LATENCY_BUCKETS,
+    Histogram,
+    InMemoryMetricsRegistry,
+    MetricsSink,
+    NullMetricsSink,
+    get_default_metrics_sink,
+    notification_timestamp,
+    set_default_metrics_sink,
+)
 from .utils import is_protocol_secured
 
 __all__ = [
+    "CacheStats",
     "TTLCache",
+    "CACHE_PATH_ENV",
+    "CacheBackend",
+    "CacheCodec",
+    "InMemoryCacheBackend",
+    "JsonCacheCodec",
+    "ModelCacheCodec",
+    "SQLiteCacheBackend",
+    "get_shared_cache_backend",
+    "set_shared_cache_backend",
     "EnvVariableValueException",
     "MissingEnvVariableException",
     "read_env_str",
@@ -30,4 +89,36 @@ __all__ = [
     "must_read_env_str",
     "must_read_env_decimal",
     "is_protocol_secured",
+    "BodyEncoding",
+    "JsonBodyEncoding",
+    "MsgpackBodyEncoding",
+    "JSON_ENCODING",
+    "MSGPACK_ENCODING",
+    "BodyDecodeError",
+    "UnsupportedBodyEncodingError",
+    "accept_header",
+    "body_encoding",
+    "find_body_encoding",
+    "negotiate_body_encoding",
+    "ContentCoding",
+    "GzipContentCoding",
+    "ZstdContentCoding",
+    "GZIP_CODING",
+    "ZSTD_CODING",
+    "DEFAULT_MIN_COMPRESS_SIZE",
+    "DEFAULT_MAX_DECOMPRESSED_SIZE",
+    "ContentDecodingError",
+    "UnsupportedContentEncodingError",
+    "accept_encoding_header",
+    "content_coding",
+    "decompress_body",
+    "negotiate_content_coding",
+    "MetricsSink",
+    "NullMetricsSink",
+    "InMemoryMetricsRegistry",
+    "Histogram",
+    "DEFAULT_LATENCY_BUCKETS",
+    "get_default_metrics_sink",
+    "set_default_metrics_sink",
+    "notification_timestamp",
 ]
@@ -1,38 +1,107 @@
+import logging
+import threading
 import time
 from collections import OrderedDict
-from typing import Generic, Optional, TypeVar
+from typing import Callable, Dict, Generic, Optional, Tuple, TypeVar, cast
+
+from .cache_backend import CacheBackend, CacheCodec, get_shared_cache_backend
+
+logger = logging.getLogger(__name__)
 
 # Define a type variable for generic support
 T = TypeVar("T")
 
+_MISSING = object()
+
+
+class CacheStats:
+    """Hits, misses and removals of a cache."""
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0  # misses served by the shared backend
+        self.loads = 0
+        self.load_failures = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def hit_ratio(self) -> Optional[float]:
+        """Share of the lookups served from the cache, None before the first lookup."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+    def __repr__(self) -> str:
+        return (
+            f"CacheStats(hits={self.hits}, misses={self.misses}, shared_hits={self.shared_hits}, loads={self.loads}, "
+            f"load_failures={self.load_failures}, coalesced={self.coalesced}, evictions={self.evictions}, "
+            f"expirations={self.expirations})"
+        )
+
+
+class _Load(Generic[T]):
+    """Load of a key in progress, awaited by the concurrent lookups of the same key."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Optional[T] = None
+        self.error: Optional[BaseException] = None
+
 
 class TTLCache(Generic[T]):
-    def __init__(self, *, ttl: Optional[int] = None, max_size: int = 100):
+    """
+    Least recently used cache whose entries expire after a time-to-live.
+
+    The cache is thread-safe. Expired entries are removed when read, when the cache is full and by `sweep`.
+
+    A cache with a namespace and a codec also shares its entries through a cache backend, e.g. with the other worker
+    processes of an agent: the items missing locally are looked up in the backend before being loaded, and the items
+    stored locally are written through to the backend. Errors of the backend are logged and the cache stays local.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl: Optional[int] = None,
+        max_size: int = 100,
+        namespace: Optional[str] = None,
+        codec: Optional[CacheCodec[T]] = None,
+        backend: Optional[CacheBackend] = None,
+    ):
         """
         Initialize the cache with a specific time-to-live (TTL) and maximum size.
 
-        :param ttl: Time-to-live for cache items in seconds.
+        :param ttl: Default time-to-live for cache items in seconds, None for items that never expire.
         :param max_size: Maximum number of items in the cache.
+        :param namespace: Namespace of the items of the cache in the shared backend.
+        :param codec: Codec of the items stored in the shared backend.
+        :param backend: Shared backend, the one returned by `get_shared_cache_backend` when the cache is first used
+            if None.
         """
         self.ttl = ttl
         self.max_size = max_size
+        self.namespace = namespace
+        self._codec = codec
+        self._backend = backend
         self.cache: OrderedDict[str, tuple[T, Optional[float]]] = OrderedDict()  # Cache storing (value, expiry_time)
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._loads: Dict[str, _Load[T]] = {}
+        self._next_expiry: Optional[float] = None  # no item of the cache expires before this time
 
-    def set(self, key: str, value: T) -> None:
+    def set(self, key: str, value: T, ttl: Optional[float] = None) -> None:
         """
         Store a key-value pair in the cache.
 
         :param key: The key to store.
         :param value: The value to store.
+        :param ttl: Time-to-live of the item in seconds, the default time-to-live of the cache if None.
         """
-        if key in self.cache:
-            del self.cache[key]
-
-        expiry_time = time.time() + self.ttl if self.ttl is not None else None
-        self.cache[key] = (value, expiry_time)
-
-        if len(self.cache) > self.max_size:
-            self.cache.popitem(last=False)
+        with self._lock:
+            self._set(key, value, ttl)
+        self._set_shared(key, value, ttl)
 
     def get(self, key: str) -> Optional[T]:
         """
@@ -41,13 +110,74 @@ class TTLCache(Generic[T]):
         :param key: The key to retrieve.
         :return: The value associated with the key, or None if the key doesn't exist or has expired.
         """
-        if key in self.cache:
-            value, expiry_time = self.cache[key]
-            if expiry_time is None or time.time() < expiry_time:
-                return value
+        with self._lock:
+            value = self._get(key)
+        if value is _MISSING:
+            value = self._get_shared(key)
+        return None if value is _MISSING else value  # type: ignore[return-value]
+
+    def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], T],
+        ttl: Optional[float] = None,
+        cache_if: Optional[Callable[[T], bool]] = None,
+    ) -> T:
+        """
+        Retrieve a value from the cache or from the shared backend, or load and store it if the key doesn't exist
+        or has expired.
+
+        Loads are single-flight: concurrent lookups of a key being loaded wait for the running load instead of
+        calling the loader again, and get its value or its exception. Failed loads are not cached.
+
+        :param key: The key to retrieve.
+        :param loader: Function returning the value of the key, called outside the lock of the cache.
+        :param ttl: Time-to-live of the loaded item in seconds, the default time-to-live of the cache if None.
+        :param cache_if: Predicate of the loaded values to store, e.g. to load again a missing value next time.
+            All the loaded values are stored if None.
+        :return: The value associated with the key.
+        """
+        with self._lock:
+            value = self._get(key)
+            if value is not _MISSING:
+                return value  # type: ignore[return-value]
+            load = self._loads.get(key)
+            is_leader = load is None
+            if load is None:
+                load = self._loads[key] = _Load()
             else:
-                del self.cache[key]
-        return None
+                self.stats.coalesced += 1
+
+        if not is_leader:
+            load.done.wait()
+            if load.error is not None:
+                raise load.error
+            return load.value  # type: ignore[return-value]
+
+        try:
+            value = self._get_shared(key)
+            if value is not _MISSING:
+                load.value = cast(T, value)
+                return load.value
+            load.value = loader()
+        except BaseException as e:
+            load.error = e
+            with self._lock:
+                self.stats.load_failures += 1
+            raise
+        else:
+            store = cache_if is None or cache_if(load.value)
+            with self._lock:
+                self.stats.loads += 1
+                if store:
+                    self._set(key, load.value, ttl)
+            if store:
+                self._set_shared(key, load.value, ttl)
+            return load.value
+        finally:
+            with self._lock:
+                self._loads.pop(key, None)
+            load.done.set()
 
     def delete(self, key: str) -> None:
         """
@@ -55,11 +185,131 @@ class TTLCache(Generic[T]):
 
         :param key: The key to remove.
         """
-        if key in self.cache:
-            del self.cache[key]
+        with self._lock:
+            self.cache.pop(key, None)
+        shared = self._shared()
+        if shared is not None:
+            backend, namespace, _ = shared
+            try:
+                backend.delete(namespace, key)
+            except Exception as e:
+                logger.warning(f"Failed to delete `{key}` from the shared cache `{namespace}`: {e}")
+
+    def sweep(self) -> int:
+        """
+        Remove all the expired items from the local cache.
+
+        :return: The number of items removed.
+        """
+        with self._lock:
+            return self._sweep(time.monotonic())
 
-    def clear(self) -> None:
+    def clear(self, shared: bool = False) -> None:
         """
         Clear all items from the cache.
+
+        :param shared: Whether to also remove the items of the namespace of the cache from the shared backend, for
+            all the caches sharing it, e.g. in the other worker processes. Only the local items are removed otherwise.
         """
-        self.cache.clear()
+        with self._lock:
+            self.cache.clear()
+            self._next_expiry = None
+        if not shared:
+            return
+        shared_backend = self._shared()
+        if shared_backend is not None:
+            backend, namespace, _ = shared_backend
+            try:
+                backend.clear(namespace)
+            except Exception as e:
+                logger.warning(f"Failed to clear the shared cache `{namespace}`: {e}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self.cache)
+
+    def _shared(self) -> Optional[Tuple[CacheBackend, str, CacheCodec[T]]]:
+        if self.namespace is None or self._codec is None:
+            return None
+        backend = self._backend if self._backend is not None else get_shared_cache_backend()
+        return (backend, self.namespace, self._codec) if backend is not None else None
+
+    def _get_shared(self, key: str) -> object:
+        shared = self._shared()
+        if shared is None:
+            return _MISSING
+        backend, namespace, codec = shared
+        try:
+            entry = backend.get(namespace, key)
+            if entry is None:
+                return _MISSING
+            data, expires_at = entry
+            value = codec.decode(data)
+        except Exception as e:
+            logger.warning(f"Failed to read `{key}` from the shared cache `{namespace}`: {e}")
+            return _MISSING
+
+        # The local copy expires with the shared one
+        ttl = expires_at - time.time() if expires_at is not None else None
+        if ttl is not None and ttl <= 0:
+            return _MISSING
+        with self._lock:
+            self.stats.shared_hits += 1
+            self._set(key, value, ttl)
+        return value
+
+    def _set_shared(self, key: str, value: T, ttl: Optional[float]) -> None:
+        shared = self._shared()
+        if shared is None:
+            return
+        backend, namespace, codec = shared
+        try:
+            backend.set(namespace, key, codec.encode(value), self.ttl if ttl is None else ttl)
+        except Exception as e:
+            logger.warning(f"Failed to write `{key}` to the shared cache `{namespace}`: {e}")
+
+    def _get(self, key: str) -> object:
+        entry = self.cache.get(key)
+        if entry is not None:
+            value, expiry_time = entry
+            if expiry_time is None or time.monotonic() < expiry_time:
+                self.cache.move_to_end(key)
+                self.stats.hits += 1
+                return value
+            del self.cache[key]
+            self.stats.expirations += 1
+        self.stats.misses += 1
+        return _MISSING
+
+    def _set(self, key: str, value: T, ttl: Optional[float]) -> None:
+        now = time.monotonic()
+        ttl = self.ttl if ttl is None else ttl
+        expiry_time = now + ttl if ttl is not None else None
+        self.cache[key] = (value, expiry_time)
+        self.cache.move_to_end(key)
+        if expiry_time is not None and (self._next_expiry is None or expiry_time < self._next_expiry):
+            self._next_expiry = expiry_time
+
+        if len(self.cache) > self.max_size:
+            # Expired items make room before the least recently used ones are evicted
+            if self._next_expiry is not None and self._next_expiry <= now:
+                self._sweep(now)
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+                self.stats.evictions += 1
+
+    def _sweep(self, now: float) -> int:
+        expired = []
+        next_expiry: Optional[float] = None
+        for key, (_, expiry_time) in self.cache.items():
+            if expiry_time is None:
+                continue
+            if expiry_time <= now:
+                expired.append(key)
+            elif next_expiry is None or expiry_time < next_expiry:
+                next_expiry = expiry_time
+        for key in expired:
+            del self.cache[key]
+        self._next_expiry = next_expiry
+        self.stats.expirations += len(expired)
+        return len(expired)
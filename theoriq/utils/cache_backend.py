@@ -0,0 +1,266 @@
+"""Backends sharing the entries of caches between the processes of a host."""
+
+from __future__ import annotations
+
+import abc
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from typing import Any, Dict, Generic, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+M = TypeVar("M", bound=BaseModel)
+
+# Path of the SQLite database shared by the caches of the worker processes of an agent
+CACHE_PATH_ENV = "THEORIQ_CACHE_PATH"
+
+# Value stored in a backend and its expiry time, as a POSIX timestamp, None if the value never expires
+BackendEntry = Tuple[bytes, Optional[float]]
+
+
+class CacheCodec(abc.ABC, Generic[T]):
+    """Converts the values of a cache to and from the bytes stored in a backend."""
+
+    @abc.abstractmethod
+    def encode(self, value: T) -> bytes:
+        pass
+
+    @abc.abstractmethod
+    def decode(self, data: bytes) -> T:
+        pass
+
+
+class JsonCacheCodec(CacheCodec[Any]):
+    """Codec of JSON values."""
+
+    def encode(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class ModelCacheCodec(CacheCodec[M]):
+    """Codec of pydantic models, stored as their JSON form."""
+
+    def __init__(self, model_type: Type[M]) -> None:
+        self.model_type = model_type
+
+    def encode(self, value: M) -> bytes:
+        return value.model_dump_json(by_alias=True).encode("utf-8")
+
+    def decode(self, data: bytes) -> M:
+        return self.model_type.model_validate_json(data)
+
+
+class CacheBackend(abc.ABC):
+    """
+    Store of cache entries shared by several caches, each one using its own namespace.
+
+    Expiry times are POSIX timestamps, so that they compare across processes.
+    """
+
+    @abc.abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[BackendEntry]:
+        """Returns the value of a key and its expiry time, None if the key doesn't exist or has expired."""
+        pass
+
+    @abc.abstractmethod
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float]) -> None:
+        """Stores the value of a key, expiring after the given time-to-live in seconds, never if None."""
+        pass
+
+    @abc.abstractmethod
+    def delete(self, namespace: str, key: str) -> None:
+        pass
+
+    @abc.abstractmethod
+    def clear(self, namespace: str) -> None:
+        """Removes all the entries of a namespace."""
+        pass
+
+    @abc.abstractmethod
+    def sweep(self) -> int:
+        """Removes all the expired entries and returns their number."""
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """Backend keeping the entries in the memory of the process, shared by the caches of the process only."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], BackendEntry] = {}
+
+    def get(self, namespace: str, key: str) -> Optional[BackendEntry]:
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is not None and entry[1] is not None and entry[1] <= time.time():
+                del self._entries[(namespace, key)]
+                return None
+            return entry
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float]) -> None:
+        with self._lock:
+            self._entries[(namespace, key)] = (value, time.time() + ttl if ttl is not None else None)
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._lock:
+            self._entries.pop((namespace, key), None)
+
+    def clear(self, namespace: str) -> None:
+        with self._lock:
+            for entry_key in [entry_key for entry_key in self._entries if entry_key[0] == namespace]:
+                del self._entries[entry_key]
+
+    def sweep(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [
+                key for key, (_, expires_at) in self._entries.items() if expires_at is not None and expires_at <= now
+            ]
+            for key in expired:
+                del self._entries[key]
+        return len(expired)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Backend storing the entries in a SQLite database in WAL mode, shared by all the processes of a host opening the
+    same file. Readers never block the writer, so lookups stay cheap while other workers store entries.
+
+    The threads of a process share one connection, used by one thread at a time, and a process forked after the
+    connection was opened opens its own one.
+    """
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS cache_entries ("
+        "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, expires_at REAL, "
+        "PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+    )
+
+    def __init__(self, path: str, *, timeout: float = 5.0) -> None:
+        """
+        :param path: Path of the database file, created if it doesn't exist.
+        :param timeout: Maximum time in seconds to wait for a lock held by another connection.
+        """
+        self.path = path
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        if hasattr(os, "register_at_fork"):
+            # The lock may have been held by another thread of the parent when the process was forked
+            backend = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: SQLiteCacheBackend._after_fork(backend))
+        with self._lock:
+            self._connect()
+
+    def get(self, namespace: str, key: str) -> Optional[BackendEntry]:
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT value, expires_at FROM cache_entries "
+                    "WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                    (namespace, key, time.time()),
+                )
+                .fetchone()
+            )
+        return (bytes(row[0]), row[1]) if row is not None else None
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float]) -> None:
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, value, expires_at),
+            )
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def clear(self, namespace: str) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM cache_entries WHERE namespace = ?", (namespace,))
+
+    def sweep(self) -> int:
+        with self._lock:
+            cursor = self._connect().execute(
+                "DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            )
+            return cursor.rowcount
+
+    def close(self) -> None:
+        """Closes the connection of the process, reopened by the next operation."""
+        with self._lock:
+            connection, self._connection = self._connection, None
+            if connection is not None and self._pid == os.getpid():
+                connection.close()
+
+    @staticmethod
+    def _after_fork(backend: weakref.ref[SQLiteCacheBackend]) -> None:
+        instance = backend()
+        if instance is not None:
+            instance._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Returns the connection of the process, opening it if needed. Called with the lock held."""
+        pid = os.getpid()
+        if self._connection is None or self._pid != pid:
+            # Autocommit mode: every statement is its own transaction. The connection inherited from the parent of a
+            # forked process is left open, closing it would interfere with the parent.
+            connection = sqlite3.connect(
+                self.path, timeout=self._timeout, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(self._SCHEMA)
+            self._connection = connection
+            self._pid = pid
+        return self._connection
+
+
+_shared_backend: Optional[CacheBackend] = None
+_shared_backend_resolved = False
+_shared_backend_lock = threading.Lock()
+
+
+def get_shared_cache_backend() -> Optional[CacheBackend]:
+    """
+    Returns the backend shared by the caches of the SDK: the backend set with `set_shared_cache_backend`, otherwise a
+    SQLite backend if the `THEORIQ_CACHE_PATH` environment variable is set, None if the caches are local.
+    """
+    global _shared_backend, _shared_backend_resolved
+    if _shared_backend_resolved:
+        return _shared_backend
+    with _shared_backend_lock:
+        if not _shared_backend_resolved:
+            path = os.getenv(CACHE_PATH_ENV)
+            if path:
+                try:
+                    _shared_backend = SQLiteCacheBackend(path)
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to open the shared cache `{path}`, caches are local: {e}")
+            _shared_backend_resolved = True
+    return _shared_backend
+
+
+def set_shared_cache_backend(backend: Optional[CacheBackend]) -> None:
+    """Sets the backend shared by the caches of the SDK, None to keep the caches local."""
+    global _shared_backend, _shared_backend_resolved
+    with _shared_backend_lock:
+        _shared_backend = backend
+        _shared_backend_resolved = True
@@ -0,0 +1,185 @@
+"""Content codings compressing the bodies exchanged between agents, negotiated with the Accept-Encoding header."""
+
+from __future__ import annotations
+
+import abc
+import zlib
+from typing import Any, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, installed with the `zstd` extra
+    zstandard = None  # type: ignore[assignment]
+
+from .headers import header_quality
+
+# Bodies smaller than this are not worth compressing: the saving does not cover the cost of the compression
+DEFAULT_MIN_COMPRESS_SIZE = 1024
+
+# Maximum size of a decompressed body, protecting against small bodies decompressing to huge ones
+DEFAULT_MAX_DECOMPRESSED_SIZE = 64 * 1024 * 1024
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class UnsupportedContentEncodingError(Exception):
+    """Raised when a body uses a content coding which is unknown or whose optional dependency is not installed."""
+
+    pass
+
+
+class ContentDecodingError(ValueError):
+    """Raised when a compressed body is invalid or decompresses to more than the maximum size."""
+
+    pass
+
+
+class ContentCoding(abc.ABC):
+    """Compression of a body, identified by its name in the Content-Encoding header."""
+
+    def __init__(self, name: str, default_level: int) -> None:
+        self.name = name
+        self.default_level = default_level
+
+    @property
+    def is_available(self) -> bool:
+        return True
+
+    @abc.abstractmethod
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        pass
+
+    @abc.abstractmethod
+    def decompress(self, data: bytes, max_size: int = DEFAULT_MAX_DECOMPRESSED_SIZE) -> bytes:
+        """
+        :raises ContentDecodingError: if the data is not valid or decompresses to more than `max_size` bytes
+        """
+        pass
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class GzipContentCoding(ContentCoding):
+    def __init__(self) -> None:
+        super().__init__("gzip", 6)
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        compressor = zlib.compressobj(
+            self.default_level if level is None else level, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+        )
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data: bytes, max_size: int = DEFAULT_MAX_DECOMPRESSED_SIZE) -> bytes:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            result = decompressor.decompress(data, max_size + 1)
+        except zlib.error as e:
+            raise ContentDecodingError(f"invalid gzip body: {e}") from e
+        if len(result) > max_size:
+            raise ContentDecodingError(f"gzip body decompresses to more than {max_size} bytes")
+        if not decompressor.eof:
+            raise ContentDecodingError("truncated gzip body")
+        return result
+
+
+class ZstdContentCoding(ContentCoding):
+    def __init__(self) -> None:
+        super().__init__("zstd", 3)
+
+    @property
+    def is_available(self) -> bool:
+        return zstandard is not None
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        compressor = self._zstandard().ZstdCompressor(level=self.default_level if level is None else level)
+        return compressor.compress(data)
+
+    def decompress(self, data: bytes, max_size: int = DEFAULT_MAX_DECOMPRESSED_SIZE) -> bytes:
+        chunks: List[bytes] = []
+        size = 0
+        try:
+            with self._zstandard().ZstdDecompressor().stream_reader(data) as reader:
+                while size <= max_size:
+                    chunk = reader.read(_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                    size += len(chunk)
+        except self._zstandard().ZstdError as e:
+            raise ContentDecodingError(f"invalid zstd body: {e}") from e
+        if size > max_size:
+            raise ContentDecodingError(f"zstd body decompresses to more than {max_size} bytes")
+        return b"".join(chunks)
+
+    @staticmethod
+    def _zstandard() -> Any:
+        if zstandard is None:
+            raise UnsupportedContentEncodingError("zstd bodies require the `zstandard` package")
+        return zstandard
+
+
+GZIP_CODING = GzipContentCoding()
+ZSTD_CODING = ZstdContentCoding()
+
+# Supported codings, from the most preferred one
+_CODINGS: Tuple[ContentCoding, ...] = (ZSTD_CODING, GZIP_CODING)
+
+
+def content_coding(name: str) -> ContentCoding:
+    """
+    Returns the content coding with the given name, as found in the Content-Encoding header.
+
+    :raises UnsupportedContentEncodingError: if the coding is unknown or not available
+    """
+    normalized = name.strip().lower()
+    for coding in _CODINGS:
+        if coding.name == normalized:
+            if not coding.is_available:
+                raise UnsupportedContentEncodingError(f"content encoding `{name}` is not available")
+            return coding
+    raise UnsupportedContentEncodingError(f"unsupported content encoding `{name}`")
+
+
+def decompress_body(
+    data: bytes, content_encoding: Optional[str], max_size: int = DEFAULT_MAX_DECOMPRESSED_SIZE
+) -> bytes:
+    """
+    Returns the body with the content codings of the Content-Encoding header removed, in the reverse order of
+    their application.
+
+    :raises UnsupportedContentEncodingError: if one of the codings is unknown or not available
+    :raises ContentDecodingError: if the body is not valid or decompresses to more than `max_size` bytes
+    """
+    if not content_encoding:
+        return data
+    for name in reversed(content_encoding.split(",")):
+        if name.strip().lower() != "identity":
+            data = content_coding(name).decompress(data, max_size)
+    return data
+
+
+def accept_encoding_header() -> str:
+    """Accept-Encoding header listing the available codings, from the most preferred one."""
+    return ", ".join(coding.name for coding in _CODINGS if coding.is_available)
+
+
+def negotiate_content_coding(accept_encoding: Optional[str]) -> Optional[ContentCoding]:
+    """
+    Returns the available coding preferred by the given Accept-Encoding header, or None if the body should not be
+    compressed. Codings accepted with the same quality are chosen in the order of preference of the SDK.
+    """
+    if not accept_encoding:
+        return None
+
+    qualities = {}
+    for element in accept_encoding.split(","):
+        name = element.split(";", 1)[0]
+        qualities[name.strip().lower()] = header_quality(element)
+
+    candidates: List[Tuple[float, int, ContentCoding]] = []
+    for preference, coding in enumerate(_CODINGS):
+        quality = qualities.get(coding.name, qualities.get("*", 0.0))
+        if coding.is_available and quality > 0:
+            candidates.append((quality, -preference, coding))
+    return max(candidates, key=lambda candidate: candidate[:2])[2] if candidates else None
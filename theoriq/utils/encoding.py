@@ -0,0 +1,153 @@
+"""Encodings of the bodies exchanged between agents, negotiated with the Content-Type and Accept headers."""
+
+from __future__ import annotations
+
+import abc
+import json
+from typing import Any, List, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:  # optional dependency, installed with the `msgpack` extra
+    msgpack = None  # type: ignore[assignment]
+
+from .headers import header_quality
+
+
+class UnsupportedBodyEncodingError(Exception):
+    """Raised when a body uses an encoding which is unknown or whose optional dependency is not installed."""
+
+    pass
+
+
+class BodyDecodeError(ValueError):
+    """Raised when a body cannot be decoded with the encoding of its content type."""
+
+    pass
+
+
+class BodyEncoding(abc.ABC):
+    """Encoding of a body, identified by its content type."""
+
+    def __init__(self, name: str, content_type: str) -> None:
+        self.name = name
+        self.content_type = content_type
+
+    @property
+    def is_available(self) -> bool:
+        return True
+
+    @property
+    def is_json(self) -> bool:
+        return False
+
+    def matches(self, content_type: Optional[str]) -> bool:
+        return content_type is not None and _media_type(content_type) == self.content_type
+
+    @abc.abstractmethod
+    def encode(self, value: Any) -> bytes:
+        pass
+
+    @abc.abstractmethod
+    def decode(self, data: bytes) -> Any:
+        """
+        :raises BodyDecodeError: if the data is not valid
+        """
+        pass
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class JsonBodyEncoding(BodyEncoding):
+    def __init__(self) -> None:
+        super().__init__("json", "application/json")
+
+    @property
+    def is_json(self) -> bool:
+        return True
+
+    def encode(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, data: bytes) -> Any:
+        try:
+            return json.loads(data)
+        except ValueError as e:
+            raise BodyDecodeError(f"invalid JSON body: {e}") from e
+
+
+class MsgpackBodyEncoding(BodyEncoding):
+    def __init__(self) -> None:
+        super().__init__("msgpack", "application/msgpack")
+
+    @property
+    def is_available(self) -> bool:
+        return msgpack is not None
+
+    def encode(self, value: Any) -> bytes:
+        return self._msgpack().packb(value, use_bin_type=True)
+
+    def decode(self, data: bytes) -> Any:
+        packer = self._msgpack()
+        try:
+            return packer.unpackb(data, raw=False)
+        except Exception as e:
+            raise BodyDecodeError(f"invalid MessagePack body: {e}") from e
+
+    def _msgpack(self) -> Any:
+        if msgpack is None:
+            raise UnsupportedBodyEncodingError("MessagePack bodies require the `msgpack` package")
+        return msgpack
+
+
+JSON_ENCODING = JsonBodyEncoding()
+MSGPACK_ENCODING = MsgpackBodyEncoding()
+
+_ENCODINGS: Tuple[BodyEncoding, ...] = (JSON_ENCODING, MSGPACK_ENCODING)
+
+
+def _media_type(value: str) -> str:
+    return value.split(";", 1)[0].strip().lower()
+
+
+def find_body_encoding(content_type: Optional[str]) -> Optional[BodyEncoding]:
+    """Returns the encoding of the given content type, or None if the content type is not a known encoding."""
+    return next((encoding for encoding in _ENCODINGS if encoding.matches(content_type)), None)
+
+
+def body_encoding(content_type: Optional[str]) -> BodyEncoding:
+    """
+    Returns the encoding of a body with the given content type, JSON when no content type is given.
+
+    :raises UnsupportedBodyEncodingError: if the content type is not a known encoding
+    """
+    if not content_type:
+        return JSON_ENCODING
+    encoding = find_body_encoding(content_type)
+    if encoding is None:
+        raise UnsupportedBodyEncodingError(f"unsupported content type `{content_type}`")
+    return encoding
+
+
+def negotiate_body_encoding(accept: Optional[str]) -> BodyEncoding:
+    """
+    Returns the available encoding preferred by the given Accept header.
+    JSON is returned unless another encoding is explicitly accepted with a higher or equal quality.
+    """
+    if not accept:
+        return JSON_ENCODING
+
+    candidates: List[Tuple[float, int, BodyEncoding]] = []
+    for position, media_range in enumerate(accept.split(",")):
+        encoding = find_body_encoding(media_range)
+        if encoding is not None and encoding.is_available:
+            quality = header_quality(media_range)
+            if quality > 0:
+                candidates.append((quality, -position, encoding))
+    return max(candidates, key=lambda candidate: candidate[:2])[2] if candidates else JSON_ENCODING
+
+
+def accept_header(encoding: BodyEncoding) -> str:
+    """Accept header preferring the given encoding, and falling back to JSON."""
+    return encoding.content_type if encoding.is_json else f"{encoding.content_type}, {JSON_ENCODING.content_type};q=0.9"
@@ -0,0 +1,17 @@
+"""Parsing of the HTTP headers negotiating the bodies exchanged between agents."""
+
+
+def header_quality(element: str) -> float:
+    """
+    Returns the quality of an element of an Accept or Accept-Encoding header, e.g. `application/json;q=0.9`.
+
+    The quality is 1 if the element has no `q` parameter, and 0 if its value is not a number.
+    """
+    for parameter in element.split(";")[1:]:
+        key, _, value = parameter.partition("=")
+        if key.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
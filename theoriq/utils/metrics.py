@@ -0,0 +1,256 @@
+"""Counters and histograms of the SDK, reported to a pluggable metrics sink."""
+
+from __future__ import annotations
+
+import abc
+import bisect
+import json
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+# Names of the metrics reported by the SDK, labelled with the address of the agent
+NOTIFICATIONS_RECEIVED = "theoriq_notifications_received_total"
+NOTIFICATIONS_RECEIVED_BYTES = "theoriq_notifications_received_bytes_total"
+NOTIFICATIONS_PUBLISHED = "theoriq_notifications_published_total"
+NOTIFICATIONS_PUBLISHED_BYTES = "theoriq_notifications_published_bytes_total"
+NOTIFICATION_PUBLISH_FAILURES = "theoriq_notification_publish_failures_total"
+NOTIFICATION_PUBLISH_SECONDS = "theoriq_notification_publish_seconds"
+NOTIFICATION_HANDLER_SECONDS = "theoriq_notification_handler_seconds"
+NOTIFICATION_QUEUE_SECONDS = "theoriq_notification_queue_seconds"
+NOTIFICATION_DELIVERY_SECONDS = "theoriq_notification_delivery_seconds"
+SUBSCRIPTION_RECONNECTS = "theoriq_subscription_reconnects_total"
+BISCUIT_RENEWALS = "theoriq_biscuit_renewals_total"
+
+# Names of the metrics of the admission control of execute requests, rejections labelled with their status code
+EXECUTE_REQUESTS_ADMITTED = "theoriq_execute_requests_admitted_total"
+EXECUTE_REQUESTS_REJECTED = "theoriq_execute_requests_rejected_total"
+EXECUTE_ADMISSION_QUEUE_SECONDS = "theoriq_execute_admission_queue_seconds"
+
+# Upper bounds of the buckets of latency histograms, in seconds
+DEFAULT_LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+Labels = Mapping[str, str]
+_LabelsKey = Tuple[Tuple[str, str], ...]
+
+
+class MetricsSink(abc.ABC):
+    """Receives the metrics reported by the SDK, e.g. to forward them to a monitoring system."""
+
+    @abc.abstractmethod
+    def increment(self, name: str, value: float = 1, labels: Optional[Labels] = None) -> None:
+        """Increments a counter."""
+        pass
+
+    @abc.abstractmethod
+    def observe(self, name: str, value: float, labels: Optional[Labels] = None) -> None:
+        """Records a value in a histogram."""
+        pass
+
+
+class NullMetricsSink(MetricsSink):
+    """Sink discarding all the metrics."""
+
+    def increment(self, name: str, value: float = 1, labels: Optional[Labels] = None) -> None:
+        pass
+
+    def observe(self, name: str, value: float, labels: Optional[Labels] = None) -> None:
+        pass
+
+
+class Histogram:
+    """Distribution of observed values, counted in cumulative buckets."""
+
+    __slots__ = ("buckets", "bucket_counts", "count", "sum", "min", "max")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * (len(self.buckets) + 1)  # the last bucket counts values above the largest bound
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Returns an estimate of the given quantile: the upper bound of the bucket containing it."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.bucket_counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "buckets": {
+                **{str(bound): count for bound, count in zip(self.buckets, self.bucket_counts)},
+                "+Inf": self.bucket_counts[-1],
+            },
+        }
+
+
+class InMemoryMetricsRegistry(MetricsSink):
+    """
+    Sink keeping counters and histograms in memory, by name and labels, to be scraped with `snapshot` or
+    `to_prometheus`. The registry is thread-safe.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+        self._buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[_LabelsKey, float]] = {}
+        self._histograms: Dict[str, Dict[_LabelsKey, Histogram]] = {}
+
+    def increment(self, name: str, value: float = 1, labels: Optional[Labels] = None) -> None:
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: Optional[Labels] = None) -> None:
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self._buckets)
+            histogram.observe(value)
+
+    def counter(self, name: str, labels: Optional[Labels] = None) -> float:
+        """Returns the value of a counter, 0 if never incremented."""
+        with self._lock:
+            return self._counters.get(name, {}).get(_labels_key(labels), 0)
+
+    def histogram(self, name: str, labels: Optional[Labels] = None) -> Optional[Histogram]:
+        """Returns a histogram, None if no value was observed."""
+        with self._lock:
+            return self._histograms.get(name, {}).get(_labels_key(labels))
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Returns the current values of all the metrics, by name."""
+        result: Dict[str, List[Dict[str, Any]]] = {}
+        with self._lock:
+            for name, counters in self._counters.items():
+                result[name] = [{"labels": dict(key), "value": value} for key, value in counters.items()]
+            for name, histograms in self._histograms.items():
+                result[name] = [{"labels": dict(key), **histogram.to_dict()} for key, histogram in histograms.items()]
+        return result
+
+    def to_prometheus(self) -> str:
+        """Returns all the metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            for name, counters in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in counters.items():
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+            for name, histograms in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in histograms.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, le=_format_value(bound))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, le='+Inf')} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(histogram.sum)}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+_default_sink: MetricsSink = InMemoryMetricsRegistry()
+
+
+def get_default_metrics_sink() -> MetricsSink:
+    """Returns the sink used by the components of the SDK created without a sink, an in-memory registry by default."""
+    return _default_sink
+
+
+def set_default_metrics_sink(sink: MetricsSink) -> None:
+    """Sets the sink used by the components of the SDK created from now on without a sink."""
+    global _default_sink
+    _default_sink = sink
+
+
+def agent_labels(agent_address: Any) -> Dict[str, str]:
+    """Labels of the metrics of an agent."""
+    return {"agent": str(agent_address)}
+
+
+def notification_timestamp(message: str) -> Optional[float]:
+    """
+    Returns the time a notification was published, as a POSIX timestamp, if the notification is a JSON object with a
+    `timestamp` field holding a number of seconds since the epoch or an ISO 8601 date, UTC if naive, None otherwise.
+    """
+    if not message.startswith("{") or '"timestamp"' not in message:
+        return None
+    try:
+        timestamp = json.loads(message).get("timestamp")
+        if isinstance(timestamp, (int, float)) and not isinstance(timestamp, bool):
+            return float(timestamp)
+        if isinstance(timestamp, str):
+            published_at = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+            if published_at.tzinfo is None:
+                published_at = published_at.replace(tzinfo=timezone.utc)
+            return published_at.timestamp()
+    except (ValueError, AttributeError):
+        pass
+    return None
+
+
+def _labels_key(labels: Optional[Labels]) -> _LabelsKey:
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _format_labels(key: _LabelsKey, **extra: str) -> str:
+    items = list(key) + list(extra.items())
+    if not items:
+        return ""
+    values = ",".join(f'{name}="{_escape(value)}"' for name, value in items)
+    return "{" + values + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')